@@ -1,4 +1,100 @@
+import io
+
 import streamlit as st
 
-st.title("Здесь будет аэрологическая диаграмма")
-st.write("Это только начало")
\ No newline at end of file
+from sounding import analyze_many, get_analysis, parse_sounding_text, parse_table, plot_skewt
+
+st.title("📈 Аэрологическая диаграмма")
+
+# Разбор ввода запоминается по тексту: при переключении станций
+# телеграммы и таблицы заново не разбираются
+@st.cache_data(max_entries=32)
+def load_soundings(text):
+    return parse_sounding_text(text)
+
+@st.cache_data(max_entries=32)
+def load_table(data, name):
+    return [parse_table(data, station=name.rsplit('.', 1)[0])]
+
+# Диаграмма - по идентификатору и отпечатку зондирования (само зондирование не хешируется)
+@st.cache_data(max_entries=64)
+def skewt_png(sounding_id, digest, _sounding):
+    fig = plot_skewt(_sounding, get_analysis(_sounding))
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=100, bbox_inches="tight")
+    return buffer.getvalue()
+
+def format_value(value, unit, digits=0):
+    if value != value:  # NaN
+        return "—"
+    return f"{value:.{digits}f} {unit}"
+
+# Ввод данных
+st.sidebar.header("Данные зондирования")
+source = st.sidebar.radio("Источник:", ["Телеграмма TEMP", "Файл"])
+
+soundings = []
+try:
+    if source == "Телеграмма TEMP":
+        text = st.sidebar.text_area("Вставьте телеграммы TTAA/TTBB (можно несколько станций):", height=250)
+        if text.strip():
+            soundings = load_soundings(text)
+    else:
+        files = st.sidebar.file_uploader(
+            "Таблица CSV или текст University of Wyoming (TEMP тоже подходит):",
+            type=["csv", "txt"], accept_multiple_files=True,
+        )
+        for file in files or []:
+            data = file.getvalue()
+            text = data.decode("utf-8", errors="replace")
+            soundings.extend(load_soundings(text) if "TTAA" in text or "TTBB" in text else load_table(data, file.name))
+except Exception as e:
+    st.error(f"Ошибка разбора данных зондирования: {str(e)}")
+
+if not soundings:
+    st.info("Вставьте телеграммы TEMP или загрузите файл с профилем")
+    st.stop()
+
+# Сводка по всем зондированиям
+summary = analyze_many(soundings)
+st.subheader(f"Станций: {len(soundings)}")
+st.dataframe(
+    summary.select(
+        "station", "time", "cape", "cin", "lifted_index", "lcl_height",
+        "lfc_pressure", "el_pressure", "precipitable_water", "freezing_level", "error",
+    ),
+    column_config={
+        "station": "Станция", "time": "Срок", "cape": "CAPE, Дж/кг", "cin": "CIN, Дж/кг",
+        "lifted_index": "LI", "lcl_height": "КУК, м", "lfc_pressure": "УСК, гПа",
+        "el_pressure": "УРП, гПа", "precipitable_water": "Осаждаемая вода, мм",
+        "freezing_level": "Нулевая изотерма, м", "error": "Ошибка",
+    },
+    hide_index=True,
+)
+
+# Диаграмма выбранной станции
+by_id = {sounding.id: sounding for sounding in soundings}
+selected = st.selectbox(
+    "Станция:", list(by_id),
+    format_func=lambda key: f"{by_id[key].station} {by_id[key].time:%d.%m %H} UTC" if by_id[key].time else by_id[key].station,
+)
+sounding = by_id[selected]
+
+try:
+    analysis = get_analysis(sounding)
+except Exception as e:
+    st.error(f"Ошибка расчёта для {sounding.station}: {str(e)}")
+    st.stop()
+
+col1, col2, col3, col4 = st.columns(4)
+col1.metric("CAPE", format_value(analysis.cape, "Дж/кг"))
+col2.metric("CIN", format_value(analysis.cin, "Дж/кг"))
+col3.metric("Индекс LI", format_value(analysis.lifted_index, "°C", 1))
+col4.metric("Осаждаемая вода", format_value(analysis.precipitable_water, "мм", 1))
+col1, col2, col3, col4 = st.columns(4)
+col1.metric("КУК", format_value(analysis.lcl_pressure, "гПа"), format_value(analysis.lcl_height, "м"), delta_color="off")
+col2.metric("УСК", format_value(analysis.lfc_pressure, "гПа"))
+col3.metric("УРП", format_value(analysis.el_pressure, "гПа"))
+col4.metric("Нулевая изотерма", format_value(analysis.freezing_level, "м"))
+
+st.image(skewt_png(sounding.id, sounding.digest, sounding))
@@ -0,0 +1,117 @@
+import airportsdata
+import numpy as np
+import polars as pl
+from scipy.spatial import cKDTree
+
+# Координаты аэропортов справочника (из пакета airportsdata, в ICAO.xls их нет)
+# и пространственный индекс для запросов «в радиусе R км» и «ближайшие k».
+# Точки хранятся единичными векторами на сфере: евклидово расстояние между ними
+# (хорда) монотонно связано с расстоянием по дуге, поэтому k-d дерево даёт
+# точные ответы без проекций и проблем у полюсов и 180-го меридиана.
+
+EARTH_RADIUS_KM = 6371.0088
+FT_TO_M = 0.3048
+
+COORDINATE_SCHEMA = {
+    "icao_code": pl.String,
+    "lat": pl.Float64,
+    "lon": pl.Float64,
+    "elevation_m": pl.Float64,
+}
+
+
+def load_coordinates():
+    rows = [
+        (code, info["lat"], info["lon"], info["elevation"] * FT_TO_M if info["elevation"] is not None else None)
+        for code, info in airportsdata.load("ICAO").items()
+    ]
+    return pl.DataFrame(rows, schema=COORDINATE_SCHEMA, orient="row")
+
+
+# Справочник с координатами: строки без координат остаются (lat/lon = null)
+def with_coordinates(directory, coordinates=None):
+    coordinates = load_coordinates() if coordinates is None else coordinates
+    return directory.df.join(coordinates, on="icao_code", how="left", maintain_order="left")
+
+
+def _unit_vectors(lat, lon):
+    lat, lon = np.radians(lat), np.radians(lon)
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
+
+
+def _chord(distance_km):
+    return 2 * np.sin(np.asarray(distance_km) / (2 * EARTH_RADIUS_KM))
+
+
+def _arc(chord):
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / 2, 0, 1))
+
+
+class GeoIndex:
+    def __init__(self, codes, lat, lon):
+        self.codes = list(codes)
+        self.lat = np.asarray(lat, dtype=float)
+        self.lon = np.asarray(lon, dtype=float)
+        self.positions = {code: i for i, code in enumerate(self.codes)}
+        self.tree = cKDTree(_unit_vectors(self.lat, self.lon))
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __contains__(self, icao):
+        return icao in self.positions
+
+    def location(self, icao):
+        i = self.positions.get(icao)
+        return None if i is None else (float(self.lat[i]), float(self.lon[i]))
+
+    def _result(self, indices, chords, exclude):
+        order = np.argsort(chords, kind="stable")
+        distances = _arc(chords)
+        return [
+            (self.codes[indices[k]], float(distances[k]))
+            for k in order
+            if self.codes[indices[k]] != exclude
+        ]
+
+    # Все аэропорты в радиусе radius_km от точки: [(код, расстояние, км)] по возрастанию
+    def within(self, lat, lon, radius_km, exclude=None):
+        point = _unit_vectors(lat, lon)[0]
+        indices = np.asarray(self.tree.query_ball_point(point, _chord(radius_km)), dtype=int)
+        if not len(indices):
+            return []
+        chords = np.linalg.norm(self.tree.data[indices] - point, axis=1)
+        return self._result(indices, chords, exclude)
+
+    # k ближайших аэропортов к точке
+    def nearest(self, lat, lon, k=5, exclude=None):
+        k = min(k + (exclude is not None), len(self.codes))
+        chords, indices = self.tree.query(_unit_vectors(lat, lon)[0], k=k)
+        return self._result(np.atleast_1d(indices), np.atleast_1d(chords), exclude)[:k - (exclude is not None)]
+
+    # То же относительно аэропорта (он сам в ответ не входит)
+    def around(self, icao, radius_km):
+        location = self.location(icao)
+        return [] if location is None else self.within(*location, radius_km, exclude=icao)
+
+    def nearest_to(self, icao, k=5):
+        location = self.location(icao)
+        return [] if location is None else self.nearest(*location, k, exclude=icao)
+
+    # Аэропорты в прямоугольнике карты (долгота может переходить через 180°)
+    def in_box(self, south, west, north, east):
+        lat_ok = (self.lat >= south) & (self.lat <= north)
+        if west <= east:
+            lon_ok = (self.lon >= west) & (self.lon <= east)
+        else:
+            lon_ok = (self.lon >= west) | (self.lon <= east)
+        return [self.codes[i] for i in np.flatnonzero(lat_ok & lon_ok)]
+
+
+# Индекс по аэропортам справочника, для которых известны координаты
+def build_geo_index(directory, coordinates=None):
+    df = with_coordinates(directory, coordinates).filter(
+        pl.col("icao_code").is_not_null() & pl.col("lat").is_not_null()
+    ).unique("icao_code", keep="first", maintain_order=True)
+    return GeoIndex(df["icao_code"], df["lat"].to_numpy(), df["lon"].to_numpy())
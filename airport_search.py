@@ -0,0 +1,201 @@
+import bisect
+import re
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass
+
+# Поиск аэропорта по коду ИКАО, названию и городу (русскому и английскому).
+# Всё приводится к латинице (кириллица транслитерируется), поэтому «Нижневартовск»
+# и «Nizhnevartovsk» - одно и то же слово. Индекс строится один раз:
+#   - отсортированный список слов (поиск по префиксу - двоичный, без перебора строк);
+#   - слово -> записи, где оно встречается;
+#   - триграмма -> слова (поиск с опечатками).
+
+SEARCH_COLUMNS = ("name_rus", "name_eng", "city_rus", "city_eng")
+# Вес совпадения в зависимости от поля
+FIELD_WEIGHTS = {"icao": 3.0, "city_rus": 1.2, "city_eng": 1.2, "name_rus": 1.0, "name_eng": 1.0}
+# Небольшое предпочтение отечественным аэродромам при равных совпадениях
+HOME_COUNTRY = "Россия"
+HOME_BONUS = 0.3
+# Сколько слов разворачивать по префиксу и сколько кандидатов проверять на опечатки
+MAX_PREFIX_WORDS = 300
+MAX_FUZZY_WORDS = 40
+# Качество совпадения с опечаткой (точное - 1, по префиксу - от 0.6)
+FUZZY_QUALITY = 0.5
+
+TRANSLIT = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'e', 'ж': 'zh',
+    'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o',
+    'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u', 'ф': 'f', 'х': 'kh', 'ц': 'ts',
+    'ч': 'ch', 'ш': 'sh', 'щ': 'shch', 'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu',
+    'я': 'ya', 'і': 'i', 'ї': 'yi', 'є': 'ye', 'ґ': 'g', 'ә': 'a', 'ғ': 'g', 'қ': 'k',
+    'ң': 'n', 'ө': 'o', 'ұ': 'u', 'ү': 'u', 'һ': 'h',
+}
+_TRANSLIT = str.maketrans(TRANSLIT)
+
+# Набор в неверной раскладке: «ybrjkmcr» -> «никольск»
+_LATIN_KEYS = "qwertyuiop[]asdfghjkl;'zxcvbnm,.`"
+_CYRILLIC_KEYS = "йцукенгшщзхъфывапролджэячсмитьбюё"
+_LAYOUT = str.maketrans(_LATIN_KEYS + _CYRILLIC_KEYS, _CYRILLIC_KEYS + _LATIN_KEYS)
+
+_ONE_LAYOUT = re.compile(r"[a-z\[\];',.`\s]+|[а-яё\s]+").fullmatch
+# Раскладку пробуем менять, только если лучшее совпадение - не точнее опечатки
+LAYOUT_THRESHOLD = 0.6
+
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+
+# Общие слова («аэропорт», «airport»): в запросе вместе с другими словами
+# не обязательны - «Нижневартовск аэропорт» ищется как «Нижневартовск»
+GENERIC_WORDS = {"aeroport", "airport", "aerodrom", "aerodrome", "airfield"}
+
+
+@dataclass(slots=True)
+class SearchResult:
+    icao: str
+    name: str
+    city: str
+    country: str
+    score: float
+
+
+# Латиница в нижнем регистре без диакритики и знаков препинания
+def normalize(text):
+    text = text.lower().translate(_TRANSLIT)
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+    return _NON_WORD.sub(' ', text).strip()
+
+
+def words(text):
+    return normalize(text).split() if text else []
+
+
+def trigrams(word):
+    padded = f" {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+# Расстояние Левенштейна с отсечением: больше limit - возвращается limit + 1
+def edit_distance(a, b, limit=2):
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class AirportSearch:
+    def __init__(self, directory):
+        df = directory.df
+        columns = {name: df[name].to_list() for name in (*SEARCH_COLUMNS, "country_rus")}
+        self.codes = list(directory.index)
+        self.rows = list(directory.index.values())
+        self.labels = []
+        self.home = []
+        postings = {}
+        for entry, (code, row) in enumerate(zip(self.codes, self.rows)):
+            name = columns["name_rus"][row] or columns["name_eng"][row] or ''
+            city = columns["city_rus"][row] or columns["city_eng"][row] or ''
+            country = columns["country_rus"][row] or ''
+            self.labels.append((name, city, country))
+            self.home.append(country == HOME_COUNTRY)
+            fields = [("icao", code.lower())]
+            for column in SEARCH_COLUMNS:
+                fields.extend((column, word) for word in words(columns[column][row]))
+            for field, word in fields:
+                weights = postings.setdefault(word, {})
+                weights[entry] = max(weights.get(entry, 0), FIELD_WEIGHTS[field])
+
+        self.words = sorted(postings)
+        self.postings = [postings[word] for word in self.words]
+        self.word_ids = {word: i for i, word in enumerate(self.words)}
+        self.trigram_index = {}
+        for i, word in enumerate(self.words):
+            for gram in trigrams(word):
+                self.trigram_index.setdefault(gram, []).append(i)
+
+    # Слова словаря, подходящие к слову запроса: (номер слова, качество совпадения 0..1)
+    def _match_word(self, token, prefix):
+        matches = {}
+        exact = self.word_ids.get(token)
+        if exact is not None:
+            matches[exact] = 1.0
+        if prefix:
+            start = bisect.bisect_left(self.words, token)
+            end = bisect.bisect_left(self.words, token + '\x7f', start)
+            for i in range(start, min(end, start + MAX_PREFIX_WORDS)):
+                if i not in matches:
+                    # Чем большая часть слова набрана, тем выше
+                    matches[i] = 0.6 + 0.3 * len(token) / len(self.words[i])
+        if len(token) >= 3 and len(matches) < MAX_FUZZY_WORDS:
+            matches.update((i, score) for i, score in self._fuzzy(token, prefix) if i not in matches)
+        return matches
+
+    # Опечатки: кандидаты по общим триграммам, затем проверка расстоянием Левенштейна
+    # (при наборе по префиксу - ещё и с началом слова той же длины: слово может
+    # быть и недописанным, и дописанным с пропущенной буквой)
+    def _fuzzy(self, token, prefix):
+        grams = trigrams(token)
+        counts = Counter()
+        for gram in grams:
+            counts.update(self.trigram_index.get(gram, ()))
+        limit = 1 if len(token) < 6 else 2
+        needed = max(1, len(grams) - 3 * limit)
+        for i, common in counts.most_common(MAX_FUZZY_WORDS * 4):
+            if common < needed:
+                break
+            word = self.words[i]
+            distance = edit_distance(token, word, limit)
+            if prefix and len(word) > len(token):
+                distance = min(distance, edit_distance(token, word[:len(token)], limit))
+            if distance <= limit:
+                yield i, FUZZY_QUALITY - 0.1 * distance
+
+    def _entries(self, tokens):
+        scores = None
+        for k, token in enumerate(tokens):
+            token_scores = {}
+            # Последнее слово запроса может быть недописанным
+            for i, quality in self._match_word(token, prefix=k == len(tokens) - 1).items():
+                for entry, weight in self.postings[i].items():
+                    if quality <= FUZZY_QUALITY:
+                        # Код ИКАО с опечаткой - не повод ставить аэропорт первым
+                        weight = min(weight, FIELD_WEIGHTS["city_rus"])
+                    score = quality * weight
+                    if score > token_scores.get(entry, 0):
+                        token_scores[entry] = score
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {entry: score + token_scores[entry] for entry, score in scores.items() if entry in token_scores}
+            if not scores:
+                return {}
+        return scores or {}
+
+    def search(self, query, limit=10):
+        tokens = words(query)
+        if not tokens:
+            return []
+        scores = self._entries(tokens)
+        specific = [token for token in tokens if token not in GENERIC_WORDS]
+        if not scores and specific and len(specific) < len(tokens):
+            scores = self._entries(specific)
+        if max(scores.values(), default=0) < LAYOUT_THRESHOLD and _ONE_LAYOUT(query.lower()):
+            # Точных совпадений нет - возможно, набрано в другой раскладке
+            alternative = self._entries(words(query.lower().translate(_LAYOUT)))
+            for entry, score in alternative.items():
+                scores.setdefault(entry, score * 0.9)
+        ranked = sorted(
+            scores.items(),
+            key=lambda item: (-(item[1] + HOME_BONUS * self.home[item[0]]), len(self.labels[item[0]][0])),
+        )
+        results = []
+        for entry, score in ranked[:limit]:
+            name, city, country = self.labels[entry]
+            results.append(SearchResult(self.codes[entry], name, city, country, round(score, 3)))
+        return results
@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+
+import polars as pl
+
+from config import CACHE_DIR, ICAO_XLS
+from instrumentation import inc, timed
+
+REQUIRED_COLUMNS = ("icao_code", "name_rus", "name_eng", "city_rus", "city_eng", "country_rus")
+
+
+# Справочник аэропортов с индексом ИКАО -> номер строки
+class AirportDirectory:
+    def __init__(self, df):
+        self.df = df
+        self.index = {}
+        # При повторах кода берём первую запись, как и прежний фильтр
+        for i, code in enumerate(df["icao_code"].to_list()):
+            if code is not None and code not in self.index:
+                self.index[code] = i
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, icao):
+        return icao in self.index
+
+    def get(self, icao):
+        i = self.index.get(icao)
+        if i is None:
+            return None
+        return self.df.row(i, named=True)
+
+    # Пакетный поиск: строки найденных кодов в порядке запроса
+    def get_many(self, icao_codes):
+        rows = [self.index[code] for code in icao_codes if code in self.index]
+        return self.df[rows]
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@timed("directory_read_xls")
+def _read_xls(xls_path):
+    df = pl.read_excel(xls_path)
+    if not set(REQUIRED_COLUMNS).issubset(df.columns):
+        raise ValueError(f"Файл {xls_path.name} должен содержать столбцы: {set(REQUIRED_COLUMNS)}")
+    return df.select(REQUIRED_COLUMNS).with_columns(
+        pl.col("icao_code").str.strip_chars().str.to_uppercase()
+    )
+
+
+# Загрузка справочника. XLS разбирается только при его изменении,
+# в остальных случаях читается Arrow IPC из кэша (через mmap).
+def load_directory(xls_path=ICAO_XLS, cache_dir=CACHE_DIR):
+    cache_path = cache_dir / (xls_path.stem + ".arrow")
+    meta_path = cache_dir / (xls_path.stem + ".arrow.json")
+    stat = xls_path.stat()
+
+    try:
+        meta = json.loads(meta_path.read_text())
+    except (OSError, ValueError):
+        meta = {}
+
+    if cache_path.exists() and meta:
+        unchanged = meta.get("mtime_ns") == stat.st_mtime_ns and meta.get("size") == stat.st_size
+        if not unchanged and meta.get("sha256") == _file_hash(xls_path):
+            # Файл «тронули», но содержимое то же - обновляем только метаданные
+            meta.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+            try:
+                _write_meta(meta_path, meta)
+            except OSError:
+                pass
+            unchanged = True
+        if unchanged:
+            try:
+                directory = AirportDirectory(pl.read_ipc(cache_path, memory_map=True))
+                inc("directory_cache_total", result="hit")
+                return directory
+            except (OSError, pl.exceptions.PolarsError):
+                pass
+
+    inc("directory_cache_total", result="miss")
+    df = _read_xls(xls_path)
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_suffix(".arrow.tmp")
+        df.write_ipc(tmp_path, compression="uncompressed")
+        os.replace(tmp_path, cache_path)
+        _write_meta(meta_path, {
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "sha256": _file_hash(xls_path),
+        })
+    except OSError:
+        # Без кэша тоже работаем, просто медленнее
+        pass
+    return AirportDirectory(df)
+
+
+def _write_meta(meta_path, meta):
+    tmp_path = meta_path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(meta))
+    os.replace(tmp_path, meta_path)
@@ -0,0 +1,328 @@
+import operator
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+
+from config import ALERT_RULES_PATH
+from metar_parser import flight_category, parse_metar, to_mps
+from taf_parser import parse_taf
+
+# Предупреждения по станциям: правила из alert_rules.txt разбираются один раз
+# в проверки вида «значение -> да/нет». Для каждой станции хранится последняя
+# сводка и сработавшие правила: новая сводка разбирается и проверяется только
+# если её текст изменился, а наружу отдаются лишь переходы (сработало/снято),
+# поэтому предупреждение не повторяется, пока условие держится.
+
+SEVERITIES = ("warning", "danger")
+SCOPES = ("metar", "taf")
+# На сколько часов вперёд смотреть в прогноз
+TAF_HORIZON = timedelta(hours=6)
+
+
+def _visibility(obs):
+    if obs.cavok:
+        return 10000
+    if obs.visibility is None:
+        return None
+    return 10000 if obs.visibility >= 9999 else obs.visibility
+
+
+def _to_mps(speed, unit):
+    speed = to_mps(speed, unit)
+    return None if speed is None else round(speed, 1)
+
+
+def _wind(obs):
+    return None if obs.wind is None else _to_mps(obs.wind.speed, obs.wind.unit)
+
+
+def _gust(obs):
+    return None if obs.wind is None else _to_mps(obs.wind.gust, obs.wind.unit)
+
+
+def _convective(obs):
+    return any(layer.cloud_type for layer in obs.clouds) or any("TS" in code for code in obs.weather)
+
+
+# Показатель: подпись, единица и как его получить из наблюдения
+METRICS = {
+    "visibility": ("Видимость", "м", _visibility),
+    "ceiling": ("Нижняя граница облаков", "м", lambda obs: obs.ceiling_m),
+    "wind": ("Ветер", "м/с", _wind),
+    "gust": ("Порывы", "м/с", _gust),
+    "temperature": ("Температура", "°C", lambda obs: obs.temperature),
+    "category": ("Категория условий", "", flight_category),
+    "convective": ("Кучево-дождевая облачность или гроза", "", _convective),
+    "weather": ("Явления", "", lambda obs: obs.weather),
+}
+
+OPERATORS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "==": operator.eq,
+    "!=": operator.ne,
+    "in": lambda value, options: value in options,
+    "has": lambda codes, part: any(part in code for code in codes),
+}
+
+
+# Пороговые сравнения и их направление: такие правила на один показатель объединяются
+_DIRECTIONS = {"<": "<", "<=": "<", ">": ">", ">=": ">"}
+
+
+@dataclass(slots=True, frozen=True)
+class Rule:
+    severity: str
+    scope: str
+    metric: str
+    op: str | None = None
+    threshold: object = None
+
+    @property
+    def name(self):
+        if self.op is None:
+            return self.metric
+        threshold = ",".join(self.threshold) if isinstance(self.threshold, frozenset) else self.threshold
+        return f"{self.metric} {self.op} {threshold}"
+
+    # Проверка значения показателя; неизвестное значение - не нарушение
+    def test(self, value):
+        if value is None:
+            return False
+        if self.op is None:
+            return bool(value)
+        return OPERATORS[self.op](value, self.threshold)
+
+
+@dataclass(slots=True)
+class Alert:
+    icao: str
+    rule: Rule
+    value: object
+    message: str
+    since: float
+    # Для прогноза: группа TAF, в которой ожидается условие
+    detail: str | None = None
+
+
+@dataclass(slots=True)
+class AlertEvent:
+    kind: str  # fired или cleared
+    alert: Alert
+
+
+@dataclass(slots=True)
+class _Station:
+    metar: str | None = None
+    taf: str | None = None
+    # Правило -> значение по фактической погоде
+    metar_hits: dict = field(default_factory=dict)
+    # (правило, значение, начало, конец, группа) по всем группам прогноза
+    taf_hits: list = field(default_factory=list)
+    active: dict = field(default_factory=dict)
+
+
+def parse_rule(line):
+    parts = line.split()
+    if len(parts) < 3:
+        raise ValueError("ожидается: уровень сводка показатель [сравнение порог]")
+    severity, scope, metric, *condition = parts
+    if severity not in SEVERITIES:
+        raise ValueError(f"неизвестный уровень {severity} (есть: {', '.join(SEVERITIES)})")
+    if scope not in SCOPES:
+        raise ValueError(f"неизвестная сводка {scope} (есть: {', '.join(SCOPES)})")
+    if metric not in METRICS:
+        raise ValueError(f"неизвестный показатель {metric} (есть: {', '.join(METRICS)})")
+    if not condition:
+        return Rule(severity, scope, metric)
+    if len(condition) != 2 or condition[0] not in OPERATORS:
+        raise ValueError(f"условие должно быть вида «{metric} < 1500»")
+    op, threshold = condition
+    if op == "in":
+        threshold = frozenset(threshold.upper().split(","))
+    elif op == "has":
+        threshold = threshold.upper()
+    else:
+        try:
+            threshold = float(threshold) if "." in threshold else int(threshold)
+        except ValueError:
+            threshold = threshold.upper()
+    return Rule(severity, scope, metric, op, threshold)
+
+
+# Правила из файла; после # - комментарий
+def load_rules(path=ALERT_RULES_PATH):
+    rules = []
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            try:
+                rules.append(parse_rule(line))
+            except ValueError as e:
+                raise ValueError(f"{path}, строка {number}: {e}") from None
+    return list(dict.fromkeys(rules))
+
+
+def format_value(metric, value):
+    label, unit, _ = METRICS[metric]
+    if isinstance(value, bool):
+        return label
+    if isinstance(value, list):
+        return f"{label}: {' '.join(value)}"
+    return f"{label}: {value} {unit}".rstrip()
+
+
+def _message(rule, value):
+    message = format_value(rule.metric, value)
+    return f"Прогноз: {message}" if rule.scope == "taf" else message
+
+
+def _format_time(value):
+    return f"{value:%d.%m %H:%M}" if value else "…"
+
+
+def _group_label(group):
+    if group.kind == 'BASE':
+        return "TAF"
+    if group.kind == 'PROB':
+        return f"PROB{group.probability}" + (" TEMPO" if group.tempo else "")
+    return group.kind
+
+
+# Значение a хуже b для порогового правила: меньше - для «<», больше - для «>»
+def _worse(rule, a, b):
+    direction = _DIRECTIONS.get(rule.op)
+    return direction == "<" and a < b or direction == ">" and a > b
+
+
+# Правило строже другого на тот же показатель: выше уровень, а при равном -
+# порог дальше (меньший для «<», больший для «>»)
+def _stricter(rule, other):
+    if rule.severity != other.severity:
+        return SEVERITIES.index(rule.severity) > SEVERITIES.index(other.severity)
+    return _worse(rule, rule.threshold, other.threshold)
+
+
+class AlertEngine:
+    def __init__(self, rules, horizon=TAF_HORIZON):
+        self.rules = list(rules)
+        self.horizon = horizon
+        self._metar_rules = [rule for rule in self.rules if rule.scope == "metar"]
+        self._taf_rules = [rule for rule in self.rules if rule.scope == "taf"]
+        # Показатели считаются только те, что встречаются в правилах
+        self._metar_metrics = {rule.metric: METRICS[rule.metric][2] for rule in self._metar_rules}
+        self._taf_metrics = {rule.metric: METRICS[rule.metric][2] for rule in self._taf_rules}
+        self.stations = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _hits(rules, extractors, obs):
+        values = {metric: extract(obs) for metric, extract in extractors.items()}
+        return {rule: values[rule.metric] for rule in rules if rule.test(values[rule.metric])}
+
+    def _evaluate_metar(self, metar):
+        if not self._metar_rules or not metar or metar == 'N/A':
+            return {}
+        obs = parse_metar(metar)
+        return {} if obs.nil else self._hits(self._metar_rules, self._metar_metrics, obs)
+
+    # Прогноз проверяется один раз при получении TAF: отрезки основного прогноза
+    # (FM действует до следующей FM, BECMG - с конца своего периода) и возможные
+    # изменения TEMPO/PROB/BECMG. Дальше по времени только выбираются отрезки,
+    # попавшие в горизонт
+    def _evaluate_taf(self, taf, now):
+        if not self._taf_rules or not taf or taf == 'N/A':
+            return []
+        forecast = parse_taf(taf, datetime.fromtimestamp(now, timezone.utc))
+        if forecast.nil or forecast.cancelled:
+            return []
+        periods = forecast.prevailing_periods()
+        for group in forecast.groups[1:]:
+            # Группы, время которых не разобралось, пропускаются (как в conditions_at)
+            if group.kind in ('TEMPO', 'PROB', 'BECMG') and group.start is not None and group.end is not None:
+                periods.append((group.start, group.end, group.conditions, group))
+        hits = []
+        for start, end, conditions, group in periods:
+            detail = f"{_group_label(group)} {_format_time(start)}–{_format_time(end)}"
+            for rule, value in self._hits(self._taf_rules, self._taf_metrics, conditions).items():
+                hits.append((rule, value, start, end, detail))
+        return hits
+
+    # Новая сводка станции; возвращает переходы предупреждений.
+    # Если тексты METAR и TAF не изменились, ничего не разбирается.
+    def update(self, icao, metar, taf=None, now=None):
+        now = now or time.time()
+        with self._lock:
+            station = self.stations.get(icao)
+            if station is None:
+                station = self.stations[icao] = _Station()
+            if metar != station.metar:
+                station.metar = metar
+                station.metar_hits = self._evaluate_metar(metar)
+            if taf is not None and taf != station.taf:
+                station.taf = taf
+                station.taf_hits = self._evaluate_taf(taf, now)
+            return self._transitions(icao, station, now)
+
+    def _transitions(self, icao, station, now):
+        current = {rule: (value, None) for rule, value in station.metar_hits.items()}
+        if station.taf_hits:
+            window_start = datetime.fromtimestamp(now, timezone.utc)
+            window_end = window_start + self.horizon
+            # Из отрезков прогноза в горизонте - худшее значение (для пороговых правил)
+            for rule, value, start, end, detail in station.taf_hits:
+                if (start is None or start < window_end) and (end is None or end > window_start):
+                    if rule not in current or _worse(rule, value, current[rule][0]):
+                        current[rule] = (value, detail)
+        # Из пороговых правил на один показатель (visibility < 800 и < 1500) -
+        # только самое строгое: сначала по уровню, затем по порогу;
+        # прочие (weather has FZ и has TS) не объединяются
+        strongest = {}
+        for rule in current:
+            key = (rule.scope, rule.metric, _DIRECTIONS.get(rule.op, rule))
+            if key not in strongest or _stricter(rule, strongest[key]):
+                strongest[key] = rule
+        current = {rule: current[rule] for rule in strongest.values()}
+
+        events = []
+        for rule in [rule for rule in station.active if rule not in current]:
+            events.append(AlertEvent("cleared", station.active.pop(rule)))
+        for rule, (value, detail) in current.items():
+            alert = station.active.get(rule)
+            if alert is None:
+                alert = station.active[rule] = Alert(icao, rule, value, _message(rule, value), now, detail)
+                events.append(AlertEvent("fired", alert))
+            else:
+                # Условие держится: обновляем значение, но не сообщаем повторно
+                alert.value, alert.message, alert.detail = value, _message(rule, value), detail
+        return events
+
+    def active(self, icao):
+        with self._lock:
+            station = self.stations.get(icao)
+            alerts = list(station.active.values()) if station else []
+        # Сначала опасные, затем фактическая погода раньше прогноза
+        return sorted(alerts, key=lambda alert: (-SEVERITIES.index(alert.rule.severity), alert.rule.scope, alert.since))
+
+    # Все действующие предупреждения: {ИКАО: [Alert]}
+    def all_active(self):
+        with self._lock:
+            icao_list = [icao for icao, station in self.stations.items() if station.active]
+        return {icao: self.active(icao) for icao in icao_list}
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_alerts():
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = AlertEngine(load_rules())
+        return _engine
@@ -0,0 +1,146 @@
+# Сравнение скорости расшифровки METAR: прежняя функция из test_page.py
+# против разбора metar_parser + render и пакетной расшифровки metar_bulk.
+# Запуск: python bench/bench_metar.py [число повторов корпуса]
+import re
+import sys
+import time
+from pathlib import Path
+
+import polars as pl
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from metar_bulk import decode_metars, with_metar_columns  # noqa: E402
+from metar_parser import parse_metar  # noqa: E402
+from render import render_metar  # noqa: E402
+
+CORPUS = Path(__file__).with_name("metar_corpus.txt")
+
+
+# Прежняя реализация decode_metar без изменений
+def legacy_decode_metar(metar):
+    if metar == 'N/A':
+        return "Данные METAR недоступны"
+
+    decoded = []
+    parts = metar.split()
+
+    DIRECTIONS = {
+        'N': 'северный', 'NE': 'северо-восточный', 'E': 'восточный',
+        'SE': 'юго-восточный', 'S': 'южный', 'SW': 'юго-западный',
+        'W': 'западный', 'NW': 'северо-западный'
+    }
+
+    CLOUD_TYPES = {
+        'FEW': 'незначительная (1-2/8 неба)',
+        'SCT': 'разрозненные (3-4/8 неба)',
+        'BKN': 'значительная (5-7/8 неба)',
+        'OVC': 'сплошная (8/8 неба)'
+    }
+
+    for part in parts:
+        if re.match(r'^\d{6}Z$', part):
+            time_str = f"{part[2:4]}:{part[4:6]} UTC {part[:2]} числа"
+            decoded.append(f"🕒 Время наблюдения: {time_str}")
+
+        elif re.match(r'^(\d{3})(\d{2,3})(G\d{2,3})?(KT|MPS|KMH)$', part):
+            match = re.match(r'^(\d{3})(\d{2,3})(G\d{2,3})?(KT|MPS|KMH)?$', part)
+            wind_dir = int(match.group(1))
+            wind_speed = match.group(2)
+            gust = match.group(3)[1:] if match.group(3) else None
+            unit = 'м/с' if match.group(4) == 'MPS' else 'узлов'
+
+            dir_deg = (wind_dir + 22) // 45 * 45 % 360
+            compass = {
+                0: 'северный', 45: 'северо-восточный', 90: 'восточный',
+                135: 'юго-восточный', 180: 'южный', 225: 'юго-западный',
+                270: 'западный', 315: 'северо-западный'
+            }.get(dir_deg, '')
+
+            wind_str = f"🌬️ Ветер: {wind_dir}° ({compass}) {wind_speed} {unit}"
+            if gust:
+                wind_str += f", порывы до {gust} {unit}"
+            decoded.append(wind_str)
+
+        elif re.match(r'^\d{4}$', part):
+            vis = int(part)
+            if vis >= 10000:
+                decoded.append("👀 Видимость: 10+ км")
+            else:
+                decoded.append(f"👀 Видимость: {vis//1000 if vis%1000==0 else vis/1000:.1f} км")
+        elif part == 'CAVOK':
+            decoded.append("👀 Видимость: 10+ км, без осадков и значительной облачности")
+
+        elif re.match(r'^(FEW|SCT|BKN|OVC)\d{3}(CB|TCU)?$', part):
+            cloud_type = CLOUD_TYPES.get(part[:3], part[:3])
+            height = int(part[3:6]) * 30
+            cloud_str = f"   - {cloud_type} на {height} метрах"
+            if 'CB' in part:
+                cloud_str += " (кучево-дождевые)"
+            elif 'TCU' in part:
+                cloud_str += " (башнеобразные)"
+
+            if not any('☁️ Облачность:' in s for s in decoded):
+                decoded.append("☁️ Облачность:")
+            decoded.append(cloud_str)
+
+        elif re.match(r'^(M?\d{2})/(M?\d{2})$', part):
+            temp, dew = part.split('/')
+            temp = temp.replace('M', '-')
+            dew = dew.replace('M', '-')
+            decoded.append(f"🌡️ Температура: {temp}°C, точка росы: {dew}°C")
+
+        elif re.match(r'^Q\d{4}$', part):
+            pressure = part[1:]
+            decoded.append(f"⏱️ Давление: {pressure} гПа (QNH)")
+
+    return "\n".join(decoded)
+
+
+def new_decode_metar(metar):
+    return render_metar(parse_metar(metar))
+
+
+def measure(func, reports, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for report in reports:
+            func(report)
+    return time.perf_counter() - start
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    reports = [line.strip() for line in CORPUS.read_text().splitlines() if line.strip()]
+    total = len(reports) * repeat
+
+    cases = [
+        ("прежний decode_metar", legacy_decode_metar),
+        ("parse_metar + render_metar", new_decode_metar),
+        ("только parse_metar", parse_metar),
+    ]
+    results = {}
+    for name, func in cases:
+        elapsed = measure(func, reports, repeat)
+        results[name] = elapsed
+        print(f"{name:32s} {total / elapsed:12,.0f} сводок/с  {elapsed / total * 1e6:7.2f} мкс/сводку")
+
+    # Пакетная расшифровка: весь корпус одним столбцом. Отдельно - только сводки
+    # стандартного вида, без построчного разбора нестандартных через parse_metar.
+    flags = with_metar_columns(pl.LazyFrame({"metar": reports})).select("_fallback").collect()
+    standard = [metar for metar, fallback in zip(reports, flags["_fallback"]) if not fallback]
+    for name, batch in (("metar_bulk.decode_metars", reports), ("metar_bulk, только стандартные", standard)):
+        batch = batch * repeat
+        start = time.perf_counter()
+        decode_metars(batch)
+        elapsed = time.perf_counter() - start
+        results[name] = elapsed / len(batch) * total
+        print(f"{name:32s} {len(batch) / elapsed:12,.0f} сводок/с  {elapsed / len(batch) * 1e6:7.2f} мкс/сводку")
+
+    base = results[cases[0][0]]
+    for name in list(results)[1:]:
+        print(f"ускорение ({name}): x{base / results[name]:.1f}")
+
+
+if __name__ == "__main__":
+    main()
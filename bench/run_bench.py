@@ -0,0 +1,250 @@
+# Замеры скорости и памяти основных путей: расшифровка METAR/TAF, загрузка
+# справочника аэропортов, поиск аэропорта, получение сводок (через локальную
+# заглушку сервиса) и запуск приложения до первой отрисовки.
+# Результат сравнивается с bench/baseline.json.
+#
+#   python bench/run_bench.py                  # замер и сравнение с базой
+#   python bench/run_bench.py --save-baseline  # записать новую базу
+#   python bench/run_bench.py --only metar     # только случаи, в имени которых есть metar
+#
+# Код выхода 1, если какой-то показатель хуже базы больше чем на --threshold.
+# База зависит от машины: после смены окружения её нужно перезаписать.
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import ExitStack
+from functools import cache
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent))
+# Сводки - только от заглушки: основной источник metartaf, запасной - пустой
+# каталог сброса (aviationweather ходил бы в сеть)
+os.environ["VARTOVSK_SOURCES"] = "metartaf,files"
+os.environ["VARTOVSK_DROP_DIR"] = str(BENCH_DIR / "no-drop")
+
+import metar_fetch  # noqa: E402
+import sources  # noqa: E402
+from airport_search import AirportSearch  # noqa: E402
+from airports import AirportDirectory, _read_xls, load_directory  # noqa: E402
+from config import ICAO_XLS  # noqa: E402
+from metar_bulk import decode_metars  # noqa: E402
+from metar_parser import parse_metar  # noqa: E402
+from render import render_metar, render_taf  # noqa: E402
+from stub_server import StubServer  # noqa: E402
+from taf_parser import parse_taf  # noqa: E402
+
+BASELINE = BENCH_DIR / "baseline.json"
+THRESHOLD = 0.25
+# Показатель и в какую сторону он лучше
+METRICS = {"throughput": "higher", "p50_us": "lower", "p95_us": "lower", "peak_kib": "lower"}
+
+
+def read_corpus(name):
+    return [line.strip() for line in (BENCH_DIR / name).read_text(encoding="utf-8").splitlines() if line.strip()]
+
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+# Время каждого вызова func(item) и пиковая память одного прохода по items
+def measure(func, items, repeat=1):
+    for item in items[:3]:
+        func(item)
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for item in items:
+            t0 = time.perf_counter_ns()
+            func(item)
+            latencies.append(time.perf_counter_ns() - t0)
+    elapsed = time.perf_counter() - started
+
+    # Память - отдельным проходом: tracemalloc сильно замедляет вызовы
+    tracemalloc.start()
+    for item in items:
+        func(item)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "calls": len(latencies),
+        "throughput": round(len(latencies) / elapsed, 1),
+        "p50_us": round(percentile(latencies, 0.50) / 1000, 1),
+        "p95_us": round(percentile(latencies, 0.95) / 1000, 1),
+        "p99_us": round(percentile(latencies, 0.99) / 1000, 1),
+        "mean_us": round(statistics.fmean(latencies) / 1000, 1),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+# Запуск в новом процессе: импорт streamlit и первый проход страницы
+# (streamlit_app.py - страница по умолчанию; сводки только из пустого кэша - без сети).
+# Пиковый RSS печатает сам процесс (VmHWM, КиБ): ru_maxrss после fork+exec
+# наследует пик родителя, то есть самого run_bench.py.
+STARTUP_PROBE = (
+    "from streamlit.testing.v1 import AppTest\n"
+    "at = AppTest.from_file({page!r}, default_timeout=60)\n"
+    "at.run()\n"
+    "assert not at.exception, at.exception\n"
+    "print(next(line.split()[1] for line in open('/proc/self/status') if line.startswith('VmHWM')))\n"
+)
+
+
+# Время до первой отрисовки и память процесса (пиковый RSS, а не tracemalloc)
+def measure_startup(runs, page="streamlit_app.py"):
+    latencies = []
+    peak = 0
+    with tempfile.TemporaryDirectory() as cache_dir:
+        env = dict(os.environ, VARTOVSK_CACHE_DIR=cache_dir, VARTOVSK_CACHE_READ_ONLY="1")
+        for i in range(runs + 1):
+            t0 = time.perf_counter_ns()
+            probe = subprocess.run([sys.executable, "-c", STARTUP_PROBE.format(page=page)], cwd=BENCH_DIR.parent,
+                                   env=env, check=True, capture_output=True, text=True)
+            peak = max(peak, int(probe.stdout.split()[-1]))
+            if i:  # первый запуск строит кэш справочника
+                latencies.append(time.perf_counter_ns() - t0)
+    latencies.sort()
+    return {
+        "calls": len(latencies),
+        "throughput": round(len(latencies) / (sum(latencies) / 1e9), 2),
+        "p50_us": round(percentile(latencies, 0.50) / 1000, 1),
+        "p95_us": round(percentile(latencies, 0.95) / 1000, 1),
+        "p99_us": round(percentile(latencies, 0.99) / 1000, 1),
+        "mean_us": round(statistics.fmean(latencies) / 1000, 1),
+        "peak_kib": peak,
+    }
+
+
+def decode_metar(metar):
+    return render_metar(parse_metar(metar))
+
+
+def decode_taf(taf):
+    return render_taf(parse_taf(taf))
+
+
+# Случаи замеров: (имя, запуск). Подготовка (справочник, индекс поиска, заглушка
+# сервиса) делается при первом запуске случая, которому она нужна, поэтому
+# --only не строит лишнего. Заглушка останавливается через stack.
+def cases(args, stack):
+    metars = read_corpus("metar_corpus.txt")
+    tafs = read_corpus("taf_corpus.txt")
+    yield "decode_metar", lambda: measure(decode_metar, metars, args.repeat)
+    yield "decode_taf", lambda: measure(decode_taf, tafs, args.repeat)
+    yield "decode_metars_bulk", lambda: measure(decode_metars, [metars * 100], max(1, args.repeat // 10))
+
+    # Справочник: разбор XLS и загрузка из кэша Arrow
+    @cache
+    def directory_cache():
+        cache_dir = Path(stack.enter_context(tempfile.TemporaryDirectory()))
+        load_directory(cache_dir=cache_dir)
+        return cache_dir
+
+    @cache
+    def directory():
+        return load_directory(cache_dir=directory_cache())
+
+    def lookups():
+        random.seed(1)
+        return random.sample(list(directory().index), 1000) + ["ZZZZ"] * 10
+
+    # Поиск по мере набора: каждый префикс запроса - отдельный вызов
+    queries = ["нижневартовск", "Sheremetyevo", "москва дом", "khabarovsk", "нижнивартоск", "yb;ytdfhnjdcr", "usn"]
+    keystrokes = [query[:n] for query in queries for n in range(1, len(query) + 1)]
+
+    yield "airports_xls", lambda: measure(lambda path: AirportDirectory(_read_xls(path)), [ICAO_XLS])
+    yield "airports_cached", lambda: measure(lambda path: load_directory(path, directory_cache()), [ICAO_XLS], 5)
+    yield "airport_lookup", lambda: measure(directory().get, lookups(), args.repeat)
+    yield "airport_search", lambda: measure(AirportSearch(directory()).search, keystrokes, max(1, args.repeat // 5))
+
+    # Получение сводок тем же путём, что в приложении (sources.fetch_reports:
+    # автомат защиты, дублирование, запасной источник), от заглушки с задержкой
+    @cache
+    def stations():
+        stub = StubServer(latency=args.latency / 1000, jitter=args.latency / 4000).start()
+        stack.callback(stub.stop)
+        metar_fetch.BASE_URL = stub.url
+        return list(stub.reports)
+
+    yield "fetch_one", lambda: measure(sources.fetch_reports, stations()[:20])
+    yield "fetch_many", lambda: measure(
+        lambda codes: list(metar_fetch.fetch_many(codes, fetch=sources.fetch_reports)), [stations()], 3
+    )
+
+    yield "startup", lambda: measure_startup(max(3, args.repeat // 10))
+    yield "startup_metar_app", lambda: measure_startup(max(3, args.repeat // 10), "metar_app.py")
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for metric, better in METRICS.items():
+            old, new = base.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            if metric == "p95_us" and result["calls"] < 100:
+                continue  # по нескольким вызовам хвост распределения - это шум
+            change = (new - old) / old if better == "lower" else (old - new) / old
+            if change > threshold:
+                regressions.append(f"{name}.{metric}: {old} -> {new} ({change:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замеры производительности")
+    parser.add_argument("--repeat", type=int, default=50, help="повторов корпуса для расшифровки и поиска")
+    parser.add_argument("--latency", type=float, default=50, help="задержка заглушки сервиса, мс")
+    parser.add_argument("--only", help="только случаи с этой подстрокой в имени")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="допустимое ухудшение (0.25 = 25%%)")
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--json", action="store_true", help="вывести результаты в JSON")
+    args = parser.parse_args()
+
+    results = {}
+    with ExitStack() as stack:
+        for name, run in cases(args, stack):
+            if args.only and args.only not in name:
+                continue
+            results[name] = run()
+            if not args.json:
+                r = results[name]
+                print(f"{name:<20} {r['throughput']:>12,.1f}/с  p50 {r['p50_us']:>10,.1f} мкс  "
+                      f"p95 {r['p95_us']:>10,.1f} мкс  p99 {r['p99_us']:>10,.1f} мкс  память {r['peak_kib']:>9,.1f} КиБ")
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+
+    if args.save_baseline:
+        baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+        baseline.update(results)
+        args.baseline.write_text(json.dumps(baseline, ensure_ascii=False, indent=2) + "\n")
+        print(f"База записана: {args.baseline}")
+        return
+
+    if not args.baseline.exists():
+        print("Базы нет: запустите с --save-baseline")
+        return
+    regressions = compare(results, json.loads(args.baseline.read_text()), args.threshold)
+    if regressions:
+        print("Ухудшения относительно базы:")
+        for line in regressions:
+            print("  " + line)
+        sys.exit(1)
+    print("Ухудшений относительно базы нет")
+
+
+if __name__ == "__main__":
+    main()
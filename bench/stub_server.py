@@ -0,0 +1,113 @@
+# Локальная замена metartaf.ru для замеров без сети.
+# Отдаёт /<ICAO>.json с последними сводками станции из корпусов bench/,
+# поддерживает ETag (ответ 304) и умеет добавлять задержку и ошибки.
+#
+# Запуск: python bench/stub_server.py --port 8765 --latency 200 --jitter 50
+# затем:  VARTOVSK_METARTAF_URL=http://127.0.0.1:8765 streamlit run streamlit_app.py
+import argparse
+import http.server
+import json
+import random
+import threading
+import time
+import zlib
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+
+
+def load_reports():
+    reports = {}
+    for name, key in (("metar_corpus.txt", 0), ("taf_corpus.txt", 1)):
+        for line in (BENCH_DIR / name).read_text(encoding="utf-8").splitlines():
+            tokens = line.replace('=', '').split()
+            station = next((t for t in tokens if len(t) == 4 and t.isalpha() and t not in ('TAF', 'COR', 'AMD')), None)
+            if station:
+                reports.setdefault(station, [None, None])[key] = line.strip()
+    return reports
+
+
+class StubServer:
+    # latency/jitter - секунды, error_rate - доля ответов 503
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, port=0, reports=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.reports = reports or load_reports()
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = http.server.ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def _handler(self):
+        stub = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Иначе заголовки и тело уходят разными пакетами и ответ ждёт отложенного ACK
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                with stub._lock:
+                    stub.requests += 1
+                delay = stub.latency + random.uniform(-stub.jitter, stub.jitter)
+                if delay > 0:
+                    time.sleep(delay)
+                if stub.error_rate and random.random() < stub.error_rate:
+                    self._send(503, b"", "text/plain")
+                    return
+                icao = self.path.strip("/").split(".")[0].upper()
+                metar, taf = stub.reports.get(icao, (None, None))
+                body = json.dumps({"metar": metar, "taf": taf}).encode()
+                etag = f'"{zlib.crc32(body):08x}"'
+                if self.headers.get("If-None-Match") == etag:
+                    self._send(304, b"", "application/json", etag)
+                    return
+                self._send(200, body, "application/json", etag)
+
+            def _send(self, status, body, content_type, etag=None):
+                self.send_response(status)
+                self.send_header("content-type", content_type)
+                self.send_header("content-length", str(len(body)))
+                if etag:
+                    self.send_header("etag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальная заглушка сервиса METAR/TAF")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0, help="задержка ответа, мс")
+    parser.add_argument("--jitter", type=float, default=0, help="разброс задержки, мс")
+    parser.add_argument("--error-rate", type=float, default=0, help="доля ответов 503")
+    args = parser.parse_args()
+    stub = StubServer(args.latency / 1000, args.jitter / 1000, args.error_rate, args.port)
+    print(f"VARTOVSK_METARTAF_URL={stub.url} (станций: {len(stub.reports)})")
+    try:
+        stub._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+import os
+from pathlib import Path
+
+# Корень проекта: файлы данных ищутся относительно него, а не текущего каталога
+BASE_DIR = Path(__file__).resolve().parent
+
+# Каталог для кэшей и локальных хранилищ
+CACHE_DIR = Path(os.environ.get("VARTOVSK_CACHE_DIR", BASE_DIR / ".cache"))
+
+# Справочник аэропортов
+ICAO_XLS = BASE_DIR / "ICAO.xls"
+
+# Станции, которые poller.py держит в актуальном состоянии
+WATCHLIST_PATH = Path(os.environ.get("VARTOVSK_WATCHLIST", BASE_DIR / "watchlist.txt"))
+
+# Страницы только читают локальное хранилище и не обращаются к сервису
+# (включается, когда сводки загружает poller.py)
+CACHE_READ_ONLY = os.environ.get("VARTOVSK_CACHE_READ_ONLY", "") not in ("", "0")
+
+# Замеры времени и счётчики (instrumentation.py); VARTOVSK_METRICS=0 - выключить
+METRICS_ENABLED = os.environ.get("VARTOVSK_METRICS", "1") not in ("", "0")
+# Файл метрик в формате Prometheus (для textfile-коллектора node_exporter)
+METRICS_PATH = Path(os.environ.get("VARTOVSK_METRICS_PATH", CACHE_DIR / "metrics.prom"))
+# Порт HTTP-выдачи /metrics; не задан - не запускается
+METRICS_PORT = int(os.environ.get("VARTOVSK_METRICS_PORT", "0"))
+# Адрес HTTP-выдачи /metrics (0.0.0.0 - все интерфейсы)
+METRICS_HOST = os.environ.get("VARTOVSK_METRICS_HOST", "127.0.0.1")
+# Страница диагностики видна в меню (иначе - только по адресу ?diagnostics=1)
+DIAGNOSTICS = os.environ.get("VARTOVSK_DIAGNOSTICS", "") not in ("", "0")
+
+# Источники сводок в порядке обращения (sources.py): metartaf, aviationweather, files
+SOURCES = [name.strip() for name in os.environ.get("VARTOVSK_SOURCES", "metartaf,aviationweather,files").split(",") if name.strip()]
+# Каталог, куда внешние системы кладут сводки файлами <ICAO>.json, .xml или .txt
+DROP_DIR = Path(os.environ.get("VARTOVSK_DROP_DIR", BASE_DIR / "drop"))
+
+# Правила предупреждений (alerts.py)
+ALERT_RULES_PATH = Path(os.environ.get("VARTOVSK_ALERT_RULES", BASE_DIR / "alert_rules.txt"))
@@ -0,0 +1,117 @@
+from datetime import datetime
+
+import polars as pl
+import streamlit as st
+
+from config import METRICS_ENABLED, METRICS_PATH
+from instrumentation import get_metrics
+from sources import get_upstream
+
+st.title("🩺 Диагностика")
+
+# Показатели этого процесса streamlit с момента запуска; poller.py - отдельный
+# процесс, его показатели - в файле METRICS_PATH
+metrics = get_metrics()
+if not METRICS_ENABLED:
+    st.warning("Замеры выключены (VARTOVSK_METRICS=0)")
+st.caption(f"Процесс запущен: {datetime.fromtimestamp(metrics.started):%Y-%m-%d %H:%M:%S}")
+
+counters, histograms = metrics.snapshot()
+
+def format_labels(labels):
+    return ", ".join(f"{name}={value}" for name, value in labels)
+
+def counter(name, **labels):
+    return counters.get((name, tuple(sorted(labels.items()))), 0)
+
+# Время выполнения: гистограммы замеров
+st.subheader("Время выполнения")
+rows = [
+    {
+        "Замер": name.removesuffix("_seconds"),
+        "Метки": format_labels(labels),
+        "Вызовов": histogram.count,
+        "Среднее, мс": round(histogram.sum / histogram.count * 1000, 2) if histogram.count else None,
+        "p50, мс": round(histogram.quantile(0.5) * 1000, 2),
+        "p95, мс": round(histogram.quantile(0.95) * 1000, 2),
+        "Всего, с": round(histogram.sum, 3),
+    }
+    for (name, labels), histogram in sorted(histograms.items(), key=lambda item: -item[1].sum)
+]
+if rows:
+    st.dataframe(rows, hide_index=True)
+else:
+    st.info("Замеров пока нет: откройте страницу со сводками")
+
+# Кэши: доля попаданий
+st.subheader("Кэши")
+col1, col2 = st.columns(2)
+fresh, stale, miss = (counter("metar_cache_total", result=result) for result in ("fresh", "stale", "miss"))
+total = fresh + stale + miss
+col1.metric("Кэш сводок: свежие", f"{fresh / total:.0%}" if total else "—", f"устаревшие {stale}, нет {miss}", delta_color="off")
+hit, miss = counter("directory_cache_total", result="hit"), counter("directory_cache_total", result="miss")
+col2.metric("Справочник из кэша Arrow", f"{hit} из {hit + miss}" if hit + miss else "—")
+
+# Запросы к сервису по станциям
+st.subheader("Запросы к сервису")
+upstream = [
+    {"icao": dict(labels)["icao"], "outcome": dict(labels)["outcome"], "n": value}
+    for (name, labels), value in counters.items()
+    if name == "upstream_requests_total"
+]
+if upstream:
+    by_station = (
+        pl.DataFrame(upstream)
+        .pivot("outcome", index="icao", values="n", aggregate_function="sum")
+        .fill_null(0)
+    )
+    for outcome in ("ok", "not_modified", "error"):
+        if outcome not in by_station.columns:
+            by_station = by_station.with_columns(pl.lit(0).alias(outcome))
+    by_station = by_station.with_columns(
+        total=pl.col("ok") + pl.col("not_modified") + pl.col("error"),
+    ).with_columns(
+        error_rate=(pl.col("error") / pl.col("total") * 100).round(1),
+    ).sort(["error", "total"], descending=True)
+    st.dataframe(
+        by_station.select("icao", "total", "ok", "not_modified", "error", "error_rate"),
+        column_config={
+            "icao": "ИКАО", "total": "Запросов", "ok": "Новые данные", "not_modified": "Без изменений (304)",
+            "error": "Ошибок", "error_rate": "Ошибок, %",
+        },
+        hide_index=True,
+    )
+else:
+    st.info("Запросов к сервису из этого процесса не было")
+
+# Источники сводок: порядок обращения и состояние автоматов защиты
+st.subheader("Источники сводок")
+st.dataframe(
+    [
+        {
+            "Источник": source.name,
+            "Хост": source.breaker.host,
+            "Автомат": {"closed": "✅ замкнут", "open": "⛔ разомкнут", "half_open": "🔄 проба"}[source.breaker.state],
+            "Сбоев подряд": source.breaker.failures,
+            "Ответов": counter("source_requests_total", source=source.name, outcome="ok"),
+            "Дублирование через, мс": round(source.hedge_delay() * 1000),
+        }
+        for source in get_upstream().sources
+    ],
+    hide_index=True,
+)
+
+# Те же показатели для Prometheus
+st.subheader("Формат Prometheus")
+# Файл METRICS_PATH пишет только poller.py: запись отсюда затирала бы его показатели
+text = metrics.render()
+st.download_button("Скачать metrics.prom", text, file_name="metrics.prom", mime="text/plain")
+with st.expander("Текст"):
+    st.code(text, language="text")
+if METRICS_PATH.exists():
+    with st.expander(f"Файл {METRICS_PATH} (изменён {datetime.fromtimestamp(METRICS_PATH.stat().st_mtime):%H:%M:%S})"):
+        st.code(METRICS_PATH.read_text(encoding="utf-8"), language="text")
+
+if st.button("Сбросить показатели"):
+    metrics.reset()
+    st.rerun()
@@ -0,0 +1,190 @@
+import io
+from datetime import datetime, timezone
+
+import polars as pl
+
+from metar_bulk import decode_metars
+from metar_parser import parse_metar
+from render import render_metar, render_taf
+from taf_parser import parse_taf
+from vartovsk.stations import station_name
+
+# Выгрузка сводок в файлы CSV, Parquet и Excel. Данные приходят частями
+# (DataFrame за DataFrame) и пишутся сразу, поэтому длинный период из архива
+# не собирается в памяти целиком: в памяти - одна часть и буфер записи.
+
+FORMATS = ("csv", "parquet", "xlsx")
+MIME_TYPES = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+# Строк на листе Excel (ограничение формата - 1 048 576 вместе с заголовком)
+XLSX_MAX_ROWS = 1_048_575
+# Сводок в одной части при выгрузке из архива
+BATCH_SIZE = 20_000
+
+
+def format_from_path(path):
+    suffix = str(path).rsplit(".", 1)[-1].lower()
+    if suffix not in FORMATS:
+        raise ValueError(f"Неизвестный формат .{suffix} (есть: {', '.join(FORMATS)})")
+    return suffix
+
+
+# Для CSV и Excel: списки (явления, слои облаков) - строкой через пробел,
+# время - без часового пояса (всё в UTC)
+def flatten(df):
+    return df.with_columns(
+        *(pl.col(name).cast(pl.List(pl.String)).list.join(" ") for name, dtype in df.schema.items()
+          if isinstance(dtype, pl.List)),
+        pl.col(pl.Datetime).dt.replace_time_zone(None),
+    )
+
+
+# Файл открывается один раз: части дописываются, заголовок - только у первой
+class CsvWriter:
+    def __init__(self, target):
+        self._owned = not hasattr(target, "write")
+        self.file = open(target, "wb") if self._owned else target
+        self._header = True
+
+    def write(self, df):
+        flatten(df).write_csv(self.file, include_header=self._header)
+        self._header = False
+
+    def close(self):
+        if self._owned:
+            self.file.close()
+
+
+# Каждая часть - отдельная группа строк Parquet; схема берётся из первой части
+class ParquetWriter:
+    def __init__(self, target):
+        self.target = target
+        self._writer = None
+
+    def write(self, df):
+        import pyarrow.parquet as pq
+
+        table = df.to_arrow()
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.target, table.schema, compression="zstd")
+        self._writer.write_table(table.cast(self._writer.schema))
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            pq.write_table(pa.table({}), self.target)
+
+
+# openpyxl в режиме write_only: строки уходят во временный файл,
+# а не копятся в памяти; при переполнении листа начинается следующий
+class XlsxWriter:
+    def __init__(self, target, sheet_title="Сводки"):
+        from openpyxl import Workbook
+
+        self.target = target
+        self.sheet_title = sheet_title
+        self.workbook = Workbook(write_only=True)
+        self.sheet = None
+        self.rows = 0
+        self.sheets = 0
+        self.columns = None
+
+    def _new_sheet(self):
+        self.sheets += 1
+        title = self.sheet_title if self.sheets == 1 else f"{self.sheet_title} {self.sheets}"
+        self.sheet = self.workbook.create_sheet(title)
+        self.sheet.append(self.columns)
+        self.rows = 0
+
+    def write(self, df):
+        if self.columns is None:
+            self.columns = df.columns
+            self._new_sheet()
+        for row in flatten(df).iter_rows():
+            if self.rows == XLSX_MAX_ROWS:
+                self._new_sheet()
+            self.sheet.append(row)
+            self.rows += 1
+
+    def close(self):
+        if self.sheet is None:
+            self.workbook.create_sheet(self.sheet_title)
+        self.workbook.save(self.target)
+
+
+WRITERS = {"csv": CsvWriter, "parquet": ParquetWriter, "xlsx": XlsxWriter}
+
+
+# Запись последовательности DataFrame (с одинаковыми столбцами) в файл или буфер.
+# Возвращает число строк.
+def write_frames(frames, target, fmt):
+    if fmt not in WRITERS:
+        raise ValueError(f"Неизвестный формат {fmt} (есть: {', '.join(FORMATS)})")
+    rows = 0
+    writer = WRITERS[fmt](target)
+    try:
+        for df in frames:
+            if df.height:
+                writer.write(df)
+                rows += df.height
+    finally:
+        writer.close()
+    return rows
+
+
+# То же в память - для кнопки скачивания
+def to_bytes(frames, fmt):
+    buffer = io.BytesIO()
+    write_frames(frames, buffer, fmt)
+    return buffer.getvalue()
+
+
+def _render(text, parse, render):
+    if not text or text == 'N/A':
+        return None
+    try:
+        return render(parse(text))
+    except Exception:
+        return None
+
+
+# Сводная таблица по станциям табло: исходные сводки, расшифровка METAR
+# по столбцам и текстом, текст прогноза. results - metar_fetch.FetchResult,
+# airports - справочник для названий (необязательно).
+def board_frame(results, airports=None):
+    rows = []
+    for result in results:
+        row = airports.get(result.icao) if airports is not None else None
+        rows.append({
+            "icao": result.icao,
+            "name": station_name(row) if row else None,
+            "fetched_at": datetime.fromtimestamp(result.fetched_at, timezone.utc) if result.fetched_at else None,
+            "error": result.error,
+            "metar": None if result.metar == 'N/A' else result.metar,
+            "taf": None if result.taf == 'N/A' else result.taf,
+            "metar_text": _render(result.metar, parse_metar, render_metar),
+            "taf_text": _render(result.taf, parse_taf, render_taf),
+        })
+    df = pl.DataFrame(rows, schema={
+        "icao": pl.String, "name": pl.String, "fetched_at": pl.Datetime("ms", "UTC"), "error": pl.String,
+        "metar": pl.String, "taf": pl.String, "metar_text": pl.String, "taf_text": pl.String,
+    })
+    decoded = decode_metars(df.select(pl.col("metar").fill_null("")), column="metar").drop("metar", "station")
+    return pl.concat([df.drop("metar_text", "taf_text"), decoded, df.select("metar_text", "taf_text")], how="horizontal")
+
+
+def export_board(results, target, fmt, airports=None):
+    return write_frames([board_frame(results, airports)], target, fmt)
+
+
+# Архив за период: METAR - с расшифровкой по столбцам, TAF - исходным текстом
+def export_history(history, icaos, start, end, target, fmt, kind='METAR', batch_size=BATCH_SIZE):
+    frames = history.iter_query(icaos, start, end, kind, decode=kind == 'METAR', batch_size=batch_size)
+    return write_frames(frames, target, fmt)
@@ -0,0 +1,188 @@
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+import polars as pl
+
+from config import CACHE_DIR
+from metar_bulk import decode_metars, scan_metar_file
+from metar_parser import resolve_time
+
+# Архив всех полученных и загруженных из файлов сводок (только добавление).
+# Ключ - (станция, вид сводки, время наблюдения/выпуска): повторно полученная
+# сводка не дублируется. Первичный ключ WITHOUT ROWID хранит строки станции
+# подряд по времени, поэтому выборка за период - один проход по индексу.
+
+HISTORY_PATH = CACHE_DIR / "history.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    icao TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    obs_time INTEGER NOT NULL,
+    raw TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (icao, kind, obs_time)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS reports_time ON reports (obs_time);
+"""
+
+# Время в базе - unix-секунды, в выборке - Datetime UTC
+_ROW_SCHEMA = {
+    "icao": pl.String,
+    "kind": pl.String,
+    "obs_time": pl.Int64,
+    "raw": pl.String,
+    "fetched_at": pl.Int64,
+}
+_TIME = pl.Datetime("ms", "UTC")
+
+# Станция и время в заголовке METAR/SPECI/TAF: "UUEE 181230Z"
+_HEADER = re.compile(r'(?:^| )([A-Z][A-Z0-9]{3}) (\d\d)(\d\d)(\d\d)Z(?: |$)')
+
+
+# Время наблюдения (выпуска) сводки, unix-время; reference - момент получения
+def report_time(raw, reference):
+    m = _HEADER.search(raw)
+    if m is None:
+        return None, None
+    day, hour, minute = int(m[2]), int(m[3]), int(m[4])
+    if not 1 <= day <= 31 or hour > 24 or minute > 59:
+        return m[1], None
+    return m[1], int(resolve_time(day, hour, minute, reference).timestamp())
+
+
+def _timestamp(value):
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp())
+    return int(value)
+
+
+class HistoryStore:
+    def __init__(self, path=HISTORY_PATH):
+        self.path = path
+        self._local = threading.local()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    # Строки (icao, kind, raw, fetched_at); сводки без распознанного времени пропускаются
+    def append_many(self, rows):
+        records = []
+        for icao, kind, raw, fetched_at in rows:
+            raw = raw.strip() if raw else raw
+            if not raw or raw == 'N/A':
+                continue
+            station, obs_time = report_time(raw, datetime.fromtimestamp(fetched_at, timezone.utc))
+            if obs_time is None:
+                continue
+            records.append((icao or station, kind, obs_time, raw, fetched_at))
+        return self._insert(records)
+
+    # Одной транзакцией; возвращает число новых записей
+    def _insert(self, records):
+        if not records:
+            return 0
+        db = self._connection()
+        with db:
+            db.execute("BEGIN")
+            before = db.total_changes
+            db.executemany(
+                "INSERT OR IGNORE INTO reports (icao, kind, obs_time, raw, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                records,
+            )
+            return db.total_changes - before
+
+    # Сводки, полученные из сервиса
+    def append(self, icao, metar, taf, fetched_at=None):
+        fetched_at = fetched_at or time.time()
+        return self.append_many([(icao, 'METAR', metar, fetched_at), (icao, 'TAF', taf, fetched_at)])
+
+    # Архив из файла (текст - сводка в строке, или CSV со столбцом column).
+    # Без time_column день месяца в сводке привязывается к ближайшей к reference
+    # дате, поэтому reference обязателен: от текущей даты старый архив попал бы
+    # не в тот месяц
+    def ingest_file(self, path, kind='METAR', column="metar", time_column=None, reference=None):
+        if time_column is None and reference is None:
+            raise ValueError("без столбца времени нужна опорная дата архива (reference)")
+        columns = [column] if time_column is None else [column, time_column]
+        df = scan_metar_file(path, column).select(columns).collect()
+        if time_column is None:
+            reference = reference.timestamp()
+            rows = ((None, kind, raw, reference) for raw in df[column])
+            return self.append_many(rows)
+
+        # Время из архива точнее, чем день месяца в самой сводке
+        times = df[time_column].str.to_datetime(time_zone="UTC").dt.epoch("s")
+        records = []
+        for raw, obs_time in zip(df[column], times):
+            m = _HEADER.search(raw) if raw else None
+            if m and obs_time is not None:
+                records.append((m[1], kind, obs_time, raw.strip(), obs_time))
+        return self._insert(records)
+
+    def _select(self, icaos, start, end, kind):
+        end = time.time() if end is None else end
+        return self._connection().execute(
+            "SELECT icao, kind, obs_time * 1000, raw, CAST(fetched_at * 1000 AS INTEGER) FROM reports"
+            " WHERE icao IN (%s) AND kind = ? AND obs_time BETWEEN ? AND ?"
+            " ORDER BY icao, obs_time" % ",".join("?" * len(icaos)),
+            [*icaos, kind, _timestamp(start), _timestamp(end)],
+        )
+
+    @staticmethod
+    def _frame(rows, kind, decode):
+        df = pl.DataFrame(rows, schema=_ROW_SCHEMA, orient="row").with_columns(
+            pl.col("obs_time", "fetched_at").cast(_TIME),
+        )
+        if decode and kind == 'METAR':
+            df = decode_metars(df, column="raw").drop("station")
+        return df
+
+    # Сводки станций за период [start, end] в виде Polars DataFrame.
+    # decode=True добавляет столбцы расшифровки METAR (metar_bulk.SCHEMA).
+    def query(self, icaos, start, end=None, kind='METAR', decode=False):
+        icaos = list(dict.fromkeys(icaos))
+        rows = self._select(icaos, start, end, kind).fetchall() if icaos else []
+        return self._frame(rows, kind, decode)
+
+    # То же частями по batch_size строк: большой период не собирается в памяти целиком
+    def iter_query(self, icaos, start, end=None, kind='METAR', decode=False, batch_size=50_000):
+        icaos = list(dict.fromkeys(icaos))
+        if not icaos:
+            return
+        cursor = self._select(icaos, start, end, kind)
+        try:
+            while rows := cursor.fetchmany(batch_size):
+                yield self._frame(rows, kind, decode)
+        finally:
+            cursor.close()
+
+    # Последние hours часов
+    def recent(self, icaos, hours=72, kind='METAR', decode=False):
+        now = time.time()
+        return self.query(icaos, now - hours * 3600, now, kind, decode)
+
+
+_history = None
+_history_lock = threading.Lock()
+
+
+def get_history():
+    global _history
+    with _history_lock:
+        if _history is None:
+            _history = HistoryStore()
+        return _history
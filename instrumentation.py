@@ -0,0 +1,236 @@
+import http.server
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+from functools import wraps
+
+from config import METRICS_ENABLED, METRICS_HOST, METRICS_PATH
+
+# Замеры времени (гистограммы) и счётчики горячих путей: загрузка справочника,
+# запросы к сервису, кэш сводок, расшифровка, отрисовка страницы.
+# Всё хранится в памяти процесса; снаружи доступно страницей диагностики
+# и в текстовом формате Prometheus (файл и/или HTTP /metrics).
+# Запись замера - пара обращений к словарю под блокировкой (~1 мкс);
+# при VARTOVSK_METRICS=0 span() и timed() ничего не делают.
+
+PREFIX = "vartovsk_"
+# Границы корзин гистограмм, секунды: от 0.1 мс до 10 с
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        # Последняя корзина - всё, что больше BUCKETS[-1]
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def copy(self):
+        other = Histogram()
+        other.counts, other.sum, other.count = list(self.counts), self.sum, self.count
+        return other
+
+    # Оценка квантиля по корзинам (линейно внутри корзины)
+    def quantile(self, q):
+        if not self.count:
+            return float("nan")
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                if i == len(BUCKETS):
+                    return BUCKETS[-1]
+                lower = BUCKETS[i - 1] if i else 0.0
+                return lower + (BUCKETS[i] - lower) * (rank - seen) / n
+            seen += n
+        return BUCKETS[-1]
+
+
+class _Span:
+    __slots__ = ("metrics", "name", "labels", "started")
+
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(self.name + "_seconds", time.perf_counter() - self.started, **self.labels)
+        if exc_type is not None and not issubclass(exc_type, GeneratorExit):
+            self.metrics.inc(self.name + "_exceptions_total", **self.labels)
+        return False
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items())) if len(labels) > 1 else tuple(labels.items())
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(labels, extra=()):
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Metrics:
+    def __init__(self, enabled=METRICS_ENABLED):
+        self.enabled = enabled
+        self.started = time.time()
+        self.counters = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    # with span("decode", kind="metar"): ... - время в гистограмму decode_seconds,
+    # исключения - в счётчик decode_exceptions_total
+    def span(self, name, **labels):
+        if not self.enabled:
+            return nullcontext()
+        return _Span(self, name, labels)
+
+    # То же декоратором; при выключенных метриках функция не оборачивается
+    def timed(self, name, **labels):
+        def decorator(func):
+            if not self.enabled:
+                return func
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with _Span(self, name, labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    # Копии для отображения: {(имя, ((метка, значение), ...)): значение}
+    def snapshot(self):
+        with self._lock:
+            counters = dict(self.counters)
+            histograms = {key: histogram.copy() for key, histogram in self.histograms.items()}
+        return counters, histograms
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    # Текстовый формат Prometheus (exposition format 0.0.4)
+    def render(self):
+        counters, histograms = self.snapshot()
+        lines = [
+            f"# TYPE {PREFIX}process_start_time_seconds gauge",
+            f"{PREFIX}process_start_time_seconds {self.started:.3f}",
+        ]
+        for name in sorted({name for name, _ in counters}):
+            lines.append(f"# TYPE {PREFIX}{name} counter")
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{PREFIX}{name}{_format_labels(labels)} {value}")
+        for name in sorted({name for name, _ in histograms}):
+            lines.append(f"# TYPE {PREFIX}{name} histogram")
+            for (metric, labels), histogram in sorted(histograms.items(), key=lambda item: item[0]):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, n in zip((*BUCKETS, "+Inf"), histogram.counts):
+                    cumulative += n
+                    lines.append(f"{PREFIX}{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+                lines.append(f"{PREFIX}{name}_sum{_format_labels(labels)} {histogram.sum:.6f}")
+                lines.append(f"{PREFIX}{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    # Запись файла целиком через временный (коллектор не увидит половину)
+    def write(self, path=METRICS_PATH):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(self.render(), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+
+_metrics = Metrics()
+
+span = _metrics.span
+timed = _metrics.timed
+inc = _metrics.inc
+observe = _metrics.observe
+
+
+def get_metrics():
+    return _metrics
+
+
+log = logging.getLogger("instrumentation")
+
+_server = None
+_server_failed = False
+_server_lock = threading.Lock()
+
+
+# HTTP /metrics для Prometheus в фоновом потоке (один на процесс).
+# Порт занят (например, тем же портом у приложения и poller) - предупреждение
+# в журнал и None; повторно не пробуем, процесс работает без HTTP-выдачи
+def start_http_server(port, metrics=_metrics, host=METRICS_HOST):
+    global _server, _server_failed
+    with _server_lock:
+        if _server is not None or _server_failed:
+            return _server
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header("content-type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("content-length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        try:
+            server = http.server.ThreadingHTTPServer((host, port), Handler)
+        except OSError as e:
+            _server_failed = True
+            log.warning("Не удалось открыть /metrics на %s:%s: %s", host, port, e)
+            return None
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True, name="metrics-http").start()
+        _server = server
+        return server
@@ -1,5 +1,164 @@
+import argparse
+import sys
+from datetime import datetime, timedelta, timezone
+
+# Команды без интерфейса:
+#   python main.py export -o brief.xlsx USNN USRR            # табло: последние сводки из кэша
+#   python main.py export -o month.parquet --from 2026-09-01 --to 2026-10-01 --watchlist
+#   python main.py export -o taf.csv --kind TAF --days 3 USNN
+#   python main.py ingest archive_2025-01.txt --month 2025-01    # архив сводок в history
+#   python main.py verify --around USNN --radius 300 --from 2025-10-01 --to 2026-10-01 -o taf_scores.xlsx
+
+
+def parse_date(value):
+    return datetime.fromisoformat(value).replace(tzinfo=timezone.utc)
+
+
+# Месяц архива (2025-01) -> середина месяца: любой день этого месяца
+# ближе к ней, чем тот же день соседних
+def parse_month(value):
+    start = datetime.strptime(value, "%Y-%m").replace(tzinfo=timezone.utc)
+    following = (start + timedelta(days=32)).replace(day=1)
+    return start + (following - start) / 2
+
+
+# Станции из аргументов, списка poller.py и района вокруг аэродрома
+def stations_from(args):
+    from config import WATCHLIST_PATH
+    from vartovsk import parse_icao_list
+
+    stations = parse_icao_list(" ".join(args.stations))
+    if args.watchlist:
+        from poller import load_watchlist
+        stations += load_watchlist(WATCHLIST_PATH if args.watchlist is True else args.watchlist)
+    if args.around:
+        from airport_geo import build_geo_index
+        from vartovsk import load_directory
+
+        center = args.around.upper()
+        stations += [center] + [icao for icao, _ in build_geo_index(load_directory()).around(center, args.radius)]
+    stations = list(dict.fromkeys(stations))
+    if not stations:
+        sys.exit("Не заданы станции (коды ИКАО, --watchlist или --around)")
+    return stations
+
+
+def output_format(args):
+    from export import format_from_path
+
+    try:
+        return args.format or format_from_path(args.output)
+    except ValueError as e:
+        sys.exit(str(e))
+
+
+def period(args, days=None):
+    end = args.end or datetime.now(timezone.utc)
+    return args.start or end - timedelta(days=args.days or days), end
+
+
+def export(args):
+    from export import export_board, export_history
+
+    stations = stations_from(args)
+    fmt = output_format(args)
+
+    if args.start is None and args.end is None and args.days is None:
+        # Табло: последние сводки из общего кэша, без обращения к сервису
+        from vartovsk import MetarCache, cached_reports, load_directory
+
+        results = cached_reports(stations, MetarCache(read_only=True))
+        rows = export_board(results, args.output, fmt, load_directory())
+    else:
+        from history import get_history
+
+        # Только --to - сутки до этого момента
+        start, end = period(args, days=1)
+        rows = export_history(get_history(), stations, start, end, args.output, fmt, kind=args.kind)
+    print(f"Записано строк: {rows} -> {args.output}")
+
+
+def verify(args):
+    import polars as pl
+
+    from history import get_history
+    from verification import verify as verify_tafs
+
+    stations = stations_from(args)
+    start, end = period(args, days=30)
+    by = {"month": ("icao", "month"), "station": ("icao",), "all": ()}[args.by]
+    scores = verify_tafs(get_history(), stations, start, end, by=by)
+    if args.output:
+        from export import write_frames
+        write_frames([scores], args.output, output_format(args))
+        print(f"Записано строк: {scores.height} -> {args.output}")
+    else:
+        with pl.Config(tbl_rows=-1, tbl_cols=-1, tbl_width_chars=200):
+            print(scores.select(pl.exclude("^.*_hits$")))
+
+
+def ingest(args):
+    import polars as pl
+
+    from history import get_history
+
+    if args.time_column is None and args.month is None and args.date is None:
+        sys.exit("Без --time-column нужен месяц архива (--month) или дата (--date): "
+                 "в сводке есть только день месяца")
+    reference = args.date or args.month
+    try:
+        rows = get_history().ingest_file(args.path, args.kind, args.column, args.time_column, reference)
+    except (OSError, ValueError, pl.exceptions.PolarsError) as e:
+        sys.exit(f"{args.path}: {str(e).splitlines()[0]}")
+    print(f"Добавлено сводок: {rows} <- {args.path}")
+
+
+def add_station_arguments(p):
+    p.add_argument("stations", nargs="*", help="коды ИКАО")
+    p.add_argument("--watchlist", nargs="?", const=True, help="добавить станции из списка poller.py")
+    p.add_argument("--around", metavar="ICAO", help="добавить аэродром и аэродромы вокруг него")
+    p.add_argument("--radius", type=float, default=300, help="радиус района для --around, км")
+
+
+def add_period_arguments(p):
+    p.add_argument("--from", dest="start", type=parse_date, help="начало периода архива (UTC), например 2026-09-01")
+    p.add_argument("--to", dest="end", type=parse_date, help="конец периода архива (UTC); без --from и --days - сутки до него")
+    p.add_argument("--days", type=float, help="архив за последние N суток")
+
+
 def main():
-    print("Hello from vartovsk!")
+    parser = argparse.ArgumentParser(description="Помощник синоптика: команды без интерфейса")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("export", help="выгрузка табло или архива сводок в CSV, Parquet или Excel")
+    add_station_arguments(p)
+    p.add_argument("-o", "--output", required=True, help="файл .csv, .parquet или .xlsx")
+    p.add_argument("--format", choices=["csv", "parquet", "xlsx"], help="формат (по умолчанию - по расширению)")
+    add_period_arguments(p)
+    p.add_argument("--kind", choices=["METAR", "TAF"], default="METAR", help="вид сводок архива")
+    p.set_defaults(handler=export)
+
+    p = commands.add_parser("verify", help="оправдываемость TAF по фактическим METAR из архива")
+    add_station_arguments(p)
+    add_period_arguments(p)
+    p.add_argument("--by", choices=["month", "station", "all"], default="month",
+                   help="оценки по станциям и месяцам, по станциям за весь период или по району")
+    p.add_argument("-o", "--output", help="записать оценки в файл .csv, .parquet или .xlsx (иначе - таблицей на экран)")
+    p.add_argument("--format", choices=["csv", "parquet", "xlsx"], help="формат файла (по умолчанию - по расширению)")
+    p.set_defaults(handler=verify)
+
+    p = commands.add_parser("ingest", help="загрузка архива сводок из файла в history")
+    p.add_argument("path", help="текстовый файл (сводка в строке) или CSV")
+    p.add_argument("--kind", choices=["METAR", "TAF"], default="METAR", help="вид сводок")
+    p.add_argument("--column", default="metar", help="столбец сводок в CSV")
+    p.add_argument("--time-column", help="столбец времени наблюдения в CSV (ISO 8601, UTC)")
+    reference = p.add_mutually_exclusive_group()
+    reference.add_argument("--month", type=parse_month, help="месяц архива без --time-column, например 2025-01")
+    reference.add_argument("--date", type=parse_date, help="опорная дата архива без --time-column (UTC)")
+    p.set_defaults(handler=ingest)
+
+    args = parser.parse_args()
+    args.handler(args)
 
 
 if __name__ == "__main__":
@@ -1,49 +1,37 @@
 import streamlit as st
-import requests
-import pandas as pd
-from bs4 import BeautifulSoup
+import time
 from datetime import datetime
 
+from vartovsk import get_many_reports, get_reports, is_icao, parse_icao_list
+
 st.title('✈️  METAR & TAF ')
 
 # Функция для получения данных
 def get_metar_taf(icao):
-    try:
-        response = requests.get(f"https://metartaf.ru/{icao}.json", timeout=5)
-        if response.status_code == 200:
-            content_type = response.headers.get('content-type', '')
-            if 'json' in content_type:
-                data = response.json()
-                metar = data.get('metar', 'N/A')
-                taf = data.get('taf', 'N/A')
-                return metar, taf
-            elif 'xml' in content_type:
-                soup = BeautifulSoup(response.text, 'xml')
-                metar = soup.find('metar').text if soup.find('metar') else 'N/A'
-                taf = soup.find('taf').text if soup.find('taf') else 'N/A'
-                return metar, taf
-        return 'N/A', 'N/A'
-    except Exception as e:
-        st.error(f"Ошибка запроса для {icao}: {str(e)}")
-        return 'N/A', 'N/A'
+    result = get_reports(icao)
+    if result.error:
+        st.error(f"Ошибка запроса для {icao}: {result.error}")
+    return result.metar, result.taf
 
 # Функция для обработки нескольких аэропортов
 def process_airports(icao_list):
-    metar_results = []
-    taf_results = []
+    results = {}
     progress_bar = st.progress(0)
     total_airports = len(icao_list)
     
-    for i, icao in enumerate(icao_list):
-        icao = icao.strip().upper()
-        if not icao.isalpha() or len(icao) != 4:
-            continue
-            
-        progress = (i + 1) / total_airports
-        progress_bar.progress(progress)
-        
-        metar, taf = get_metar_taf(icao)
-        current_time = datetime.now().strftime('%H:%M:%S')
+    # Данные из общего кэша, недостающие запрашиваются параллельно
+    for i, result in enumerate(get_many_reports(icao_list)):
+        progress_bar.progress((i + 1) / total_airports)
+        if result.error:
+            st.error(f"Ошибка запроса для {result.icao}: {result.error}")
+        results[result.icao] = result
+    
+    metar_results = []
+    taf_results = []
+    for icao in icao_list:
+        result = results[icao]
+        metar, taf = result.metar, result.taf
+        current_time = datetime.fromtimestamp(result.fetched_at or time.time()).strftime('%H:%M:%S')
         
         # Добавляем данные METAR
         metar_results.append({
@@ -62,7 +50,7 @@ def process_airports(icao_list):
         })
     
     progress_bar.empty()
-    return pd.DataFrame(metar_results), pd.DataFrame(taf_results)
+    return metar_results, taf_results
 
 # Интерфейс
 input_mode = st.radio("Режим ввода:", ["Один аэропорт", "Несколько аэропортов"])
@@ -70,8 +58,8 @@ input_mode = st.radio("Режим ввода:", ["Один аэропорт", "
 if input_mode == "Один аэропорт":
     icao = st.text_input('Введите код ИКАО аэропорта:', 'UUEE').upper()
     if st.button('Получить данные'):
-        if not icao.isalpha() or len(icao) != 4:
-            st.error('Код аэропорта должен состоять из 4 букв (например: UUEE)')
+        if not is_icao(icao):
+            st.error('Код аэропорта должен состоять из 4 букв или цифр, первая - буква (например: UUEE)')
         else:
             with st.spinner('Получаем данные...'):
                 metar, taf = get_metar_taf(icao)
@@ -97,17 +85,17 @@ else:
     )
     
     if st.button('Получить данные для всех'):
-        icao_list = icao_input.split()
+        icao_list = parse_icao_list(icao_input)
         if not icao_list:
             st.error("Введите хотя бы один код ИКАО")
         else:
             with st.spinner('Получаем данные для всех аэропортов...'):
-                metar_df, taf_df = process_airports(icao_list)
+                metar_rows, taf_rows = process_airports(icao_list)
                 
                 # Показываем таблицу METAR
                 st.subheader('METAR данные')
                 st.dataframe(
-                    metar_df,
+                    metar_rows,
                     column_config={
                         "METAR": st.column_config.TextColumn("METAR", width="large"),
                         "Статус": st.column_config.TextColumn("Статус", width="small")
@@ -119,7 +107,7 @@ else:
                 # Показываем таблицу TAF
                 st.subheader('TAF данные')
                 st.dataframe(
-                    taf_df,
+                    taf_rows,
                     column_config={
                         "TAF": st.column_config.TextColumn("TAF", width="large"),
                         "Статус": st.column_config.TextColumn("Статус", width="small")
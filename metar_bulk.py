@@ -0,0 +1,199 @@
+import polars as pl
+
+from metar_parser import KMH_TO_MPS, KT_TO_MPS, parse_metar, to_mps
+
+# Пакетная расшифровка архивов METAR в типизированные столбцы Polars.
+# Основная работа - векторный str.extract_groups по всему столбцу; сводки нестандартного
+# вида (лишние пробелы, нет заголовка, группы не по порядку) разбираются metar_parser построчно.
+
+INHG_TO_HPA = 33.8639
+
+SCHEMA = {
+    "station": pl.String,
+    "report_type": pl.String,
+    "day": pl.Int8,
+    "hour": pl.Int8,
+    "minute": pl.Int8,
+    "auto": pl.Boolean,
+    "nil": pl.Boolean,
+    "wind_dir": pl.Int16,
+    "wind_speed": pl.Int16,
+    "wind_gust": pl.Int16,
+    "wind_unit": pl.String,
+    "wind_speed_mps": pl.Float32,
+    "wind_gust_mps": pl.Float32,
+    "visibility_m": pl.Int32,
+    "cavok": pl.Boolean,
+    "weather": pl.List(pl.String),
+    # Слои облачности - параллельными списками (покрытие, высота, CB/TCU)
+    "cloud_cover": pl.List(pl.String),
+    "cloud_height_m": pl.List(pl.Int32),
+    "cloud_type": pl.List(pl.String),
+    "ceiling_m": pl.Int32,
+    "cb": pl.Boolean,
+    "vertical_visibility_m": pl.Int32,
+    "temperature": pl.Int8,
+    "dew_point": pl.Int8,
+    "qnh": pl.Int16,
+}
+
+_PHENOMENA = r'(?:DZ|RA|SN|SG|IC|PL|GR|GS|UP|BR|FG|FU|VA|DU|SA|HZ|PO|SQ|FC|SS|DS)'
+
+# Вся сводка стандартного вида - одним выражением (один проход regex по строке).
+# Строки, которые под него не подходят, разбираются metar_parser.
+_PATTERN = (
+    r'^(?:(?P<report_type>METAR|SPECI) )?(?:COR )?(?P<station>[A-Z][A-Z0-9]{3}) '
+    r'(?P<day>\d\d)(?P<hour>\d\d)(?P<minute>\d\d)Z'
+    r'(?P<auto> AUTO)?'
+    r'(?: (?P<wind_dir>\d{3}|VRB)(?P<wind_speed>\d{2,3})(?:G(?P<wind_gust>\d{2,3}))?'
+    r'(?P<wind_unit>KT|MPS|KMH)(?: \d{3}V\d{3})?)?'
+    r'(?: (?:(?P<cavok>CAVOK)|(?P<visibility_m>\d{4})(?:NDV)?(?: \d{4}(?:N|NE|E|SE|S|SW|W|NW))?))?'
+    r'(?:(?: R\d\d[LCR]?/[PM]?\d{4}(?:V[PM]?\d{4})?(?:FT)?[UDN]?)*)'
+    r'(?P<weather>(?: (?:[-+]|VC)?(?:(?:MI|PR|BC|DR|BL|SH|TS|FZ){1,2}' + _PHENOMENA + r'{0,3}|'
+    + _PHENOMENA + r'{1,3}))*)'
+    r'(?: (?:NSC|NCD|SKC|CLR|VV(?P<vertical_visibility>\d{3})))?'
+    r'(?P<clouds>(?: (?:FEW|SCT|BKN|OVC)\d{3}(?:CB|TCU|///)?)*)'
+    r'(?: (?P<temperature>M?\d\d)/(?P<dew_point>M?\d\d)?)?'
+    r'(?: Q(?P<qnh>\d{4}))?'
+    r'(?:(?: R\d\d[LCR]?/(?:\d{6}|CLRD\d\d))*)'
+    r'(?: (?:NOSIG|BECMG|TEMPO|RMK)(?: .*)?)?$'
+)
+
+
+def _signed(expr):
+    return expr.str.replace('M', '-', literal=True).cast(pl.Int8, strict=False)
+
+
+def _to_mps(speed, unit):
+    factor = (
+        pl.when(unit == 'KT').then(KT_TO_MPS)
+        .when(unit == 'KMH').then(KMH_TO_MPS)
+        .otherwise(1.0)
+    )
+    return (speed * factor).cast(pl.Float32)
+
+
+def _empty_to_null(expr):
+    return pl.when(expr.str.len_bytes() > 0).then(expr)
+
+
+# Столбцы расшифровки для LazyFrame со сводками в столбце column.
+# Добавляет служебный столбец _fallback для строк, не подошедших под шаблон.
+def with_metar_columns(lf, column="metar"):
+    m = pl.col('_m').struct.field
+    clouds = pl.col('_clouds')
+    # Внутри list.eval - только срезы строк: приведение типов там медленное,
+    # поэтому оно делается над списком целиком
+    lf = lf.with_columns(
+        pl.col(column).str.extract_groups(_PATTERN).alias('_m'),
+    ).with_columns(
+        m('clouds').str.extract_all(r'(?:FEW|SCT|BKN|OVC)\d{3}(?:CB|TCU)?').alias('_clouds'),
+        m('clouds').str.extract_all(r'(?:BKN|OVC)\d{3}').list.eval(pl.element().str.slice(3, 3))
+        .cast(pl.List(pl.Int32)).list.min().alias('_ceiling'),
+        m('wind_speed').cast(pl.Int16).alias('_speed'),
+        m('wind_gust').cast(pl.Int16).alias('_gust'),
+    )
+    return lf.with_columns(
+        m('station').alias('station'),
+        m('report_type').alias('report_type'),
+        m('day').cast(pl.Int8).alias('day'),
+        m('hour').cast(pl.Int8).alias('hour'),
+        m('minute').cast(pl.Int8).alias('minute'),
+        m('auto').is_not_null().alias('auto'),
+        pl.lit(False).alias('nil'),
+        m('wind_dir').cast(pl.Int16, strict=False).alias('wind_dir'),
+        pl.col('_speed').alias('wind_speed'),
+        pl.col('_gust').alias('wind_gust'),
+        m('wind_unit').alias('wind_unit'),
+        _to_mps(pl.col('_speed'), m('wind_unit')).alias('wind_speed_mps'),
+        _to_mps(pl.col('_gust'), m('wind_unit')).alias('wind_gust_mps'),
+        m('visibility_m').cast(pl.Int32).alias('visibility_m'),
+        m('cavok').is_not_null().alias('cavok'),
+        _empty_to_null(m('weather')).str.strip_chars_start().str.split(' ').fill_null([]).alias('weather'),
+        clouds.list.eval(pl.element().str.slice(0, 3)).alias('cloud_cover'),
+        (clouds.list.eval(pl.element().str.slice(3, 3)).cast(pl.List(pl.Int32)) * 30).alias('cloud_height_m'),
+        clouds.list.eval(pl.element().str.slice(6)).alias('cloud_type'),
+        # Как MetarObservation.ceiling_m: вертикальная видимость тоже считается границей
+        (pl.min_horizontal(pl.col('_ceiling'), m('vertical_visibility').cast(pl.Int32)) * 30).alias('ceiling_m'),
+        m('clouds').str.contains('CB', literal=True).fill_null(False).alias('cb'),
+        (m('vertical_visibility').cast(pl.Int32) * 30).alias('vertical_visibility_m'),
+        _signed(m('temperature')).alias('temperature'),
+        _signed(m('dew_point')).alias('dew_point'),
+        m('qnh').cast(pl.Int16).alias('qnh'),
+        m('day').is_null().alias('_fallback'),
+    ).drop('_m', '_clouds', '_ceiling', '_speed', '_gust')
+
+
+# Те же столбцы для одной сводки через построчный разбор
+def observation_row(obs):
+    wind = obs.wind
+    return {
+        "station": obs.station,
+        "report_type": obs.report_type,
+        "day": obs.day,
+        "hour": obs.hour,
+        "minute": obs.minute,
+        "auto": obs.auto,
+        "nil": obs.nil,
+        "wind_dir": wind.direction if wind else None,
+        "wind_speed": wind.speed if wind else None,
+        "wind_gust": wind.gust if wind else None,
+        "wind_unit": wind.unit if wind else None,
+        "wind_speed_mps": to_mps(wind.speed, wind.unit) if wind else None,
+        "wind_gust_mps": to_mps(wind.gust, wind.unit) if wind else None,
+        "visibility_m": obs.visibility,
+        "cavok": obs.cavok,
+        "weather": obs.weather,
+        "cloud_cover": [layer.cover for layer in obs.clouds],
+        "cloud_height_m": [layer.height_m for layer in obs.clouds],
+        "cloud_type": [layer.cloud_type or '' for layer in obs.clouds],
+        "ceiling_m": obs.ceiling_m,
+        "cb": any(layer.cloud_type == 'CB' for layer in obs.clouds),
+        "vertical_visibility_m": obs.vertical_visibility * 30 if obs.vertical_visibility is not None else None,
+        "temperature": obs.temperature,
+        "dew_point": obs.dew_point,
+        "qnh": obs.qnh,
+    }
+
+
+def _frame(data, column):
+    if isinstance(data, pl.Series):
+        return data.rename(column).to_frame().lazy()
+    if isinstance(data, pl.DataFrame):
+        return data.lazy()
+    if isinstance(data, pl.LazyFrame):
+        return data
+    return pl.LazyFrame({column: list(data)}, schema={column: pl.String})
+
+
+# Расшифровка сводок из Series, DataFrame/LazyFrame (столбец column) или списка строк.
+# Остальные столбцы входных данных (например, время из архива) сохраняются.
+def decode_metars(data, column="metar"):
+    lf = _frame(data, column).with_row_index("_row").with_columns(
+        pl.col(column).str.strip_chars().str.strip_chars_end('=').str.strip_chars_end(),
+    )
+    decoded = with_metar_columns(lf, column).cast(SCHEMA).collect(engine="streaming")
+
+    fallback = decoded.filter(pl.col('_fallback'))
+    if fallback.height:
+        rows = [observation_row(parse_metar(metar or '')) for metar in fallback[column]]
+        parsed = pl.DataFrame(rows, schema=SCHEMA)
+        fixed = fallback.select(pl.exclude(list(SCHEMA))).hstack(parsed).select(decoded.columns)
+        decoded = pl.concat([decoded.filter(~pl.col('_fallback')), fixed]).sort('_row')
+
+    return decoded.drop('_row', '_fallback')
+
+
+# Архив в виде текста (одна сводка в строке) или CSV со столбцом column
+def scan_metar_file(path, column="metar"):
+    path = str(path)
+    if path.endswith('.csv'):
+        return pl.scan_csv(path, infer_schema=False)
+    return pl.scan_csv(
+        path, has_header=False, new_columns=[column], separator='\x1f',
+        quote_char=None, infer_schema=False,
+    )
+
+
+def decode_metar_file(path, column="metar"):
+    return decode_metars(scan_metar_file(path, column), column)
@@ -0,0 +1,269 @@
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from config import CACHE_DIR, CACHE_READ_ONLY
+from history import get_history
+from instrumentation import inc
+from metar_fetch import FetchResult, fetch_many
+from metar_parser import parse_metar, resolve_time
+from sources import fetch_reports
+
+# Общий для всех сессий и процессов кэш METAR/TAF в SQLite (режим WAL).
+# Срок жизни записи считается от времени наблюдения в самой сводке:
+# следующая сводка ожидается через ISSUE_INTERVAL после предыдущей.
+
+CACHE_PATH = CACHE_DIR / "metar_cache.sqlite"
+
+ISSUE_INTERVAL = timedelta(minutes=30)
+# Сколько после срока наблюдения сводка обычно появляется на сервисе
+PUBLISH_DELAY = timedelta(minutes=5)
+MIN_TTL = 60
+MAX_TTL = 3600
+# Сводка запаздывает (или станция даёт METAR раз в час) - проверяем чаще
+RETRY_TTL = 180
+# Для станций без данных и после ошибок
+NO_DATA_TTL = 600
+ERROR_TTL = 60
+# Сколько секунд один процесс «держит» обновление станции за собой
+REFRESH_LEASE = 30
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    icao TEXT PRIMARY KEY,
+    metar TEXT NOT NULL,
+    taf TEXT NOT NULL,
+    error TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    fetched_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    refresh_until REAL
+)
+"""
+
+
+# Момент, когда имеет смысл снова спрашивать сервис о станции
+def expires_at(metar, now=None):
+    now = now or time.time()
+    if metar == 'N/A':
+        return now + NO_DATA_TTL
+    obs = parse_metar(metar)
+    if obs.day is None:
+        return now + RETRY_TTL
+    reference = datetime.fromtimestamp(now, timezone.utc)
+    observed = resolve_time(obs.day, obs.hour, obs.minute, reference)
+    if observed is None:
+        return now + RETRY_TTL
+    next_report = (observed + ISSUE_INTERVAL + PUBLISH_DELAY).timestamp()
+    if next_report <= now:
+        return now + RETRY_TTL
+    return min(max(next_report, now + MIN_TTL), now + MAX_TTL)
+
+
+# Обращения к кэшу: свежая запись, устаревшая (отдана, обновляется) или её нет
+def _count(row):
+    inc("metar_cache_total", result="miss" if row is None else "stale" if row[6] <= time.time() else "fresh")
+
+
+class MetarCache:
+    # read_only - страницы только читают хранилище, которое наполняет poller.py
+    # history - архив (history.HistoryStore), куда добавляется каждая новая сводка
+    def __init__(self, path=CACHE_PATH, fetch=fetch_reports, max_workers=4, read_only=False, history=None):
+        self.path = path
+        self.fetch = fetch
+        self.read_only = read_only
+        self.history = history
+        self._local = threading.local()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="metar-refresh")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connection() as db:
+            db.execute(_SCHEMA)
+
+    # Отдельное соединение на поток: sqlite3 не разделяет их между потоками
+    def _connection(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def _read(self, icao):
+        return self._connection().execute(
+            "SELECT metar, taf, error, etag, last_modified, fetched_at, expires_at"
+            " FROM reports WHERE icao = ?",
+            (icao,),
+        ).fetchone()
+
+    @staticmethod
+    def _result(icao, row):
+        metar, taf, error, etag, last_modified, fetched_at, _ = row
+        return FetchResult(icao, metar, taf, error, etag, last_modified, fetched_at=fetched_at)
+
+    def _store(self, icao, result, previous=None):
+        now = time.time()
+        if result.not_modified and previous is not None:
+            metar, taf = previous[0], previous[1]
+            self._connection().execute(
+                "UPDATE reports SET expires_at = ?, refresh_until = NULL,"
+                " etag = ?, last_modified = ? WHERE icao = ?",
+                (expires_at(metar, now), result.etag, result.last_modified, icao),
+            )
+            return self._result(icao, self._read(icao))
+        if result.error:
+            if previous is not None and (previous[0] != 'N/A' or previous[1] != 'N/A'):
+                # Сбой обновления: продолжаем отдавать последнюю удачную сводку
+                # (или только TAF - у станций без METAR), но вызвавший
+                # (poller.py) видит ошибку и откладывает повтор
+                self._connection().execute(
+                    "UPDATE reports SET expires_at = ?, refresh_until = NULL WHERE icao = ?",
+                    (now + ERROR_TTL, icao),
+                )
+                return self._result(icao, self._read(icao))._replace(error=result.error)
+            ttl = now + ERROR_TTL
+        else:
+            ttl = expires_at(result.metar, now)
+        self._connection().execute(
+            "INSERT OR REPLACE INTO reports"
+            " (icao, metar, taf, error, etag, last_modified, fetched_at, expires_at, refresh_until)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, NULL)",
+            (icao, result.metar, result.taf, result.error, result.etag, result.last_modified, now, ttl),
+        )
+        if self.history is not None and not result.error:
+            self.history.append(icao, result.metar, result.taf, now)
+        return result._replace(fetched_at=now, not_modified=False)
+
+    # Обновление станции из сервиса (условным запросом, если есть валидаторы)
+    def refresh(self, icao):
+        previous = self._read(icao)
+        if previous is not None:
+            result = self.fetch(icao, etag=previous[3], last_modified=previous[4])
+        else:
+            result = self.fetch(icao)
+        return self._store(icao, result, previous)
+
+    # Захват права на фоновое обновление: один поток и один процесс на станцию
+    def _claim(self, icao):
+        with self._lock:
+            if icao in self._refreshing:
+                return False
+            now = time.time()
+            claimed = self._connection().execute(
+                "UPDATE reports SET refresh_until = ? WHERE icao = ?"
+                " AND (refresh_until IS NULL OR refresh_until < ?)",
+                (now + REFRESH_LEASE, icao, now),
+            ).rowcount
+            if claimed:
+                self._refreshing.add(icao)
+            return bool(claimed)
+
+    def _refresh_in_background(self, icao):
+        try:
+            self.refresh(icao)
+        except Exception:
+            pass
+        finally:
+            with self._lock:
+                self._refreshing.discard(icao)
+
+    # Отложить следующий запрос станции (например, после серии ошибок)
+    def postpone(self, icao, until):
+        self._connection().execute(
+            "UPDATE reports SET expires_at = ? WHERE icao = ?", (until, icao)
+        )
+
+    # Станции, которые пора обновить (устаревшие и отсутствующие),
+    # и ближайший срок устаревания остальных
+    def due(self, icao_list, now=None):
+        now = now or time.time()
+        icao_list = list(dict.fromkeys(icao_list))
+        expiry = dict(self._connection().execute(
+            "SELECT icao, expires_at FROM reports WHERE icao IN (%s)" % ",".join("?" * len(icao_list)),
+            icao_list,
+        ).fetchall()) if icao_list else {}
+        due = [icao for icao in icao_list if expiry.get(icao, 0) <= now]
+        upcoming = [value for value in expiry.values() if value > now]
+        return due, min(upcoming, default=None)
+
+    # Только то, что уже лежит в кэше, без обращения к сервису
+    def peek(self, icao):
+        row = self._read(icao)
+        _count(row)
+        return None if row is None else self._result(icao, row)
+
+    # Для отображения: в режиме только чтения станции, которой нет в хранилище,
+    # сразу отдаётся результат «нет данных» - загружать её некому
+    def cached(self, icao):
+        result = self.peek(icao)
+        if result is None and self.read_only:
+            return self.missing(icao)
+        return result
+
+    # Запустить в фоне загрузку отсутствующих и обновление устаревших станций
+    def prefetch(self, icao_list):
+        if self.read_only:
+            return
+        due, _ = self.due(icao_list)
+        for icao in due:
+            if self._read(icao) is not None:
+                claimed = self._claim(icao)
+            else:
+                with self._lock:
+                    claimed = icao not in self._refreshing
+                    self._refreshing.add(icao)
+            if claimed:
+                self._executor.submit(self._refresh_in_background, icao)
+
+    # Ответ для станции, которой нет в хранилище (без обращения к сервису)
+    def missing(self, icao):
+        return FetchResult(icao, error="нет данных в локальном хранилище")
+
+    # Сводки станции: свежие - из кэша; устаревшие - тоже из кэша сразу,
+    # а обновление уходит в фон; отсутствующие - запрашиваются синхронно.
+    def get(self, icao):
+        row = self._read(icao)
+        _count(row)
+        if row is None:
+            return self.missing(icao) if self.read_only else self.refresh(icao)
+        if self.read_only:
+            return self._result(icao, row)
+        if row[6] <= time.time() and self._claim(icao):
+            self._executor.submit(self._refresh_in_background, icao)
+        return self._result(icao, row)
+
+    # Для списка станций: сначала всё, что есть в кэше, затем недостающие
+    # по мере получения (параллельно)
+    def get_many(self, icao_list, deadline=None):
+        missing = []
+        for icao in dict.fromkeys(icao_list):
+            row = self._read(icao)
+            _count(row)
+            if row is None:
+                missing.append(icao)
+                continue
+            if not self.read_only and row[6] <= time.time() and self._claim(icao):
+                self._executor.submit(self._refresh_in_background, icao)
+            yield self._result(icao, row)
+        if missing and self.read_only:
+            yield from map(self.missing, missing)
+        elif missing:
+            yield from fetch_many(missing, fetch=self.refresh, deadline=deadline)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+# Один экземпляр кэша на процесс (между процессами данные общие через файл)
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = MetarCache(read_only=CACHE_READ_ONLY, history=get_history())
+        return _cache
@@ -0,0 +1,188 @@
+import json
+import os
+import threading
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import NamedTuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from instrumentation import inc, observe
+
+# Адрес сервиса можно переопределить (например, на локальный стенд)
+BASE_URL = os.environ.get("VARTOVSK_METARTAF_URL", "https://metartaf.ru").rstrip("/")
+
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 10
+MAX_WORKERS = 16
+# Не больше стольких одновременных запросов к одному хосту
+PER_HOST_LIMIT = 8
+
+
+class FetchResult(NamedTuple):
+    icao: str
+    metar: str = 'N/A'
+    taf: str = 'N/A'
+    error: str | None = None
+    # Валидаторы для условного запроса (If-None-Match / If-Modified-Since)
+    etag: str | None = None
+    last_modified: str | None = None
+    not_modified: bool = False
+    # Время получения данных от сервиса (time.time()), заполняется кэшем
+    fetched_at: float | None = None
+    # Источник, давший ответ (см. sources.py)
+    source: str | None = None
+
+
+_session = None
+_session_lock = threading.Lock()
+_host_limits = {}
+
+
+# Общая сессия с пулом keep-alive соединений для всех потоков
+def get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=MAX_WORKERS)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+def _host_semaphore(host):
+    with _session_lock:
+        if host not in _host_limits:
+            _host_limits[host] = threading.BoundedSemaphore(PER_HOST_LIMIT)
+        return _host_limits[host]
+
+
+# Разбор ответа сервиса: поддерживаются JSON и XML
+def parse_response(response):
+    content_type = response.headers.get('content-type', '')
+    return parse_payload(response.content, content_type)
+
+
+# То же для содержимого без HTTP (например, файла): вид данных - по content_type
+# ("json", "application/xml" и т.п.)
+def parse_payload(content, content_type):
+    if 'json' in content_type:
+        data = json.loads(content)
+        return data.get('metar') or 'N/A', data.get('taf') or 'N/A'
+    if 'xml' in content_type:
+        root = ET.fromstring(content)
+        metar = root.findtext('.//metar')
+        taf = root.findtext('.//taf')
+        return (metar or '').strip() or 'N/A', (taf or '').strip() or 'N/A'
+    return 'N/A', 'N/A'
+
+
+# Очередь к хосту не освободилась за отведённое время
+class HostBusy(Exception):
+    pass
+
+
+# GET с ограничением одновременных запросов к хосту и замером времени
+def http_get(url, timeout, headers=None, session=None):
+    host = urlsplit(url).netloc
+    semaphore = _host_semaphore(host)
+    started = time.monotonic()
+    if not semaphore.acquire(timeout=timeout):
+        raise HostBusy("превышено время ожидания")
+    try:
+        timeout -= time.monotonic() - started
+        if timeout <= 0:
+            raise HostBusy("превышено время ожидания")
+        started = time.perf_counter()
+        try:
+            return (session or get_session()).get(
+                url, headers=headers, timeout=(min(CONNECT_TIMEOUT, timeout), timeout)
+            )
+        finally:
+            # Только сам запрос, без ожидания очереди к хосту
+            observe("upstream_request_seconds", time.perf_counter() - started, host=host)
+    finally:
+        semaphore.release()
+
+
+# Запрос к metartaf.ru (или base_url) без обработки ошибок: сбои сети
+# и ответы 4xx/5xx выходят исключениями (их разбирает sources.Upstream)
+def request_metar_taf(icao, timeout=READ_TIMEOUT, session=None, etag=None, last_modified=None, base_url=None):
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+    response = http_get(f"{base_url or BASE_URL}/{icao}.json", timeout, headers, session)
+    validators = {
+        'etag': response.headers.get('etag', etag),
+        'last_modified': response.headers.get('last-modified', last_modified),
+    }
+    if response.status_code == 304:
+        return FetchResult(icao, not_modified=True, **validators)
+    response.raise_for_status()
+    metar, taf = parse_response(response)
+    return FetchResult(icao, metar, taf, **validators)
+
+
+# Получение METAR и TAF для одного аэропорта.
+# deadline - момент time.monotonic(), после которого запрос не имеет смысла.
+# С etag/last_modified запрос условный: при ответе 304 not_modified=True.
+def fetch_metar_taf(icao, timeout=READ_TIMEOUT, deadline=None, session=None,
+                    etag=None, last_modified=None):
+    if deadline is not None:
+        timeout = min(timeout, deadline - time.monotonic())
+    if timeout <= 0:
+        result = FetchResult(icao, error="превышено время ожидания")
+    else:
+        try:
+            result = request_metar_taf(icao, timeout, session, etag, last_modified)
+        except (requests.exceptions.RequestException, ValueError, ET.ParseError, HostBusy) as e:
+            result = FetchResult(icao, error=str(e))
+    count_outcome(result)
+    return result
+
+
+# Исход по станциям: по нему видно, где сервис отвечает ошибками
+def count_outcome(result):
+    outcome = "error" if result.error else "not_modified" if result.not_modified else "ok"
+    inc("upstream_requests_total", icao=result.icao, outcome=outcome)
+
+
+# Параллельное получение данных для списка аэропортов.
+# Результаты отдаются по мере готовности; по истечении deadline секунд
+# оставшиеся аэропорты возвращаются с ошибкой.
+def fetch_many(icao_list, fetch=None, max_workers=MAX_WORKERS, deadline=None):
+    fetch = fetch or fetch_metar_taf
+    icao_list = list(dict.fromkeys(icao_list))
+    if not icao_list:
+        return
+
+    end = time.monotonic() + deadline if deadline is not None else None
+    executor = ThreadPoolExecutor(
+        max_workers=min(max_workers, len(icao_list)),
+        thread_name_prefix="metar-fetch",
+    )
+    try:
+        futures = {executor.submit(fetch, icao): icao for icao in icao_list}
+        pending = set(futures)
+        while pending:
+            timeout = None if end is None else max(end - time.monotonic(), 0)
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                for future in pending:
+                    future.cancel()
+                    yield FetchResult(futures[future], error="превышено время ожидания")
+                return
+            for future in done:
+                try:
+                    yield future.result()
+                except Exception as e:
+                    yield FetchResult(futures[future], error=str(e))
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,392 @@
+import re
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+# Разбор METAR в структуру. Каждая группа сопоставляется один раз:
+# по первому символу выбираются только подходящие скомпилированные шаблоны.
+
+DIGITS = '0123456789'
+
+# Условия для полётов по ПВП (ICAO VMC ниже 3000 м): нижняя граница облаков
+# не ниже 450 м (1500 футов) и видимость не менее 5 км
+VFR_CEILING_M = 450
+VFR_VISIBILITY_M = 5000
+
+# Скорость ветра в м/с из единиц сводки
+KT_TO_MPS = 0.514444
+KMH_TO_MPS = 1 / 3.6
+WIND_TO_MPS = {'KT': KT_TO_MPS, 'KMH': KMH_TO_MPS, 'MPS': 1.0}
+
+
+@dataclass(slots=True)
+class Wind:
+    direction: int | None  # None - переменный (VRB)
+    speed: int
+    gust: int | None
+    unit: str  # KT, MPS или KMH
+    variable_from: int | None = None
+    variable_to: int | None = None
+
+
+@dataclass(slots=True)
+class CloudLayer:
+    cover: str  # FEW, SCT, BKN, OVC
+    height: int  # сотни футов, как в сводке
+    cloud_type: str | None = None  # CB или TCU
+
+    @property
+    def height_m(self):
+        return self.height * 30
+
+
+@dataclass(slots=True)
+class MetarObservation:
+    raw: str = ''
+    report_type: str | None = None  # METAR или SPECI
+    station: str | None = None
+    day: int | None = None
+    hour: int | None = None
+    minute: int | None = None
+    auto: bool = False
+    nil: bool = False
+    correction: bool = False
+    wind: Wind | None = None
+    visibility: int | None = None  # метры, 9999 - 10 км и более
+    visibility_min: int | None = None
+    visibility_min_direction: str | None = None
+    cavok: bool = False
+    nsw: bool = False  # NSW - окончание явлений погоды (в прогнозах)
+    rvr: list = field(default_factory=list)
+    weather: list = field(default_factory=list)
+    clouds: list = field(default_factory=list)
+    vertical_visibility: int | None = None  # сотни футов
+    sky_clear: str | None = None  # NSC, NCD, SKC, CLR
+    temperature: int | None = None
+    dew_point: int | None = None
+    qnh: int | None = None  # гПа
+    runway_state: list = field(default_factory=list)
+    trend: str | None = None
+    remarks: str | None = None
+
+    # Высота нижней границы облаков BKN/OVC или вертикальная видимость, метры
+    @property
+    def ceiling_m(self):
+        heights = [layer.height_m for layer in self.clouds if layer.cover in ('BKN', 'OVC')]
+        if self.vertical_visibility is not None:
+            heights.append(self.vertical_visibility * 30)
+        return min(heights, default=None)
+
+
+def _time(obs, m):
+    obs.day, obs.hour, obs.minute = int(m[1]), int(m[2]), int(m[3])
+
+
+def _wind(obs, m):
+    direction = None if m[1] == 'VRB' else int(m[1])
+    obs.wind = Wind(direction, int(m[2]), int(m[3]) if m[3] else None, m[4])
+
+
+def _wind_variable(obs, m):
+    if obs.wind is not None:
+        obs.wind.variable_from = int(m[1])
+        obs.wind.variable_to = int(m[2])
+
+
+def _visibility(obs, m):
+    if obs.visibility is None:
+        obs.visibility = int(m[1])
+
+
+def _visibility_min(obs, m):
+    obs.visibility_min = int(m[1])
+    obs.visibility_min_direction = m[2]
+
+
+def _rvr(obs, m):
+    obs.rvr.append(m[0])
+
+
+def _runway_state(obs, m):
+    obs.runway_state.append(m[0])
+
+
+def _weather(obs, m):
+    obs.weather.append(m[0])
+
+
+def _clouds(obs, m):
+    cloud_type = m[3] if m[3] in ('CB', 'TCU') else None
+    obs.clouds.append(CloudLayer(m[1], int(m[2]), cloud_type))
+
+
+def _vertical_visibility(obs, m):
+    obs.vertical_visibility = int(m[1])
+
+
+def _signed(value):
+    return -int(value[1:]) if value[0] == 'M' else int(value)
+
+
+def _temperature(obs, m):
+    obs.temperature = _signed(m[1])
+    if m[2] and m[2] != '//':
+        obs.dew_point = _signed(m[2])
+
+
+def _pressure(obs, m):
+    obs.qnh = int(m[1])
+
+
+# Altimeter в сотых дюйма рт. ст. (Северная Америка) пересчитывается в гПа
+def _altimeter(obs, m):
+    if obs.qnh is None:
+        obs.qnh = round(int(m[1]) / 100 * 33.8639)
+
+
+_WEATHER = (
+    r'(?=[-+A-Z]{2})(?:[-+]|VC)?(?:MI|PR|BC|DR|BL|SH|TS|FZ){0,2}'
+    r'(?:DZ|RA|SN|SG|IC|PL|GR|GS|UP|BR|FG|FU|VA|DU|SA|HZ|PO|SQ|FC|SS|DS){0,3}'
+)
+
+# (шаблон, обработчик, возможные первые символы группы)
+_RULES = (
+    (r'(\d{2})(\d{2})(\d{2})Z', _time, DIGITS),
+    (r'(\d{3}|VRB)(\d{2,3})(?:G(\d{2,3}))?(KT|MPS|KMH)', _wind, DIGITS + 'V'),
+    (r'(\d{3})V(\d{3})', _wind_variable, DIGITS),
+    (r'(\d{4})(?:NDV)?', _visibility, DIGITS),
+    (r'(\d{4})(N|NE|E|SE|S|SW|W|NW)', _visibility_min, DIGITS),
+    (r'(M?\d{2})/(M?\d{2}|//)?', _temperature, DIGITS + 'M'),
+    (r'(FEW|SCT|BKN|OVC)(\d{3})(CB|TCU|///)?', _clouds, 'FSBO'),
+    (r'VV(\d{3})', _vertical_visibility, 'V'),
+    (r'Q(\d{4})', _pressure, 'Q'),
+    (r'A(\d{4})', _altimeter, 'A'),
+    (r'R\d{2}[LCR]?/[PM]?\d{4}(?:V[PM]?\d{4})?(?:FT)?[UDN]?', _rvr, 'R'),
+    (r'R\d{2}[LCR]?/(?:\d{6}|CLRD\d\d)', _runway_state, 'R'),
+    (_WEATHER, _weather, '+-VMPBDSTFRIGUH'),
+)
+
+# Первый символ группы -> список (fullmatch, обработчик)
+_DISPATCH = {}
+for _pattern, _handler, _chars in _RULES:
+    _fullmatch = re.compile(_pattern).fullmatch
+    for _char in _chars:
+        _DISPATCH.setdefault(_char, []).append((_fullmatch, _handler))
+
+_STATION = re.compile(r'[A-Z][A-Z0-9]{3}').fullmatch
+_TIME = re.compile(r'\d{6}Z').fullmatch
+
+# Группы, после которых разбор основной части сводки заканчивается
+TREND_GROUPS = frozenset(('NOSIG', 'BECMG', 'TEMPO'))
+SKY_CLEAR = frozenset(('NSC', 'NCD', 'SKC', 'CLR'))
+
+
+# Разбор групп погоды начиная с позиции start.
+# Возвращает позицию первой неразобранной группы (тренд, RMK или конец).
+def parse_groups(obs, tokens, start=0):
+    dispatch = _DISPATCH
+    for i in range(start, len(tokens)):
+        token = tokens[i]
+        if token == 'CAVOK':
+            obs.cavok = True
+        elif token in SKY_CLEAR:
+            obs.sky_clear = token
+        elif token == 'AUTO':
+            obs.auto = True
+        elif token == 'NIL':
+            obs.nil = True
+        elif token == 'NSW':
+            obs.nsw = True
+        elif token == 'RMK' or token in TREND_GROUPS:
+            return i
+        else:
+            for fullmatch, handler in dispatch.get(token[:1], ()):
+                m = fullmatch(token)
+                if m:
+                    handler(obs, m)
+                    break
+    return len(tokens)
+
+
+# Основная часть сводки в типичном порядке групп - одним регулярным выражением.
+# Всё, что не уложилось в этот порядок, разбирается по группам через parse_groups.
+_CORE = re.compile(r"""
+    (?:(METAR|SPECI)\ )?
+    (COR\ )?
+    (?:([A-Z][A-Z0-9]{3})\ )?
+    (\d\d)(\d\d)(\d\d)Z
+    (\ AUTO)?
+    (?:\ (\d{3}|VRB)(\d{2,3})(?:G(\d{2,3}))?(KT|MPS|KMH)
+        (?:\ (\d{3})V(\d{3}))?)?
+    (?:\ (?:(CAVOK)|(\d{4})(?:NDV)?
+        (?:\ (\d{4})(N|NE|E|SE|S|SW|W|NW))?))?
+    ((?:\ R\d\d[LCR]?/[PM]?\d{4}(?:V[PM]?\d{4})?(?:FT)?[UDN]?)*)
+    ((?:\ (?:[-+]|VC)?(?:MI|PR|BC|DR|BL|SH|TS|FZ){0,2}
+        (?:DZ|RA|SN|SG|IC|PL|GR|GS|UP|BR|FG|FU|VA|DU|SA|HZ|PO|SQ|FC|SS|DS){0,3}(?=\ |$))*)
+    (?:\ (?:(NSC|NCD|SKC|CLR)|VV(\d{3})))?
+    ((?:\ (?:FEW|SCT|BKN|OVC)\d{3}(?:CB|TCU|///)?)*)
+    (?:\ (M?\d\d)/(M?\d\d)?)?
+    (?:\ Q(\d{4}))?
+    ((?:\ R\d\d[LCR]?/(?:\d{6}|CLRD\d\d))*)
+    (?=\ |$)
+""", re.VERBOSE).match
+
+_CLOUD = re.compile(r'(FEW|SCT|BKN|OVC)(\d{3})(CB|TCU|///)?')
+
+
+def _parse_core(obs, m):
+    (report_type, cor, station, day, hour, minute, auto,
+     wdir, wspd, gust, unit, vfrom, vto, cavok, vis, vismin, vismindir,
+     rvr, wx, sky, vv, clouds, temp, dew, qnh, runway_state) = m.groups()
+    obs.report_type = report_type
+    obs.correction = cor is not None
+    obs.station = station
+    obs.day = int(day)
+    obs.hour = int(hour)
+    obs.minute = int(minute)
+    obs.auto = auto is not None
+    if wdir is not None:
+        obs.wind = Wind(
+            None if wdir == 'VRB' else int(wdir), int(wspd),
+            int(gust) if gust else None, unit,
+            int(vfrom) if vfrom else None, int(vto) if vto else None,
+        )
+    if cavok:
+        obs.cavok = True
+    elif vis is not None:
+        obs.visibility = int(vis)
+        if vismin:
+            obs.visibility_min = int(vismin)
+            obs.visibility_min_direction = vismindir
+    if rvr:
+        obs.rvr = rvr.split()
+    if wx:
+        obs.weather = [token for token in wx.split() if len(token) > 1]
+    obs.sky_clear = sky
+    if vv is not None:
+        obs.vertical_visibility = int(vv)
+    if clouds:
+        obs.clouds = [
+            CloudLayer(cover, int(height), cloud_type if cloud_type in ('CB', 'TCU') else None)
+            for cover, height, cloud_type in _CLOUD.findall(clouds)
+        ]
+    if temp is not None:
+        obs.temperature = _signed(temp)
+        if dew is not None:
+            obs.dew_point = _signed(dew)
+    if qnh is not None:
+        obs.qnh = int(qnh)
+    if runway_state:
+        obs.runway_state = runway_state.split()
+
+
+def parse_metar(metar):
+    obs = MetarObservation(raw=metar)
+    m = _CORE(metar)
+    if m is not None:
+        _parse_core(obs, m)
+        rest = metar[m.end():]
+        if not rest:
+            return obs
+        if rest.startswith((' NOSIG', ' BECMG', ' TEMPO', ' RMK')):
+            _split_trend(obs, rest)
+            return obs
+        tokens = rest.split()
+        i = 0
+    else:
+        tokens = metar.split()
+        i = _parse_header(obs, tokens)
+    n = len(tokens)
+
+    i = parse_groups(obs, tokens, i)
+
+    # Прогноз на посадку и замечания храним как текст
+    if i < n and tokens[i] != 'RMK':
+        end = tokens.index('RMK', i) if 'RMK' in tokens else n
+        obs.trend = ' '.join(tokens[i:end])
+        i = end
+    if i < n:
+        obs.remarks = ' '.join(tokens[i + 1:])
+    return obs
+
+
+def _split_trend(obs, rest):
+    k = rest.find(' RMK')
+    if k == -1:
+        obs.trend = rest.strip()
+    else:
+        obs.trend = rest[:k].strip() or None
+        obs.remarks = rest[k + 4:].strip()
+
+
+# Заголовок: тип сводки, признак исправления, индекс станции
+def _parse_header(obs, tokens):
+    i = 0
+    n = len(tokens)
+    if i < n and tokens[i] in ('METAR', 'SPECI'):
+        obs.report_type = tokens[i]
+        i += 1
+    if i < n and tokens[i] == 'COR':
+        obs.correction = True
+        i += 1
+    if i + 1 < n and _STATION(tokens[i]) and (_TIME(tokens[i + 1]) or tokens[i + 1] == 'NIL'):
+        obs.station = tokens[i]
+        i += 1
+    return i
+
+
+# Полная дата по числу месяца и времени из сводки: берётся ближайшая к reference
+# (сводки и прогнозы не отстоят от текущего момента больше чем на полмесяца).
+# Час 24 допустим и означает полночь следующих суток; неверные день, час
+# или минуты - None.
+def resolve_time(day, hour, minute, reference):
+    if hour > 24 or minute > 59:
+        return None
+    best = None
+    for shift in (-1, 0, 1):
+        month = reference.month - 1 + shift
+        try:
+            candidate = datetime(
+                reference.year + month // 12, month % 12 + 1, day, tzinfo=reference.tzinfo
+            ) + timedelta(hours=hour, minutes=minute)
+        except ValueError:
+            continue
+        if best is None or abs(candidate - reference) < abs(best - reference):
+            best = candidate
+    return best
+
+
+# Скорость ветра (или порывов) в м/с; нет значения - None
+def to_mps(speed, unit):
+    if speed is None:
+        return None
+    return speed * WIND_TO_MPS.get(unit, 1.0)
+
+
+# Фактическая погода позволяет полёты по ПВП
+def is_vfr(obs):
+    if obs.nil or (obs.visibility is None and not obs.cavok):
+        return False
+    visibility = 9999 if obs.cavok else obs.visibility
+    ceiling = obs.ceiling_m
+    return visibility >= VFR_VISIBILITY_M and (ceiling is None or ceiling >= VFR_CEILING_M)
+
+
+# Категория полётных условий по нижней границе облаков и видимости:
+# LIFR - ниже 150 м или 1600 м, IFR - ниже 300 м или 5000 м,
+# MVFR - не выше 900 м или не более 8000 м, иначе VFR
+FLIGHT_CATEGORIES = (
+    ("LIFR", 150, 1600),
+    ("IFR", 300, 5000),
+    ("MVFR", 901, 8001),
+)
+
+
+def flight_category(obs):
+    if obs.nil or (obs.visibility is None and not obs.cavok):
+        return None
+    visibility = 9999 if obs.cavok else obs.visibility
+    ceiling = obs.ceiling_m
+    for category, ceiling_below, visibility_below in FLIGHT_CATEGORIES:
+        if visibility < visibility_below or (ceiling is not None and ceiling < ceiling_below):
+            return category
+    return "VFR"
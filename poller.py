@@ -0,0 +1,198 @@
+import argparse
+import logging
+import random
+import signal
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from alerts import get_alerts
+from config import METRICS_PATH, METRICS_PORT, WATCHLIST_PATH
+from history import get_history
+from instrumentation import get_metrics, inc, span, start_http_server
+from metar_cache import ERROR_TTL, ISSUE_INTERVAL, PUBLISH_DELAY, MetarCache
+from metar_fetch import fetch_many
+from vartovsk import is_icao, parse_icao_list
+
+# Фоновая загрузка сводок для списка станций в общий кэш (metar_cache).
+# Страницы читают кэш локально (VARTOVSK_CACHE_READ_ONLY=1 - только читают),
+# а нагрузка на сервис зависит от числа станций, а не пользователей.
+#
+#   python poller.py                 # станции из watchlist.txt
+#   python poller.py USNN USRR       # или явным списком
+#   python poller.py --once          # один проход (для cron)
+#
+# После каждого прохода показатели записываются в METRICS_PATH (формат Prometheus).
+
+log = logging.getLogger("poller")
+
+# Ограничение на весь процесс: запросов в секунду и допустимый всплеск
+RATE = 2.0
+BURST = 4
+WORKERS = 4
+# Повтор после ошибок: ERROR_TTL, 2*ERROR_TTL, ... но не реже раза в BACKOFF_MAX
+BACKOFF_MAX = 1800
+# Случайная добавка ко времени пробуждения, чтобы несколько процессов
+# не обращались к сервису одновременно
+JITTER = 20
+# Просыпаемся не реже, чем раз в MAX_SLEEP (на случай изменения кэша извне)
+MAX_SLEEP = 300
+
+
+class RateLimiter:
+    # Маркерная корзина: rate маркеров в секунду, не больше burst в запасе
+    def __init__(self, rate=RATE, burst=BURST):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+# Коды ИКАО из файла: через пробел или по строкам, после # - комментарий
+def load_watchlist(path=WATCHLIST_PATH):
+    codes = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            for code in line.split('#', 1)[0].upper().split():
+                if is_icao(code):
+                    codes.append(code)
+                else:
+                    log.warning("Пропущен некорректный код ИКАО: %s", code)
+    return list(dict.fromkeys(codes))
+
+
+# Ближайший момент выхода сводок: HH:00/HH:30 плюс задержка публикации
+def next_issue(now=None):
+    now = now or time.time()
+    interval = ISSUE_INTERVAL.total_seconds()
+    delay = PUBLISH_DELAY.total_seconds()
+    slot = (now - delay) // interval * interval + interval + delay
+    return slot
+
+
+def backoff(failures):
+    delay = min(BACKOFF_MAX, ERROR_TTL * 2 ** (failures - 1))
+    return delay * random.uniform(0.5, 1.5)
+
+
+class Poller:
+    # metrics_path - куда записывать показатели после прохода (None - не записывать)
+    # alerts - предупреждения (alerts.AlertEngine) проверяются по каждой полученной сводке
+    def __init__(self, stations, cache=None, limiter=None, workers=WORKERS, metrics_path=None, alerts=None):
+        self.stations = stations
+        self.cache = cache or MetarCache(history=get_history())
+        self.limiter = limiter or RateLimiter()
+        self.workers = workers
+        self.metrics_path = metrics_path
+        self.alerts = alerts
+        self.failures = {}
+        self.stop = threading.Event()
+
+    def _poll(self, icao):
+        self.limiter.acquire()
+        result = self.cache.refresh(icao)
+        if result.error:
+            failures = self.failures.get(icao, 0) + 1
+            self.failures[icao] = failures
+            delay = backoff(failures)
+            self.cache.postpone(icao, time.time() + delay)
+            log.warning("%s: %s (попытка %d, повтор через %.0f с)", icao, result.error, failures, delay)
+        else:
+            self.failures.pop(icao, None)
+            if self.alerts is not None:
+                self._report_alerts(icao, result)
+        return result
+
+    def _report_alerts(self, icao, result):
+        for event in self.alerts.update(icao, result.metar, result.taf):
+            alert = event.alert
+            if event.kind == "fired":
+                log.warning("%s: ПРЕДУПРЕЖДЕНИЕ [%s] %s%s", icao, alert.rule.severity, alert.message,
+                            f" ({alert.detail})" if alert.detail else "")
+            else:
+                log.info("%s: снято предупреждение: %s", icao, alert.message)
+
+    # Один проход: обновить станции, срок которых истёк
+    def poll_once(self):
+        due, next_expiry = self.cache.due(self.stations)
+        if due:
+            started = time.monotonic()
+            with span("poll"):
+                errors = sum(1 for result in fetch_many(due, fetch=self._poll, max_workers=self.workers) if result.error)
+            inc("poll_stations_total", len(due))
+            log.info("Обновлено станций: %d, ошибок: %d, %.1f с", len(due), errors, time.monotonic() - started)
+            _, next_expiry = self.cache.due(self.stations)
+        if self.metrics_path is not None:
+            try:
+                get_metrics().write(self.metrics_path)
+            except OSError as e:
+                log.warning("Не удалось записать метрики в %s: %s", self.metrics_path, e)
+        return next_expiry
+
+    def run(self):
+        log.info("Станций в списке: %d", len(self.stations))
+        while not self.stop.is_set():
+            next_expiry = self.poll_once()
+            now = time.time()
+            wake = min(next_issue(now), now + MAX_SLEEP)
+            if next_expiry is not None:
+                wake = min(wake, next_expiry)
+            wake += random.uniform(0, JITTER)
+            log.debug("Следующая проверка в %s", datetime.fromtimestamp(wake, timezone.utc).strftime("%H:%M:%S"))
+            self.stop.wait(max(0, wake - time.time()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Фоновая загрузка METAR/TAF в локальный кэш")
+    parser.add_argument("stations", nargs="*", help="коды ИКАО (по умолчанию - из файла списка)")
+    parser.add_argument("--watchlist", default=WATCHLIST_PATH, help="файл со списком станций")
+    parser.add_argument("--rate", type=float, default=RATE, help="запросов в секунду на весь процесс")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="одновременных запросов")
+    parser.add_argument("--once", action="store_true", help="один проход и выход")
+    parser.add_argument("--metrics-file", default=METRICS_PATH, type=Path, help="файл метрик Prometheus")
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT, help="порт HTTP /metrics (0 - не запускать)")
+    parser.add_argument("--no-alerts", action="store_true", help="не проверять предупреждения")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format="%(asctime)s %(levelname)s %(message)s",
+    )
+    invalid = [code for code in args.stations if not is_icao(code.upper())]
+    if invalid:
+        parser.error(f"некорректные коды ИКАО: {' '.join(invalid)}")
+    stations = parse_icao_list(" ".join(args.stations)) or load_watchlist(args.watchlist)
+    if not stations:
+        parser.error("список станций пуст")
+
+    if args.metrics_port:
+        start_http_server(args.metrics_port)
+    poller = Poller(
+        stations, limiter=RateLimiter(args.rate, max(1, int(args.rate * 2))), workers=args.workers,
+        metrics_path=args.metrics_file, alerts=None if args.no_alerts else get_alerts(),
+    )
+    if args.once:
+        poller.poll_once()
+        return
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: poller.stop.set())
+    poller.run()
+
+
+if __name__ == "__main__":
+    main()
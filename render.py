@@ -0,0 +1,168 @@
+# Текстовое представление разобранных сводок на русском языке
+
+CLOUD_TYPES = {
+    'FEW': 'незначительная (1-2/8 неба)',
+    'SCT': 'разрозненные (3-4/8 неба)',
+    'BKN': 'значительная (5-7/8 неба)',
+    'OVC': 'сплошная (8/8 неба)'
+}
+
+# Направление ветра по 8 румбам: индекс (dir + 22) // 45 % 8
+COMPASS = (
+    'северный', 'северо-восточный', 'восточный', 'юго-восточный',
+    'южный', 'юго-западный', 'западный', 'северо-западный'
+)
+
+WIND_UNITS = {'MPS': 'м/с', 'KT': 'узлов', 'KMH': 'км/ч'}
+
+WEATHER_INTENSITY = {'-': 'слаб.', '+': 'сильн.', 'VC': 'в окрестностях'}
+
+WEATHER_CODES = {
+    'MI': 'поземный', 'PR': 'частичный', 'BC': 'клочьями', 'DR': 'позёмок',
+    'BL': 'метель', 'SH': 'ливневый', 'TS': 'гроза', 'FZ': 'переохлаждённый',
+    'DZ': 'морось', 'RA': 'дождь', 'SN': 'снег', 'SG': 'снежные зёрна',
+    'IC': 'ледяные иглы', 'PL': 'ледяной дождь', 'GR': 'град', 'GS': 'крупа',
+    'UP': 'неизвестные осадки', 'BR': 'дымка', 'FG': 'туман', 'FU': 'дым',
+    'VA': 'вулканический пепел', 'DU': 'пыль', 'SA': 'песок', 'HZ': 'мгла',
+    'PO': 'пыльные вихри', 'SQ': 'шквал', 'FC': 'смерч', 'SS': 'песчаная буря',
+    'DS': 'пыльная буря',
+}
+
+
+def _signed(value):
+    return f"-{-value:02d}" if value < 0 else f"{value:02d}"
+
+
+def render_time(day, hour, minute):
+    return f"{hour:02d}:{minute:02d} UTC {day:02d} числа"
+
+
+def render_wind(wind):
+    unit = WIND_UNITS[wind.unit]
+    if wind.direction is None:
+        wind_str = f"🌬️ Ветер: переменный {wind.speed:02d} {unit}"
+    else:
+        compass = COMPASS[(wind.direction + 22) // 45 % 8]
+        wind_str = f"🌬️ Ветер: {wind.direction}° ({compass}) {wind.speed:02d} {unit}"
+    if wind.gust is not None:
+        wind_str += f", порывы до {wind.gust:02d} {unit}"
+    return wind_str
+
+
+def render_visibility(vis):
+    if vis >= 9999:
+        return "👀 Видимость: 10+ км"
+    return f"👀 Видимость: {vis//1000 if vis%1000==0 else vis/1000:.1f} км"
+
+
+def render_weather(code):
+    intensity = None
+    if code[0] in '-+':
+        intensity, code = code[0], code[1:]
+    elif code.startswith('VC'):
+        intensity, code = 'VC', code[2:]
+    words = [WEATHER_CODES.get(code[i:i + 2], code[i:i + 2]) for i in range(0, len(code), 2)]
+    text = " ".join(words)
+    if intensity:
+        text += f" ({WEATHER_INTENSITY[intensity]})"
+    return text
+
+
+def render_cloud(layer):
+    cloud_str = f"   - {CLOUD_TYPES[layer.cover]} на {layer.height_m} метрах"
+    if layer.cloud_type == 'CB':
+        cloud_str += " (кучево-дождевые)"
+    elif layer.cloud_type == 'TCU':
+        cloud_str += " (башнеобразные)"
+    return cloud_str
+
+
+# Строки расшифровки без заголовка времени (используются и для групп TAF)
+def render_weather_lines(obs):
+    decoded = []
+    if obs.wind is not None:
+        decoded.append(render_wind(obs.wind))
+    if obs.visibility is not None:
+        decoded.append(render_visibility(obs.visibility))
+    if obs.cavok:
+        decoded.append("👀 Видимость: 10+ км, без осадков и значительной облачности")
+    if obs.weather:
+        decoded.append("🌨️ Явления: " + ", ".join(render_weather(code) for code in obs.weather))
+    if obs.clouds:
+        decoded.append("☁️ Облачность:")
+        decoded.extend(render_cloud(layer) for layer in obs.clouds)
+    if obs.vertical_visibility is not None:
+        decoded.append(f"☁️ Вертикальная видимость: {obs.vertical_visibility * 30} метров")
+    if obs.temperature is not None and obs.dew_point is not None:
+        decoded.append(f"🌡️ Температура: {_signed(obs.temperature)}°C, точка росы: {_signed(obs.dew_point)}°C")
+    if obs.qnh is not None:
+        decoded.append(f"⏱️ Давление: {obs.qnh:04d} гПа (QNH)")
+    return decoded
+
+
+def render_metar(obs):
+    decoded = []
+    if obs.day is not None:
+        decoded.append(f"🕒 Время наблюдения: {render_time(obs.day, obs.hour, obs.minute)}")
+    decoded.extend(render_weather_lines(obs))
+    return "\n".join(decoded)
+
+
+def render_period(start, end):
+    return (
+        f"с {render_time(start.day, start.hour, start.minute)}"
+        f" до {render_time(end.day, end.hour, end.minute)}"
+    )
+
+
+def _group_header(group):
+    period = f" {render_period(group.start, group.end)}" if group.start and group.end else ""
+    if group.kind == 'FM':
+        start = group.start
+        if start is None:
+            # Время не распознано - показываем группу как есть
+            return f"⌛ {group.raw.split()[0]}:"
+        return f"⌛ С {render_time(start.day, start.hour, start.minute)}:"
+    if group.kind == 'BECMG':
+        return f"🔄 Постепенные изменения (BECMG){period}:"
+    if group.kind == 'TEMPO':
+        return f"⏳ Временные изменения (TEMPO){period}:"
+    if group.tempo:
+        return f"❔ Вероятность {group.probability}%, временные изменения{period}:"
+    return f"❔ Вероятность {group.probability}%{period}:"
+
+
+def _group_lines(obs):
+    lines = render_weather_lines(obs)
+    if obs.nsw:
+        lines.append("🌤️ Без особых явлений погоды")
+    return lines
+
+
+def render_taf(forecast):
+    if forecast.nil:
+        return "Прогноз отсутствует (NIL)"
+
+    decoded = ["🕒 Основной прогноз:"]
+    if forecast.issued:
+        issued = forecast.issued
+        decoded.append(f"🕒 Время выпуска: {render_time(issued.day, issued.hour, issued.minute)}")
+    if forecast.valid_from and forecast.valid_to:
+        decoded.append(f"📅 Срок действия: {render_period(forecast.valid_from, forecast.valid_to)}")
+    if forecast.cancelled:
+        decoded.append("❌ Прогноз отменён (CNL)")
+
+    for group in forecast.groups:
+        if group.kind == 'BASE':
+            decoded.extend(_group_lines(group.conditions))
+        else:
+            decoded.append("\n" + _group_header(group))
+            decoded.extend(f"   {line}" for line in _group_lines(group.conditions))
+
+    for label, value in (("Максимальная", forecast.temperature_max), ("Минимальная", forecast.temperature_min)):
+        if value:
+            temperature, when = value
+            # Время не распознано - только значение
+            at = f" в {render_time(when.day, when.hour, when.minute)}" if when else ""
+            decoded.append(f"\n🌡️ {label} температура: {_signed(temperature)}°C{at}")
+    return "\n".join(decoded)
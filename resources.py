@@ -0,0 +1,45 @@
+import threading
+
+import streamlit as st
+
+from airports import load_directory
+
+# Общие для всех сессий объекты процесса streamlit. Тяжёлые зависимости
+# (scipy, airportsdata) импортируются при первом обращении, а не при старте.
+# warm_up() строит то, что понадобится почти наверняка, в фоне - после того,
+# как первая страница уже отрисована.
+
+# Справочник аэропортов: объект с индексом не копируется между сессиями
+@st.cache_resource(show_spinner=False)
+def get_airports():
+    return load_directory()
+
+# Индекс поиска по названию и городу
+@st.cache_resource(show_spinner=False)
+def get_search_index():
+    from airport_search import AirportSearch
+    return AirportSearch(get_airports())
+
+# Координаты и пространственный индекс (scipy) - только для режима «Аэродромы района»
+@st.cache_resource(show_spinner=False)
+def get_geo_index():
+    from airport_geo import build_geo_index
+    return build_geo_index(get_airports())
+
+
+def _warm_up():
+    try:
+        from metar_cache import get_cache
+        get_cache()
+        get_search_index()
+    except Exception:
+        # Не получилось заранее - построится при первом обращении
+        pass
+
+
+# Один фоновый прогрев на процесс
+@st.cache_resource(show_spinner=False)
+def warm_up():
+    thread = threading.Thread(target=_warm_up, daemon=True, name="warm-up")
+    thread.start()
+    return thread
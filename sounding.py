@@ -0,0 +1,555 @@
+import io
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+import numpy as np
+import polars as pl
+
+from metar_parser import KT_TO_MPS, resolve_time
+
+# Данные радиозондирования: разбор телеграмм TEMP (части TTAA и TTBB) и таблиц
+# (CSV или текстовый формат University of Wyoming), расчёт характеристик
+# устойчивости средствами MetPy и построение диаграммы Skew-T.
+# Все профили хранятся массивами NumPy по уровням в порядке убывания давления.
+
+RD = 287.04
+G = 9.80665
+
+# Стандартные изобарические поверхности части A и их индикаторы
+_STANDARD_LEVELS = {
+    '00': 1000, '92': 925, '85': 850, '70': 700, '50': 500, '40': 400,
+    '30': 300, '25': 250, '20': 200, '15': 150, '10': 100,
+}
+# Id: последняя поверхность, для которой передан ветер
+_WIND_TOP = {
+    '1': 100, '2': 200, '3': 300, '4': 400, '5': 500, '6': 600,
+    '7': 700, '8': 850, '9': 925, '0': 1000,
+}
+# Разделы, после которых данные уровней заканчиваются
+_SECTION_END = {'31313', '41414', '51515', '52525', '53535', '54545', '55555', '56565', '57575', '58585', '59595'}
+_PART = re.compile(r'TT(AA|BB|CC|DD)|PP(BB|DD)').fullmatch
+
+
+@dataclass(slots=True)
+class Sounding:
+    station: str
+    time: datetime | None
+    pressure: np.ndarray     # гПа
+    height: np.ndarray       # м
+    temperature: np.ndarray  # °C
+    dewpoint: np.ndarray     # °C
+    wind_direction: np.ndarray  # градусы
+    wind_speed: np.ndarray      # м/с
+    source: str = ''
+
+    # Идентификатор зондирования: станция и срок (без срока - по содержимому)
+    @property
+    def id(self):
+        when = f"{self.time:%Y%m%d%H}" if self.time else f"{zlib.crc32(self.source.encode()):08x}"
+        return f"{self.station}_{when}"
+
+    # Отпечаток содержимого: исправленная телеграмма за тот же срок даёт другой
+    @property
+    def digest(self):
+        crc = 0
+        for values in (self.pressure, self.height, self.temperature, self.dewpoint,
+                       self.wind_direction, self.wind_speed):
+            crc = zlib.crc32(np.ascontiguousarray(values).tobytes(), crc)
+        return f"{crc:08x}"
+
+
+@dataclass(slots=True)
+class Analysis:
+    sounding_id: str
+    pressure: np.ndarray     # уровни, по которым рассчитана частица
+    temperature: np.ndarray  # температура воздуха на этих уровнях, °C
+    dewpoint: np.ndarray
+    parcel: np.ndarray       # температура частицы, поднимающейся от земли, °C
+    lcl_pressure: float
+    lcl_temperature: float
+    lcl_height: float
+    lfc_pressure: float
+    el_pressure: float
+    cape: float              # Дж/кг
+    cin: float               # Дж/кг
+    lifted_index: float
+    precipitable_water: float  # мм
+    freezing_level: float      # м над уровнем моря
+    freezing_level_pressure: float
+    surface_pressure: float = float('nan')
+
+
+# --- TEMP ---------------------------------------------------------------
+
+def _temperature(group):
+    if group[:3] == '///' or not group[:3].isdigit():
+        return np.nan, np.nan
+    tenths = int(group[2])
+    temperature = int(group[:3]) / 10
+    if tenths % 2:
+        temperature = -temperature
+    depression = group[3:5]
+    if not depression.isdigit():
+        return temperature, np.nan
+    dd = int(depression)
+    if dd <= 50:
+        return temperature, temperature - dd / 10
+    if dd >= 56:
+        return temperature, temperature - (dd - 50)
+    return temperature, np.nan
+
+
+# dddff: единицы направления (1 или 6) несут сотни скорости
+def _wind(group, knots):
+    if not group.isdigit():
+        return np.nan, np.nan
+    direction, speed = int(group[:3]), int(group[3:])
+    hundreds = direction % 5
+    direction -= hundreds
+    speed += 100 * hundreds
+    if knots:
+        speed *= KT_TO_MPS
+    return float(direction % 360), float(speed)
+
+
+# Геопотенциал стандартной поверхности по трём цифрам hhh
+def _standard_height(level, hhh):
+    if not hhh.isdigit():
+        return np.nan
+    h = int(hhh)
+    if level == 1000:
+        return float(500 - h if h >= 500 else h)
+    if level == 925:
+        return float(h)
+    if level == 850:
+        return float(1000 + h)
+    if level == 700:
+        return float(3000 + h if h < 500 else 2000 + h)
+    if level in (500, 400):
+        return h * 10.0
+    if level in (300, 250):
+        return (h + 1000 if h < 500 else h) * 10.0
+    return (h + 1000) * 10.0
+
+
+def _pressure(ppp):
+    p = int(ppp)
+    return float(p + 1000 if p < 100 else p)
+
+
+def _header(tokens):
+    # YYGGI IIiii: день (+50, если ветер в узлах), срок, индикатор; индекс станции
+    if len(tokens) < 2 or not tokens[0][:4].isdigit():
+        return None
+    day, hour = int(tokens[0][:2]), int(tokens[0][2:4])
+    knots = day > 50
+    return (day - 50 if knots else day), hour, tokens[0][4:5], knots, tokens[1]
+
+
+def _part_a(tokens, levels):
+    header = _header(tokens)
+    if header is None:
+        return None
+    day, hour, top, knots, station = header
+    wind_top = _WIND_TOP.get(top)
+    i, n = 2, len(tokens)
+    while i + 1 < n:
+        group = tokens[i]
+        indicator = group[:2]
+        if group in _SECTION_END or indicator in ('88', '77', '66'):
+            break
+        if indicator == '99':
+            pressure = _pressure(group[2:]) if group[2:].isdigit() else np.nan
+            height = np.nan
+            has_wind = True
+            surface = True
+        elif indicator in _STANDARD_LEVELS:
+            pressure = float(_STANDARD_LEVELS[indicator])
+            height = _standard_height(_STANDARD_LEVELS[indicator], group[2:])
+            has_wind = wind_top is not None and pressure >= wind_top
+            surface = False
+        else:
+            i += 1
+            continue
+        temperature, dewpoint = _temperature(tokens[i + 1])
+        direction = speed = np.nan
+        if has_wind and i + 2 < n:
+            direction, speed = _wind(tokens[i + 2], knots)
+        i += 3 if has_wind else 2
+        if not np.isnan(pressure):
+            levels.append((pressure, height, temperature, dewpoint, direction, speed, surface))
+    return day, hour, station
+
+
+def _part_b(tokens, levels, winds):
+    header = _header(tokens)
+    if header is None:
+        return None
+    day, hour, _, knots, station = header
+    i, n = 2, len(tokens)
+    section_winds = False
+    while i + 1 < n:
+        group = tokens[i]
+        if group in _SECTION_END:
+            break
+        if group == '21212':
+            section_winds = True
+            i += 1
+            continue
+        if len(group) != 5 or group[0] != group[1] or not group[2:].isdigit():
+            i += 1
+            continue
+        pressure = _pressure(group[2:])
+        if section_winds:
+            winds.append((pressure, *_wind(tokens[i + 1], knots)))
+        else:
+            levels.append((pressure, np.nan, *_temperature(tokens[i + 1]), np.nan, np.nan, group[:2] == '00'))
+        i += 2
+    return day, hour, station
+
+
+# Все зондирования из текста телеграмм TEMP (части одной станции и срока объединяются).
+# reference - дата, к которой привязывается день месяца из телеграммы.
+def parse_temp(text, reference=None):
+    reference = reference or datetime.now(timezone.utc)
+    tokens = text.replace('=', ' = ').split()
+    parts = {}
+    i = 0
+    while i < len(tokens):
+        m = _PART(tokens[i])
+        if m is None:
+            i += 1
+            continue
+        end = i + 1
+        while end < len(tokens) and tokens[end] != '=' and not _PART(tokens[end]):
+            end += 1
+        body = tokens[i + 1:end]
+        if 'NIL' not in body[:3]:
+            levels, winds = [], []
+            if m[1] == 'AA':
+                key = _part_a(body, levels)
+            elif m[1] == 'BB':
+                key = _part_b(body, levels, winds)
+            else:
+                # Части C/D (выше 100 гПа) и PILOT для расчётов устойчивости не нужны
+                key = None
+            if key is not None:
+                sounding_levels, sounding_winds = parts.setdefault(key, ([], []))
+                sounding_levels.extend(levels)
+                sounding_winds.extend(winds)
+        i = end
+    soundings = []
+    for (day, hour, station), (levels, winds) in parts.items():
+        when = resolve_time(day, hour, 0, reference) if 1 <= day <= 31 and hour <= 24 else None
+        sounding = _build(station, when, levels, winds, source=text)
+        if sounding is not None:
+            soundings.append(sounding)
+    return soundings
+
+
+# Сведение уровней частей A и B в один профиль
+def _build(station, when, levels, winds, source=''):
+    if not levels:
+        return None
+    surface = [level for level in levels if level[6]]
+    surface_pressure = surface[0][0] if surface else None
+
+    merged = {}
+    for pressure, height, temperature, dewpoint, direction, speed, _ in levels:
+        if surface_pressure is not None and pressure > surface_pressure:
+            continue  # стандартные уровни ниже поверхности земли
+        row = merged.setdefault(pressure, [np.nan] * 5)
+        for k, value in enumerate((height, temperature, dewpoint, direction, speed)):
+            if np.isnan(row[k]):
+                row[k] = value
+    for pressure, direction, speed in winds:
+        if surface_pressure is not None and pressure > surface_pressure:
+            continue
+        row = merged.setdefault(pressure, [np.nan] * 5)
+        if np.isnan(row[3]):
+            row[3], row[4] = direction, speed
+
+    pressure = np.array(sorted(merged, reverse=True), dtype=float)
+    data = np.array([merged[p] for p in pressure], dtype=float).reshape(len(pressure), 5)
+    return _sounding(station, when, pressure, *data.T, source=source)
+
+
+# Недостающие температуры и высоты уровней: температура - линейно по ln p,
+# высоты - гипсометрической формулой от ближайшего уровня с известной высотой
+def _sounding(station, when, pressure, height, temperature, dewpoint, direction, speed, source=''):
+    log_p = -np.log(pressure)
+    known = np.isfinite(temperature)
+    if known.sum() >= 2 and not known.all():
+        temperature = temperature.copy()
+        temperature[~known] = np.interp(log_p[~known], log_p[known], temperature[known], left=np.nan, right=np.nan)
+    if np.isfinite(height).any() and not np.isfinite(height).all() and np.isfinite(temperature).all():
+        t_mean = (temperature[1:] + temperature[:-1]) / 2 + 273.15
+        thickness = RD / G * t_mean * np.log(pressure[:-1] / pressure[1:])
+        profile = np.concatenate(([0.0], np.cumsum(thickness)))
+        anchor = np.flatnonzero(np.isfinite(height))[0]
+        height = np.where(np.isfinite(height), height, profile - profile[anchor] + height[anchor])
+    return Sounding(station, when, pressure, height, temperature, dewpoint, direction, speed, source)
+
+
+# --- Таблицы -------------------------------------------------------------
+
+_ALIASES = {
+    'pressure': ('pressure', 'pres', 'p', 'press', 'hpa'),
+    'height': ('height', 'hght', 'z', 'gph', 'geopotential'),
+    'temperature': ('temperature', 'temp', 't'),
+    'dewpoint': ('dewpoint', 'dwpt', 'td', 'dew_point'),
+    'wind_direction': ('wind_direction', 'drct', 'direction', 'wd', 'dir'),
+    'wind_speed': ('wind_speed', 'speed', 'ws', 'wspd'),
+    'wind_speed_kt': ('sknt', 'speed_kt', 'wind_speed_kt'),
+}
+_WYOMING_STATION = re.compile(r'Station (?:number|identifier):\s*(\w+)')
+_WYOMING_TIME = re.compile(r'Observation time:\s*(\d{6})/(\d{4})')
+
+
+def _columns(frame):
+    names = {name.strip().lower(): name for name in frame.columns}
+    found = {}
+    for target, aliases in _ALIASES.items():
+        for alias in aliases:
+            if alias in names:
+                found[target] = frame[names[alias]].cast(pl.Float64, strict=False).to_numpy()
+                break
+    return found
+
+
+def _from_columns(columns, station, when, source=''):
+    if 'pressure' not in columns or 'temperature' not in columns:
+        raise ValueError("В таблице нет столбцов давления и температуры")
+    n = len(columns['pressure'])
+    empty = np.full(n, np.nan)
+    speed = columns.get('wind_speed')
+    if speed is None and 'wind_speed_kt' in columns:
+        speed = columns['wind_speed_kt'] * KT_TO_MPS
+    order = np.argsort(-columns['pressure'], kind='stable')
+    values = [
+        columns['pressure'], columns.get('height', empty), columns['temperature'],
+        columns.get('dewpoint', empty), columns.get('wind_direction', empty),
+        speed if speed is not None else empty,
+    ]
+    values = [np.asarray(v, dtype=float)[order] for v in values]
+    valid = np.isfinite(values[0])
+    return _sounding(station, when, *(v[valid] for v in values), source=source)
+
+
+# Текстовый формат University of Wyoming: столбцы по 7 символов
+def _parse_wyoming(text, station, when):
+    lines = text.splitlines()
+    header = next(k for k, line in enumerate(lines) if line.split()[:2] == ['PRES', 'HGHT'])
+    names = [name.lower() for name in lines[header].split()]
+    rows = []
+    for line in lines[header + 1:]:
+        if not line.strip() or line.startswith('-') or not line.strip()[0].isdigit():
+            if rows and not line.startswith('-') and line.strip():
+                break
+            continue
+        rows.append([line[k * 7:(k + 1) * 7].strip() or None for k in range(len(names))])
+    frame = pl.DataFrame(rows, schema=names, orient="row")
+    m = _WYOMING_STATION.search(text)
+    station = station or (m[1] if m else '')
+    m = _WYOMING_TIME.search(text)
+    if when is None and m:
+        when = datetime.strptime(m[1] + m[2], "%y%m%d%H%M").replace(tzinfo=timezone.utc)
+    return _from_columns(_columns(frame), station, when, text)
+
+
+# Профиль из таблицы: CSV с заголовком (pressure, height, temperature, dewpoint,
+# wind_direction, wind_speed или сокращения PRES/HGHT/TEMP/DWPT/DRCT/SKNT) или текст Wyoming
+def parse_table(data, station='', when=None):
+    text = data.decode('utf-8', errors='replace') if isinstance(data, bytes) else data
+    if re.search(r'^\s*PRES\s+HGHT', text, re.MULTILINE):
+        return _parse_wyoming(text, station, when)
+    frame = pl.read_csv(io.StringIO(text), infer_schema=False, separator=';' if text.count(';') > text.count(',') else ',')
+    return _from_columns(_columns(frame), station, when, text)
+
+
+# Текст телеграмм TEMP или таблица - по содержимому
+def parse_sounding_text(text, reference=None):
+    if re.search(r'\bTT(AA|BB)\b', text):
+        return parse_temp(text, reference)
+    return [parse_table(text)]
+
+
+# --- Расчёты ---------------------------------------------------------------
+
+# Уровень нулевой изотермы: первое пересечение 0 °C снизу (линейно по высоте)
+def freezing_level(height, temperature, pressure):
+    valid = np.isfinite(height) & np.isfinite(temperature)
+    z, t, p = height[valid], temperature[valid], pressure[valid]
+    if not len(t):
+        return np.nan, np.nan
+    if t[0] <= 0:
+        return z[0], p[0]
+    crossing = np.flatnonzero((t[:-1] > 0) & (t[1:] <= 0))
+    if not len(crossing):
+        return np.nan, np.nan
+    k = crossing[0]
+    w = t[k] / (t[k] - t[k + 1])
+    return z[k] + w * (z[k + 1] - z[k]), float(np.exp(np.log(p[k]) + w * (np.log(p[k + 1]) - np.log(p[k]))))
+
+
+def _magnitude(value, unit):
+    if value is None:
+        return np.nan
+    value = value.to(unit).magnitude
+    return float(np.nan if np.ndim(value) else value)
+
+
+# Характеристики устойчивости для частицы, поднимающейся от поверхности
+def analyze(sounding):
+    import metpy.calc as mpcalc
+    from metpy.units import units
+
+    valid = np.isfinite(sounding.pressure) & np.isfinite(sounding.temperature) & np.isfinite(sounding.dewpoint)
+    if valid.sum() < 3:
+        raise ValueError(f"{sounding.id}: недостаточно уровней с температурой и точкой росы")
+    p = sounding.pressure[valid] * units.hPa
+    t = sounding.temperature[valid] * units.degC
+    td = sounding.dewpoint[valid] * units.degC
+
+    lcl_p, lcl_t = mpcalc.lcl(p[0], t[0], td[0])
+    parcel = mpcalc.parcel_profile(p, t[0], td[0]).to('degC')
+    lfc_p, _ = mpcalc.lfc(p, t, td, parcel)
+    el_p, _ = mpcalc.el(p, t, td, parcel)
+    cape, cin = mpcalc.cape_cin(p, t, td, parcel)
+    lifted = mpcalc.lifted_index(p, t, parcel)
+    pw = mpcalc.precipitable_water(p, td)
+    frz_height, frz_pressure = freezing_level(sounding.height, sounding.temperature, sounding.pressure)
+
+    # Высота LCL - по высотам уровней, линейно по ln p
+    log_p = np.log(sounding.pressure[::-1])
+    heights = np.isfinite(sounding.height[::-1])
+    lcl_pressure = _magnitude(lcl_p, 'hPa')
+    lcl_height = float(np.interp(np.log(lcl_pressure), log_p[heights], sounding.height[::-1][heights])) if heights.any() else np.nan
+
+    return Analysis(
+        sounding_id=sounding.id,
+        pressure=p.magnitude,
+        temperature=t.magnitude,
+        dewpoint=td.magnitude,
+        parcel=parcel.magnitude,
+        lcl_pressure=lcl_pressure,
+        lcl_temperature=_magnitude(lcl_t, 'degC'),
+        lcl_height=lcl_height,
+        lfc_pressure=_magnitude(lfc_p, 'hPa'),
+        el_pressure=_magnitude(el_p, 'hPa'),
+        cape=_magnitude(cape, 'J/kg'),
+        cin=_magnitude(cin, 'J/kg'),
+        lifted_index=float(np.asarray(lifted.to('delta_degC').magnitude).ravel()[0]),
+        precipitable_water=_magnitude(pw, 'mm'),
+        freezing_level=float(frz_height),
+        freezing_level_pressure=float(frz_pressure),
+        surface_pressure=float(p[0].magnitude),
+    )
+
+
+# Расчёты запоминаются по идентификатору и отпечатку зондирования
+ANALYSIS_CACHE_SIZE = 512
+_analyses = OrderedDict()
+_analyses_lock = threading.Lock()
+
+
+def get_analysis(sounding):
+    key = (sounding.id, sounding.digest)
+    with _analyses_lock:
+        if key in _analyses:
+            _analyses.move_to_end(key)
+            return _analyses[key]
+    analysis = analyze(sounding)
+    with _analyses_lock:
+        _analyses[key] = analysis
+        while len(_analyses) > ANALYSIS_CACHE_SIZE:
+            _analyses.popitem(last=False)
+    return analysis
+
+
+SUMMARY_SCHEMA = {
+    "id": pl.String,
+    "station": pl.String,
+    "time": pl.Datetime("us", "UTC"),
+    "surface_pressure": pl.Float64,
+    "lcl_pressure": pl.Float64,
+    "lcl_height": pl.Float64,
+    "lfc_pressure": pl.Float64,
+    "el_pressure": pl.Float64,
+    "cape": pl.Float64,
+    "cin": pl.Float64,
+    "lifted_index": pl.Float64,
+    "precipitable_water": pl.Float64,
+    "freezing_level": pl.Float64,
+    "error": pl.String,
+}
+
+
+# Сводная таблица по набору зондирований (например, за сутки по региону)
+def analyze_many(soundings):
+    rows = []
+    for sounding in soundings:
+        row = {"id": sounding.id, "station": sounding.station, "time": sounding.time, "error": None}
+        try:
+            analysis = get_analysis(sounding)
+        except Exception as e:
+            row["error"] = str(e)
+        else:
+            for name in SUMMARY_SCHEMA:
+                if name not in row:
+                    row[name] = getattr(analysis, name)
+        rows.append(row)
+    return pl.DataFrame(rows, schema=SUMMARY_SCHEMA)
+
+
+# --- Диаграмма -------------------------------------------------------------
+
+def plot_skewt(sounding, analysis=None, figsize=(8, 9)):
+    from matplotlib.figure import Figure
+    from metpy.plots import SkewT
+    from metpy.units import units
+
+    analysis = analysis or get_analysis(sounding)
+    fig = Figure(figsize=figsize)
+    skew = SkewT(fig, rotation=45)
+
+    p = sounding.pressure
+    t_valid = np.isfinite(sounding.temperature)
+    td_valid = np.isfinite(sounding.dewpoint)
+    skew.plot(p[t_valid], sounding.temperature[t_valid], 'r', linewidth=2, label='Температура')
+    skew.plot(p[td_valid], sounding.dewpoint[td_valid], 'g', linewidth=2, label='Точка росы')
+    skew.plot(analysis.pressure, analysis.parcel, 'k', linewidth=1.5, label='Частица')
+
+    p_units = analysis.pressure * units.hPa
+    t_units = analysis.temperature * units.degC
+    parcel = analysis.parcel * units.degC
+    skew.shade_cin(p_units, t_units, parcel, analysis.dewpoint * units.degC)
+    skew.shade_cape(p_units, t_units, parcel)
+
+    if np.isfinite(analysis.lcl_pressure):
+        skew.plot(analysis.lcl_pressure, analysis.lcl_temperature, 'ko', markerfacecolor='black', label='КУК')
+
+    winds = np.isfinite(sounding.wind_speed) & np.isfinite(sounding.wind_direction)
+    if winds.any():
+        direction = np.deg2rad(sounding.wind_direction[winds])
+        speed = sounding.wind_speed[winds]
+        u = -speed * np.sin(direction) * units('m/s')
+        v = -speed * np.cos(direction) * units('m/s')
+        skew.plot_barbs(p[winds], u, v, plot_units='knots')
+
+    skew.plot_dry_adiabats(alpha=0.3)
+    skew.plot_moist_adiabats(alpha=0.3)
+    skew.plot_mixing_lines(alpha=0.3)
+    skew.ax.axvline(0, color='c', linestyle='--', linewidth=1)
+    skew.ax.set_ylim(max(1050, np.nanmax(p) + 10), 100)
+    skew.ax.set_xlim(-40, 50)
+    skew.ax.set_xlabel('°C')
+    skew.ax.set_ylabel('гПа')
+    skew.ax.legend(loc='upper right')
+    when = f"{sounding.time:%d.%m.%Y %H} UTC" if sounding.time else ""
+    skew.ax.set_title(f"{sounding.station} {when}")
+    return fig
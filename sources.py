@@ -0,0 +1,346 @@
+import threading
+import time
+import xml.etree.ElementTree as ET
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+import requests
+
+import metar_fetch
+from config import DROP_DIR, SOURCES
+from instrumentation import inc
+from metar_fetch import (READ_TIMEOUT, FetchResult, HostBusy, count_outcome, http_get,
+                         parse_payload, request_metar_taf)
+
+# Источники сводок и порядок обращения к ним.
+# Upstream.fetch спрашивает источники по очереди (следующий - после ошибки
+# предыдущего), а если текущий отвечает дольше обычного (p95 его задержек),
+# параллельно запускает следующий и берёт первый удачный ответ.
+# Для каждого хоста - автомат защиты: после серии сбоев хост на время
+# исключается, и запрос сразу уходит к следующему источнику.
+
+# Автомат защиты: столько сбоев подряд размыкают его на BREAKER_RESET секунд
+BREAKER_FAILURES = 5
+BREAKER_RESET = 30
+# Дублирующий запрос - после p95 задержки источника, но в этих пределах
+HEDGE_MIN_DELAY = 0.2
+HEDGE_MAX_DELAY = 2.0
+HEDGE_QUANTILE = 0.95
+# Пока замеров меньше, ждём HEDGE_MAX_DELAY
+HEDGE_MIN_SAMPLES = 20
+# Меньше этого времени на запрос TAF не остаётся - TAF не запрашиваем, секунд
+MIN_REQUEST_TIMEOUT = 0.1
+LATENCY_SAMPLES = 256
+# Файлы старше этого в каталоге сброса не используются, секунд
+DROP_MAX_AGE = 3 * 3600
+
+AVIATIONWEATHER_URL = "https://aviationweather.gov"
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, host, failures=BREAKER_FAILURES, reset=BREAKER_RESET):
+        self.host = host
+        self.threshold = failures
+        self.reset = reset
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    # Можно ли обращаться к хосту. После паузы пропускается один пробный запрос
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset:
+                self._set(self.HALF_OPEN)
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            if self.state != self.CLOSED:
+                self._set(self.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+                if self.state != self.OPEN:
+                    self._set(self.OPEN)
+
+    def _set(self, state):
+        self.state = state
+        inc("circuit_breaker_transitions_total", host=self.host, state=state)
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+# Один автомат на хост, общий для всех источников и потоков процесса
+def get_breaker(host):
+    with _breakers_lock:
+        if host not in _breakers:
+            _breakers[host] = CircuitBreaker(host)
+        return _breakers[host]
+
+
+class Source:
+    name = "source"
+    host = None
+
+    def __init__(self):
+        self.breaker = get_breaker(self.host or self.name)
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    # Сводки станции; сбои - исключениями
+    def fetch(self, icao, timeout, session=None, etag=None, last_modified=None):
+        raise NotImplementedError
+
+    # Считается ли ошибка сбоем хоста (для автомата защиты).
+    # Нет данных по станции или неверный код (4xx) - не сбой.
+    def is_failure(self, error):
+        if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+            return error.response.status_code >= 500 or error.response.status_code == 429
+        return not isinstance(error, (HostBusy, LookupError))
+
+    # Когда запускать дублирующий запрос к следующему источнику
+    def hedge_delay(self):
+        if len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return HEDGE_MAX_DELAY
+        ordered = sorted(self.latencies)
+        delay = ordered[min(len(ordered) - 1, int(HEDGE_QUANTILE * len(ordered)))]
+        return min(max(delay, HEDGE_MIN_DELAY), HEDGE_MAX_DELAY)
+
+
+class MetartafSource(Source):
+    name = "metartaf"
+
+    def __init__(self, base_url=None):
+        self.base_url = base_url or metar_fetch.BASE_URL
+        self.host = urlsplit(self.base_url).netloc
+        super().__init__()
+
+    def fetch(self, icao, timeout, session=None, etag=None, last_modified=None):
+        return request_metar_taf(icao, timeout, session, etag, last_modified, self.base_url)
+
+
+# Текстовые сводки aviationweather.gov (METAR и TAF - отдельными запросами)
+class AviationWeatherSource(Source):
+    name = "aviationweather"
+
+    def __init__(self, base_url=AVIATIONWEATHER_URL):
+        self.base_url = base_url.rstrip("/")
+        self.host = urlsplit(self.base_url).netloc
+        super().__init__()
+
+    def _raw(self, kind, icao, timeout, session):
+        response = http_get(f"{self.base_url}/api/data/{kind}?ids={icao}&format=raw", timeout, session=session)
+        response.raise_for_status()
+        return response.text
+
+    # Пустой ответ - LookupError: пусть Upstream спросит следующий источник
+    def fetch(self, icao, timeout, session=None, etag=None, last_modified=None):
+        started = time.monotonic()
+        metar = first_report(self._raw("metar", icao, timeout, session))
+        left = timeout - (time.monotonic() - started)
+        taf = first_report(self._raw("taf", icao, left, session)) if left >= MIN_REQUEST_TIMEOUT else 'N/A'
+        if metar == 'N/A' and taf == 'N/A':
+            raise LookupError(f"нет сводок по {icao}")
+        return FetchResult(icao, metar, taf)
+
+
+# Каталог сброса: <ICAO>.json или .xml (как ответ сервиса) либо .txt
+# (METAR и TAF текстом). ETag - время изменения и размер файла.
+class FileDropSource(Source):
+    name = "files"
+
+    def __init__(self, directory=DROP_DIR, max_age=DROP_MAX_AGE):
+        self.directory = directory
+        self.max_age = max_age
+        super().__init__()
+
+    def is_failure(self, error):
+        return False
+
+    def fetch(self, icao, timeout, session=None, etag=None, last_modified=None):
+        for suffix in (".json", ".xml", ".txt"):
+            path = self.directory / f"{icao}{suffix}"
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if time.time() - stat.st_mtime > self.max_age:
+                raise LookupError(f"файл {path.name} старше {self.max_age // 3600} ч")
+            file_etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+            if file_etag == etag:
+                return FetchResult(icao, not_modified=True, etag=file_etag)
+            content = path.read_bytes()
+            if suffix == ".txt":
+                metar, taf = split_reports(content.decode("utf-8", errors="replace"))
+            else:
+                metar, taf = parse_payload(content, suffix[1:])
+            return FetchResult(icao, metar, taf, etag=file_etag)
+        raise LookupError(f"нет файла {icao} в каталоге {self.directory}")
+
+
+# Первая сводка из текста: строки продолжения (с отступом) присоединяются
+def first_report(text):
+    lines = []
+    for line in text.splitlines():
+        if not line.strip():
+            if lines:
+                break
+            continue
+        if lines and not line[0].isspace():
+            break
+        lines.append(line.strip())
+    return " ".join(lines) or 'N/A'
+
+
+# Источник ответил, но сводок по станции нет
+def is_empty(result):
+    return not result.not_modified and result.metar == 'N/A' and result.taf == 'N/A'
+
+
+# METAR и TAF из одного текста: всё со строки, начинающейся с TAF, - прогноз
+def split_reports(text):
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    start = next((i for i, line in enumerate(lines) if line.startswith("TAF")), len(lines))
+    return " ".join(lines[:start]) or 'N/A', " ".join(lines[start:]) or 'N/A'
+
+
+SOURCE_TYPES = {
+    "metartaf": MetartafSource,
+    "aviationweather": AviationWeatherSource,
+    "files": FileDropSource,
+}
+
+
+class Upstream:
+    def __init__(self, sources, max_workers=32):
+        self.sources = list(sources)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="metar-source")
+
+    def _call(self, source, icao, timeout, session, etag, last_modified):
+        started = time.perf_counter()
+        try:
+            result = source.fetch(icao, timeout, session, etag, last_modified)
+        except (requests.exceptions.RequestException, ValueError, ET.ParseError, OSError,
+                HostBusy, LookupError) as e:
+            if source.is_failure(e):
+                source.breaker.record_failure()
+                inc("source_requests_total", source=source.name, outcome="failure")
+            else:
+                # Хост ответил - для автомата это успех, хоть данных и нет
+                source.breaker.record_success()
+                inc("source_requests_total", source=source.name, outcome="error")
+            return FetchResult(icao, error=f"{source.name}: {e}", source=source.name)
+        source.breaker.record_success()
+        source.latencies.append(time.perf_counter() - started)
+        inc("source_requests_total", source=source.name, outcome="ok")
+        return result._replace(source=source.name)
+
+    # Сигнатура как у metar_fetch.fetch_metar_taf
+    def fetch(self, icao, timeout=READ_TIMEOUT, deadline=None, session=None, etag=None, last_modified=None):
+        end = time.monotonic() + timeout
+        if deadline is not None:
+            end = min(end, deadline)
+        errors = []
+        # Ответ без METAR и TAF отдаётся, только если ни у кого нет лучшего
+        empty = None
+        pending = {}
+        remaining = iter(self.sources)
+        hedge_at = None
+
+        # Запуск следующего источника, у которого не разомкнут автомат
+        def start_next():
+            nonlocal hedge_at
+            hedge_at = None
+            for source in remaining:
+                if not source.breaker.allow():
+                    errors.append(f"{source.name}: временно отключён после сбоев")
+                    inc("source_requests_total", source=source.name, outcome="rejected")
+                    continue
+                left = end - time.monotonic()
+                if left <= 0:
+                    return None
+                pending[self._executor.submit(
+                    self._call, source, icao, left, session, etag, last_modified
+                )] = source
+                hedge_at = time.monotonic() + source.hedge_delay()
+                return source
+            return None
+
+        if len(self.sources) == 1 and self.sources[0].breaker.allow():
+            # Один источник: без пула потоков и дублирования
+            result = self._call(self.sources[0], icao, end - time.monotonic(), session, etag, last_modified)
+            count_outcome(result)
+            return result
+
+        start_next()
+        while pending:
+            now = time.monotonic()
+            wake = end if hedge_at is None else min(hedge_at, end)
+            done, _ = wait(pending, timeout=max(wake - now, 0), return_when=FIRST_COMPLETED)
+            if not done:
+                if time.monotonic() >= end:
+                    break
+                # Текущий источник медлит - дублируем запрос следующему
+                hedge = start_next()
+                if hedge is not None:
+                    inc("source_hedges_total", source=hedge.name)
+                continue
+            for future in done:
+                pending.pop(future)
+                result = future.result()
+                if not result.error and not is_empty(result):
+                    count_outcome(result)
+                    return result
+                if result.error:
+                    errors.append(result.error)
+                else:
+                    empty = result
+            if not pending:
+                start_next()
+
+        if pending:
+            errors.append("превышено время ожидания")
+        result = empty or FetchResult(icao, error="; ".join(errors) or "нет источников")
+        count_outcome(result)
+        return result
+
+
+def build_upstream(names=SOURCES):
+    unknown = [name for name in names if name not in SOURCE_TYPES]
+    if unknown:
+        raise ValueError(f"Неизвестные источники: {', '.join(unknown)} (есть: {', '.join(SOURCE_TYPES)})")
+    return Upstream(SOURCE_TYPES[name]() for name in names)
+
+
+_upstream = None
+_upstream_lock = threading.Lock()
+
+
+def get_upstream():
+    global _upstream
+    with _upstream_lock:
+        if _upstream is None:
+            _upstream = build_upstream()
+        return _upstream
+
+
+# Для metar_cache и poller.py: сводки из первого ответившего источника
+def fetch_reports(icao, timeout=READ_TIMEOUT, deadline=None, session=None, etag=None, last_modified=None):
+    return get_upstream().fetch(icao, timeout, deadline, session, etag, last_modified)
@@ -1,10 +1,32 @@
 import streamlit as st
 
-# aero_page = st.Page("aero_app.py", title="Аэрологическая диаграмма")
+from config import DIAGNOSTICS, METRICS_PORT
+from instrumentation import start_http_server
+from resources import warm_up
+
+aero_page = st.Page("aero_app.py", title="Аэрологическая диаграмма")
 # metar_page = st.Page("metar_app.py", title="METAR")
 test_page=st.Page("test_page.py", title="Тестовая страница")
+diagnostics_page = st.Page("diagnostics_app.py", title="Диагностика", url_path="diagnostics")
+
+# Страница диагностики в меню не показывается: открывается по адресу
+# ?diagnostics=1 (и остаётся до конца сеанса) или всегда при VARTOVSK_DIAGNOSTICS=1
+if DIAGNOSTICS or st.query_params.get("diagnostics") == "1":
+    st.session_state.diagnostics = True
+pages = [test_page, aero_page]
+if st.session_state.get("diagnostics"):
+    pages.append(diagnostics_page)
+
+# Метрики для Prometheus по HTTP (VARTOVSK_METRICS_PORT)
+if METRICS_PORT:
+    start_http_server(METRICS_PORT)
 
-pg = st.navigation([test_page])
+pg = st.navigation(pages)
 st.set_page_config(page_title="Помощник синоптика", page_icon=":material/edit:")
-pg.run()
 
+# Индексы и кэш сводок достраиваются в фоне, когда первая страница уже показана.
+# finally - страница может закончиться st.stop() или st.rerun()
+try:
+    pg.run()
+finally:
+    warm_up()
@@ -0,0 +1,227 @@
+import copy
+import re
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+from metar_parser import MetarObservation, parse_groups, resolve_time
+
+# Разбор TAF за один проход в последовательность групп изменений.
+# Каждая группа погоды разбирается один раз, текст строится отдельно (render.render_taf).
+
+_ISSUED = re.compile(r'(\d\d)(\d\d)(\d\d)Z').fullmatch
+_PERIOD = re.compile(r'(\d\d)(\d\d)/(\d\d)(\d\d)').fullmatch
+_FM = re.compile(r'FM(\d\d)(\d\d)(\d\d)').fullmatch
+_PROB = re.compile(r'PROB(\d\d)').fullmatch
+_TEMPERATURE = re.compile(r'T([XN])(M?\d\d)/(\d\d)(\d\d)Z').fullmatch
+_STATION = re.compile(r'[A-Z][A-Z0-9]{3}').fullmatch
+
+
+@dataclass(slots=True)
+class ChangeGroup:
+    kind: str  # BASE, FM, BECMG, TEMPO, PROB
+    start: datetime | None
+    end: datetime | None
+    conditions: MetarObservation
+    probability: int | None = None
+    tempo: bool = False  # PROBxx TEMPO
+    raw: str = ''
+
+
+@dataclass(slots=True)
+class ForecastState:
+    prevailing: MetarObservation
+    # TEMPO/PROB группы, действующие в этот момент
+    temporary: list = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class TafForecast:
+    raw: str = ''
+    station: str | None = None
+    issued: datetime | None = None
+    valid_from: datetime | None = None
+    valid_to: datetime | None = None
+    amendment: bool = False
+    correction: bool = False
+    nil: bool = False
+    cancelled: bool = False
+    temperature_max: tuple | None = None  # (температура, время)
+    temperature_min: tuple | None = None
+    groups: list = field(default_factory=list)
+
+    # Ожидаемые условия на момент when без повторного разбора текста.
+    # FM заменяет прогноз целиком, BECMG - только указанные элементы
+    # (считается наступившим к концу своего периода), TEMPO/PROB
+    # возвращаются отдельно как возможные временные изменения.
+    def conditions_at(self, when):
+        if not self.groups:
+            return None
+        prevailing = self.groups[0].conditions
+        temporary = []
+        for group in self.groups[1:]:
+            # Группы, время которых не разобралось (неверный день или час), пропускаются
+            if group.kind == 'FM':
+                if group.start is not None and group.start <= when:
+                    prevailing = group.conditions
+            elif group.kind == 'BECMG':
+                if group.end is not None and group.end <= when:
+                    prevailing = overlay(prevailing, group.conditions)
+            elif group.start is not None and group.end is not None and group.start <= when < group.end:
+                temporary.append(group)
+        return ForecastState(prevailing, temporary)
+
+    # Отрезки основного прогноза: (начало, конец, условия, группа, с которой
+    # отрезок начался). Основной прогноз меняется в начале FM и в конце BECMG;
+    # без срока действия - один отрезок без границ
+    def prevailing_periods(self):
+        if not self.groups:
+            return []
+        if self.valid_from is None or self.valid_to is None:
+            return [(None, None, self.groups[0].conditions, self.groups[0])]
+        changes = {self.valid_from: self.groups[0]}
+        for group in self.groups[1:]:
+            moment = group.start if group.kind == 'FM' else group.end if group.kind == 'BECMG' else None
+            if moment is not None and self.valid_from < moment < self.valid_to:
+                changes[moment] = group
+        moments = sorted(changes)
+        return [
+            (start, end, self.conditions_at(start).prevailing, changes[start])
+            for start, end in zip(moments, moments[1:] + [self.valid_to])
+        ]
+
+
+# Наложение изменившихся элементов change на base (для BECMG)
+def overlay(base, change):
+    result = copy.copy(base)
+    if change.wind is not None:
+        result.wind = change.wind
+    if change.cavok:
+        result.cavok = True
+        result.visibility = None
+        result.weather = []
+        result.clouds = []
+        result.vertical_visibility = None
+    elif change.visibility is not None:
+        result.cavok = False
+        result.visibility = change.visibility
+    if change.nsw:
+        result.weather = []
+    elif change.weather:
+        result.weather = change.weather
+    if change.clouds or change.sky_clear or change.vertical_visibility is not None:
+        result.cavok = result.cavok and change.cavok
+        result.clouds = change.clouds
+        result.sky_clear = change.sky_clear
+        result.vertical_visibility = change.vertical_visibility
+    return result
+
+
+def parse_taf(taf, reference=None):
+    reference = reference or datetime.now(timezone.utc)
+    forecast = TafForecast(raw=taf)
+    tokens = taf.replace('=', ' ').split()
+    n = len(tokens)
+    i = 0
+
+    # Заголовок
+    if i < n and tokens[i] == 'TAF':
+        i += 1
+    while i < n and tokens[i] in ('AMD', 'COR'):
+        if tokens[i] == 'AMD':
+            forecast.amendment = True
+        else:
+            forecast.correction = True
+        i += 1
+    if i < n and _STATION(tokens[i]) and not _ISSUED(tokens[i]):
+        forecast.station = tokens[i]
+        i += 1
+    if i < n:
+        m = _ISSUED(tokens[i])
+        if m:
+            forecast.issued = resolve_time(int(m[1]), int(m[2]), int(m[3]), reference)
+            # Время выпуска не разобралось (неверный час или минуты) - сроки
+            # групп считаются от прежнего опорного момента
+            if forecast.issued is not None:
+                reference = forecast.issued
+            i += 1
+    if i < n and tokens[i] == 'NIL':
+        forecast.nil = True
+        return forecast
+    if i < n:
+        m = _PERIOD(tokens[i])
+        if m:
+            forecast.valid_from, forecast.valid_to = _period(m, reference)
+            i += 1
+
+    # Группы изменений: ключевое слово, затем период и погода
+    kind = 'BASE'
+    start, end = forecast.valid_from, forecast.valid_to
+    probability = None
+    tempo = False
+    body = []
+    group_start = i
+
+    while True:
+        token = tokens[i] if i < n else None
+        fm = _FM(token) if token and token[0] == 'F' else None
+        prob = _PROB(token) if token and token[0] == 'P' else None
+        if token is None or fm or prob or token in ('BECMG', 'TEMPO'):
+            # TEMPO сразу после PROBxx продолжает ту же группу
+            if token == 'TEMPO' and kind == 'PROB' and not body and not tempo:
+                tempo = True
+                i += 1
+                if start is None and i < n and (m := _PERIOD(tokens[i])):
+                    start, end = _period(m, reference)
+                    i += 1
+                continue
+            if kind != 'BASE' or body or token is None:
+                conditions = MetarObservation(raw=' '.join(body))
+                parse_groups(conditions, body)
+                forecast.groups.append(ChangeGroup(
+                    kind, start, end, conditions, probability, tempo,
+                    ' '.join(tokens[group_start:i]),
+                ))
+            if token is None:
+                break
+            group_start = i
+            body = []
+            probability = None
+            tempo = False
+            if fm:
+                kind = 'FM'
+                start = resolve_time(int(fm[1]), int(fm[2]), int(fm[3]), reference)
+                end = forecast.valid_to
+            else:
+                if prob:
+                    kind = 'PROB'
+                    probability = int(prob[1])
+                else:
+                    kind = token
+                start = end = None
+                if i + 1 < n:
+                    m = _PERIOD(tokens[i + 1])
+                    if m:
+                        start, end = _period(m, reference)
+                        i += 1
+        elif token == 'CNL':
+            forecast.cancelled = True
+        elif token[0] == 'T' and (m := _TEMPERATURE(token)):
+            value = (
+                int(m[2].replace('M', '-')),
+                resolve_time(int(m[3]), int(m[4]), 0, reference),
+            )
+            if m[1] == 'X':
+                forecast.temperature_max = value
+            else:
+                forecast.temperature_min = value
+        else:
+            body.append(token)
+        i += 1
+    return forecast
+
+
+def _period(m, reference):
+    return (
+        resolve_time(int(m[1]), int(m[2]), 0, reference),
+        resolve_time(int(m[3]), int(m[4]), 0, reference),
+    )
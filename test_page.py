@@ -1,11 +1,24 @@
 import streamlit as st
-import requests
-import polars as pl
 from datetime import datetime
-import re
+import time
+
+from alerts import get_alerts
+from export import FORMATS, MIME_TYPES, board_frame, to_bytes
+from instrumentation import observe, span, timed
+from resources import get_airports, get_geo_index, get_search_index
+from vartovsk import (cached_reports, decode_metar, decode_taf, get_cache, get_reports, is_icao, is_vfr,
+                      parse_icao_list, parse_metar, station_city, station_name)
+
+# Время выполнения сценария страницы (без отрисовки в браузере)
+page_started = time.perf_counter()
 
 st.title('✈️ Авиационная метеоинформация')
 
+# Как часто карточка станции перечитывает свою сводку из кэша, секунд;
+# пока сводки ещё нет - чаще, чтобы она появилась сразу по получении
+CARD_REFRESH = 10
+PENDING_REFRESH = 2
+
 # Стили для улучшенного отображения
 st.markdown("""
 <style>
@@ -42,221 +55,185 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Кэшируем запросы к API и загрузку данных
-@st.cache_data(ttl=3600)
-def get_metar_taf(icao):
-    try:
-        response = requests.get(f"https://metartaf.ru/{icao}.json", timeout=10)
-        response.raise_for_status()
-        
-        if 'application/json' in response.headers.get('content-type', ''):
-            data = response.json()
-            return data.get('metar', 'N/A'), data.get('taf', 'N/A')
-        return 'N/A', 'N/A'
-    except requests.exceptions.RequestException as e:
-        st.error(f"Ошибка запроса для {icao}: {str(e)}")
-        return 'N/A', 'N/A'
-
-@st.cache_data
+# Справочник один на процесс (resources.get_airports)
 def load_airport_data():
     try:
-        df = pl.read_excel("ICAO.xls")
-        required_columns = {"icao_code", "name_rus", "name_eng", "city_rus", "city_eng", "country_rus"}
-        
-        if not required_columns.issubset(df.columns):
-            st.error(f"Файл ICAO.xls должен содержать столбцы: {required_columns}")
-            return None
-        return df
+        return get_airports()
     except Exception as e:
         st.error(f"Ошибка загрузки файла ICAO.xls: {str(e)}")
         return None
 
-# Функции для расшифровки METAR/TAF
-def decode_metar(metar):
-    if metar == 'N/A':
-        return "Данные METAR недоступны"
-    
-    decoded = []
-    parts = metar.split()
-    
-    # Словари для расшифровки
-    DIRECTIONS = {
-        'N': 'северный', 'NE': 'северо-восточный', 'E': 'восточный',
-        'SE': 'юго-восточный', 'S': 'южный', 'SW': 'юго-западный',
-        'W': 'западный', 'NW': 'северо-западный'
-    }
-    
-    CLOUD_TYPES = {
-        'FEW': 'незначительная (1-2/8 неба)',
-        'SCT': 'разрозненные (3-4/8 неба)',
-        'BKN': 'значительная (5-7/8 неба)',
-        'OVC': 'сплошная (8/8 неба)'
-    }
-    
-    # Обработка каждой части METAR
-    for part in parts:
-        # Дата и время
-        if re.match(r'^\d{6}Z$', part):
-            time_str = f"{part[2:4]}:{part[4:6]} UTC {part[:2]} числа"
-            decoded.append(f"🕒 Время наблюдения: {time_str}")
-        
-        # Ветер
-        elif re.match(r'^(\d{3})(\d{2,3})(G\d{2,3})?(KT|MPS|KMH)$', part):
-            match = re.match(r'^(\d{3})(\d{2,3})(G\d{2,3})?(KT|MPS|KMH)?$', part)
-            wind_dir = int(match.group(1))
-            wind_speed = match.group(2)
-            gust = match.group(3)[1:] if match.group(3) else None
-            unit = 'м/с' if match.group(4) == 'MPS' else 'узлов'
-            
-            # Определение направления
-            dir_deg = (wind_dir + 22) // 45 * 45 % 360
-            compass = {
-                0: 'северный', 45: 'северо-восточный', 90: 'восточный',
-                135: 'юго-восточный', 180: 'южный', 225: 'юго-западный',
-                270: 'западный', 315: 'северо-западный'
-            }.get(dir_deg, '')
-            
-            wind_str = f"🌬️ Ветер: {wind_dir}° ({compass}) {wind_speed} {unit}"
-            if gust:
-                wind_str += f", порывы до {gust} {unit}"
-            decoded.append(wind_str)
-        
-        # Видимость
-        elif re.match(r'^\d{4}$', part):
-            vis = int(part)
-            if vis >= 10000:
-                decoded.append("👀 Видимость: 10+ км")
-            else:
-                decoded.append(f"👀 Видимость: {vis//1000 if vis%1000==0 else vis/1000:.1f} км")
-        elif part == 'CAVOK':
-            decoded.append("👀 Видимость: 10+ км, без осадков и значительной облачности")
-        
-        # Облачность
-        elif re.match(r'^(FEW|SCT|BKN|OVC)\d{3}(CB|TCU)?$', part):
-            cloud_type = CLOUD_TYPES.get(part[:3], part[:3])
-            height = int(part[3:6]) * 30
-            cloud_str = f"   - {cloud_type} на {height} метрах"
-            if 'CB' in part:
-                cloud_str += " (кучево-дождевые)"
-            elif 'TCU' in part:
-                cloud_str += " (башнеобразные)"
-            
-            if not any('☁️ Облачность:' in s for s in decoded):
-                decoded.append("☁️ Облачность:")
-            decoded.append(cloud_str)
-        
-        # Температура и точка росы
-        elif re.match(r'^(M?\d{2})/(M?\d{2})$', part):
-            temp, dew = part.split('/')
-            temp = temp.replace('M', '-')
-            dew = dew.replace('M', '-')
-            decoded.append(f"🌡️ Температура: {temp}°C, точка росы: {dew}°C")
-        
-        # Давление
-        elif re.match(r'^Q\d{4}$', part):
-            pressure = part[1:]
-            decoded.append(f"⏱️ Давление: {pressure} гПа (QNH)")
-    
-    return "\n".join(decoded)
-
-def decode_taf(taf):
-    if taf == 'N/A':
-        return "Данные TAF недоступны"
-    
-    decoded = ["🕒 Основной прогноз:"]
-    current_block = []
-    
-    # Разбиваем TAF на временные блоки
-    parts = re.split(r'(TEMPO|BECMG|FM\d{6}|PROB\d{2})', taf)
-    period_type = "MAIN"
-    
-    for part in parts:
-        if part in ['TEMPO', 'BECMG'] or part.startswith(('FM', 'PROB')):
-            # Сохраняем предыдущий блок
-            if current_block:
-                decoded.append("\n".join(current_block))
-                current_block = []
-            
-            # Определяем тип нового блока
-            if part == 'TEMPO':
-                period_type = "TEMPO"
-                current_block.append("⏳ Временные изменения (TEMPO):")
-            elif part == 'BECMG':
-                period_type = "BECMG"
-                current_block.append("🔄 Постепенные изменения (BECMG):")
-            elif part.startswith('FM'):
-                period_type = "FM"
-                time_str = f"{part[2:4]}:{part[4:6]} UTC {part[6]} числа"
-                current_block.append(f"⌛ С {time_str}:")
-            elif part.startswith('PROB'):
-                period_type = "PROB"
-                prob = part[4:6]
-                current_block.append(f"❔ Вероятность {prob}%:")
-        else:
-            # Обрабатываем метеоданные внутри блока
-            metar_lines = decode_metar(part).split('\n')
-            
-            # Добавляем информацию о нижней границе облачности
-            cloud_info = []
-            for line in metar_lines:
-                if line.startswith('☁️ Облачность:'):
-                    cloud_info.append(line)
-                elif 'на' in line and ('метрах' in line or 'футах' in line):
-                    cloud_info.append(line)
-            
-            if cloud_info:
-                current_block.append("\n".join(cloud_info))
-            
-            for line in metar_lines:
-                if line.startswith(('🕒', '🌬️', '👀', '🌡️', '⏱️')):
-                    if period_type in ["TEMPO", "BECMG", "FM", "PROB"]:
-                        current_block.append(f"   {line}")
-                    else:
-                        current_block.append(line)
-    
-    if current_block:
-        decoded.append("\n".join(current_block))
-    
-    # Улучшаем форматирование для Streamlit
-    final_output = []
-    for line in decoded:
-        if line.startswith(('⏳', '🔄', '⌛', '❔')):
-            final_output.append("\n" + line)
-        else:
-            final_output.append(line)
-    
-    return "\n".join(final_output)
-
 # Загрузка данных
-name_icao_df = load_airport_data()
-if name_icao_df is None:
+airports = load_airport_data()
+if airports is None:
     st.stop()
 
+def format_found(result):
+    place = ", ".join(part for part in (result.city, result.country) if part and part != result.name)
+    return f"{result.icao} — {result.name}" + (f" ({place})" if place else "")
+
 def get_airport_info(icao_code):
-    result = name_icao_df.filter(pl.col("icao_code") == icao_code)
+    row = airports.get(icao_code)
     
-    if result.is_empty():
+    if row is None:
         return None
     
-    row = result.row(0, named=True)
-    
     return {
-        "Название": row["name_rus"] if row["name_rus"] else row["name_eng"],
-        "Город": row["city_rus"] if row["city_rus"] else row["city_eng"],
+        "Название": station_name(row),
+        "Город": station_city(row),
         "Страна": row["country_rus"],
         "ИКАО": icao_code
     }
 
+# Предупреждения по станции. Сводки проверяются заново, только если изменились;
+# о новом предупреждении сообщается всплывающим сообщением один раз в каждой
+# сессии (проверка общая на процесс, поэтому показанное помнит сессия)
+def show_alerts(icao_code, metar, taf):
+    engine = get_alerts()
+    engine.update(icao_code, metar, taf)
+    active = engine.active(icao_code)
+    shown = st.session_state.setdefault("alerts_shown", {})
+    seen = shown.get(icao_code, set())
+    for alert in active:
+        if (alert.rule, alert.since) not in seen:
+            st.toast(f"{icao_code}: {alert.message}", icon="⚠️")
+    shown[icao_code] = {(alert.rule, alert.since) for alert in active}
+    for alert in active:
+        text = f"**{alert.message}**" + (f" ({alert.detail})" if alert.detail else "")
+        if alert.rule.severity == "danger":
+            st.error(text, icon="⛔")
+        else:
+            st.warning(text, icon="⚠️")
+
+# Карточка станции - отдельный фрагмент: сводки только из кэша, без ожидания
+# сервиса; по таймеру перерисовывается одна карточка, а не вся страница
+def station_card(airport_info):
+    pending = get_cache().cached(airport_info['ИКАО']) is None
+    st.fragment(draw_card, run_every=PENDING_REFRESH if pending else CARD_REFRESH)(airport_info)
+
+@timed("station_card")
+def draw_card(airport_info):
+    icao_code = airport_info['ИКАО']
+    result = get_cache().cached(icao_code)
+
+    st.markdown(f"<div class='airport-card'>", unsafe_allow_html=True)
+    st.subheader(f"{airport_info['Название']} ({icao_code})")
+    st.write(f"📍 **Город:** {airport_info['Город']}")
+    st.write(f"🌍 **Страна:** {airport_info['Страна']}")
+    if "Расстояние" in airport_info:
+        st.write(f"📏 **Расстояние:** {airport_info['Расстояние']:.0f} км")
+
+    if result is None:
+        st.info("⏳ Получаем актуальные метеоданные...")
+    else:
+        metar, taf = result.metar, result.taf
+        if result.error:
+            st.error(f"Ошибка запроса для {icao_code}: {result.error}")
+        show_alerts(icao_code, metar, taf)
+
+        # METAR
+        with st.expander(f"METAR для {icao_code}"):
+            if metar != 'N/A':
+                st.code(metar, language="text")
+                st.markdown("**Расшифровка:**")
+                st.write(decode_metar(metar))
+            else:
+                st.warning("Данные METAR недоступны")
+
+        # TAF
+        with st.expander(f"TAF для {icao_code}"):
+            if taf != 'N/A':
+                st.code(taf, language="text")
+                st.markdown("**Расшифровка:**")
+                st.write(decode_taf(taf))
+            else:
+                st.warning("Данные TAF недоступны")
+
+    st.markdown("</div>", unsafe_allow_html=True)
+
+# Выгрузка табло в файл: сводки из кэша с расшифровкой по столбцам.
+# Файл собирается по кнопке, а не при каждой перерисовке страницы.
+def board_download(board):
+    st.sidebar.markdown("**Выгрузка табло**")
+    fmt = st.sidebar.selectbox("Формат файла:", FORMATS, key="export_format")
+    if st.sidebar.button("Сформировать файл"):
+        with span("export_board", format=fmt):
+            results = cached_reports(board)
+            data = to_bytes([board_frame(results, get_airports())], fmt)
+            st.session_state.board_export = ((fmt, tuple(board)), data)
+    # Файл предлагается, только пока формат и состав табло те же
+    prepared = st.session_state.get("board_export")
+    if prepared and prepared[0] == (fmt, tuple(board)):
+        st.sidebar.download_button(
+            f"Скачать табло.{fmt}", prepared[1],
+            file_name=f"board_{time.strftime('%Y%m%d_%H%MZ', time.gmtime())}.{fmt}", mime=MIME_TYPES[fmt],
+        )
+
+# Ближайшие к центру района аэродромы, где по фактической погоде возможны полёты по ПВП.
+# Заполняется по мере поступления сводок.
+@st.fragment(run_every=CARD_REFRESH)
+def vfr_alternates(nearby, count=5):
+    st.markdown("**🛬 Ближайшие запасные с погодой ПВП:**")
+    rows = []
+    pending = 0
+    for icao_code, distance in nearby:
+        result = get_cache().cached(icao_code)
+        if result is None:
+            pending += 1
+            continue
+        if result.metar == 'N/A':
+            continue
+        obs = parse_metar(result.metar)
+        if is_vfr(obs):
+            rows.append({
+                "ИКАО": icao_code,
+                "Аэродром": get_airport_info(icao_code)["Название"],
+                "Расстояние, км": round(distance),
+                "Видимость, м": 10000 if obs.cavok or (obs.visibility or 0) >= 9999 else obs.visibility,
+                "Нижняя граница, м": obs.ceiling_m,
+            })
+            if len(rows) == count:
+                break
+    if rows:
+        st.dataframe(rows, hide_index=True)
+    elif not pending:
+        st.warning("В районе нет аэродромов с погодой ПВП")
+    if pending:
+        st.caption(f"⏳ Ожидаются сводки: {pending}")
+
 # Интерфейс
 st.sidebar.header("Настройки")
-mode = st.sidebar.radio("Режим работы:", ["Один аэропорт", "Несколько аэропортов"])
+mode = st.sidebar.radio("Режим работы:", ["Один аэропорт", "Несколько аэропортов", "Аэродромы района"])
+
+# Поиск аэропорта по названию или городу (русскому или английскому), с опечатками
+search_query = st.sidebar.text_input("🔎 Поиск аэропорта (название, город или код):")
+found = {result.icao: result for result in get_search_index().search(search_query)} if search_query.strip() else {}
+selected_code = None
+if found:
+    selected_code = st.sidebar.selectbox(
+        "Найденные аэропорты:", list(found), format_func=lambda code: format_found(found[code])
+    )
+elif search_query.strip():
+    st.sidebar.caption("Ничего не найдено")
+
+def add_selected_code():
+    codes = st.session_state.icao_codes_input.rstrip()
+    st.session_state.icao_codes_input = f"{codes}\n{selected_code}" if codes else selected_code
+
+# Найденный аэропорт подставляется в поле кода только по кнопке: введённое
+# вручную не перекрывается выбором в поиске
+def use_selected_code(key, code):
+    st.session_state[key] = code
 
 if mode == "Один аэропорт":
-    icao_code = st.sidebar.text_input('Введите код ИКАО аэропорта (4 буквы):', 'UUEE').strip().upper()
+    if selected_code:
+        st.sidebar.button(f"Показать {selected_code}", on_click=use_selected_code, args=("icao_code_input", selected_code))
+    st.session_state.setdefault("icao_code_input", 'UUEE')
+    icao_code = st.sidebar.text_input('Введите код ИКАО аэропорта:', key="icao_code_input").strip().upper()
     
     if icao_code:
-        if len(icao_code) != 4 or not icao_code.isalpha():
-            st.error("Код ИКАО должен состоять из 4 букв")
+        if not is_icao(icao_code):
+            st.error("Код ИКАО - буква и ещё три буквы или цифры")
         else:
             airport_info = get_airport_info(icao_code)
             
@@ -268,7 +245,11 @@ if mode == "Один аэропорт":
                 
                 # Автоматически получаем метеоданные
                 with st.spinner('Получаем актуальные метеоданные...'):
-                    metar, taf = get_metar_taf(icao_code)
+                    result = get_reports(icao_code)
+                    metar, taf = result.metar, result.taf
+                    if result.error:
+                        st.error(f"Ошибка запроса для {icao_code}: {result.error}")
+                    show_alerts(icao_code, metar, taf)
                     
                     # METAR
                     st.markdown("**METAR (актуальная погода):**")
@@ -294,66 +275,72 @@ if mode == "Один аэропорт":
             else:
                 st.warning(f"Аэропорт с кодом {icao_code} не найден в базе данных")
 
+elif mode == "Аэродромы района":
+    if selected_code:
+        st.sidebar.button(f"Сделать {selected_code} центром района", on_click=use_selected_code, args=("center_input", selected_code))
+    st.session_state.setdefault("center_input", 'USNN')
+    center = st.sidebar.text_input('Центр района (код ИКАО):', key="center_input").strip().upper()
+    radius = st.sidebar.slider("Радиус, км:", 50, 1000, 300, step=50)
+
+    geo = get_geo_index()
+    if get_airport_info(center) is None:
+        st.warning(f"Аэропорт с кодом {center} не найден в базе данных")
+    elif center not in geo:
+        st.warning(f"Для аэропорта {center} нет координат")
+    else:
+        nearby = geo.around(center, radius)
+        st.sidebar.success(f"Аэродромов в радиусе {radius} км: {len(nearby)}")
+
+        board = {center: get_airport_info(center)}
+        for icao_code, distance in nearby:
+            board[icao_code] = dict(get_airport_info(icao_code), Расстояние=distance)
+
+        # Сводки всего района загружаются одним пакетом в фоне
+        get_cache().prefetch(board)
+
+        locations = [geo.location(icao_code) for icao_code in board]
+        st.map(
+            {"lat": [lat for lat, _ in locations], "lon": [lon for _, lon in locations]},
+            latitude="lat", longitude="lon", size=3000, zoom=5 if radius <= 400 else 4,
+        )
+        vfr_alternates(nearby)
+        board_download(board)
+        with span("board", mode="region"):
+            for airport_info in board.values():
+                station_card(airport_info)
+
 else:  # Несколько аэропортов
+    if selected_code:
+        st.sidebar.button(f"Добавить {selected_code} в список", on_click=add_selected_code)
+    st.session_state.setdefault("icao_codes_input", 'UUEE\nUUDD\nULLI')
     icao_codes_input = st.sidebar.text_area(
         'Введите коды ИКАО аэропортов (по одному на строку или через запятую/пробел):',
-        'UUEE\nUUDD\nULLI'
+        key="icao_codes_input",
     ).strip().upper()
     
-    # Разбираем ввод пользователя
-    icao_list = []
-    for line in icao_codes_input.split('\n'):
-        for part in re.split(r'[,;\s]+', line):
-            if len(part) == 4 and part.isalpha():
-                icao_list.append(part)
+    icao_list = parse_icao_list(icao_codes_input)
     
     if icao_list:
         st.sidebar.success(f"Найдено аэропортов: {len(icao_list)}")
-        
-        # Ограничим количество аэропортов для производительности
-        if len(icao_list) > 10:
-            st.warning("Выбрано слишком много аэропортов. Показаны первые 10.")
-            icao_list = icao_list[:10]
-        
-        progress_bar = st.progress(0)
-        total_airports = len(icao_list)
-        
-        for i, icao_code in enumerate(icao_list):
-            progress_bar.progress((i + 1) / total_airports)
-            
+
+        # Карточки выводим в порядке ввода; недостающие сводки загружаются в фоне,
+        # и каждая карточка подхватывает свою, не дожидаясь остальных
+        board = {}
+        for icao_code in icao_list:
             airport_info = get_airport_info(icao_code)
-            
             if airport_info:
-                st.markdown(f"<div class='airport-card'>", unsafe_allow_html=True)
-                st.subheader(f"{airport_info['Название']} ({airport_info['ИКАО']})")
-                st.write(f"📍 **Город:** {airport_info['Город']}")
-                st.write(f"🌍 **Страна:** {airport_info['Страна']}")
-                
-                # Получаем метеоданные
-                metar, taf = get_metar_taf(icao_code)
-                
-                # METAR
-                with st.expander(f"METAR для {icao_code}"):
-                    if metar != 'N/A':
-                        st.code(metar, language="text")
-                        st.markdown("**Расшифровка:**")
-                        st.write(decode_metar(metar))
-                    else:
-                        st.warning("Данные METAR недоступны")
-                
-                # TAF
-                with st.expander(f"TAF для {icao_code}"):
-                    if taf != 'N/A':
-                        st.code(taf, language="text")
-                        st.markdown("**Расшифровка:**")
-                        st.write(decode_taf(taf))
-                    else:
-                        st.warning("Данные TAF недоступны")
-                
-                st.markdown("</div>", unsafe_allow_html=True)
+                board[icao_code] = airport_info
             else:
                 st.warning(f"Аэропорт с кодом {icao_code} не найден в базе данных")
 
+        get_cache().prefetch(board)
+        board_download(board)
+        with span("board", mode="multi"):
+            for airport_info in board.values():
+                station_card(airport_info)
+
 # Подвал
 st.markdown("---")
-st.caption(f"ℹ️ Данные предоставляются сервисом metartaf.ru | Обновлено: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
\ No newline at end of file
+st.caption(f"ℹ️ Данные предоставляются сервисом metartaf.ru | Обновлено: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+
+observe("page_run_seconds", time.perf_counter() - page_started, page="test_page")
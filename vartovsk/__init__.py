@@ -0,0 +1,15 @@
+# Ядро помощника синоптика - общее для страниц streamlit, main.py и poller.py.
+# Слои: получение сводок (metar_fetch, sources), кэш (metar_cache), разбор
+# (metar_parser, taf_parser), справочник аэропортов (airports) и расшифровка
+# текстом (render). Здесь - их общая точка входа и то, что раньше каждая
+# страница делала по-своему. Только Polars и простые структуры, без pandas.
+
+from airports import load_directory
+from metar_cache import MetarCache, get_cache
+from metar_fetch import FetchResult
+from metar_parser import is_vfr, parse_metar
+from render import render_metar, render_taf
+from taf_parser import parse_taf
+from vartovsk.reports import cached_reports, decode_metar, decode_taf, get_many_reports, get_reports
+from vartovsk.stations import is_icao, parse_icao_list, station_city, station_name
+
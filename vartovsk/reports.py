@@ -0,0 +1,43 @@
+from functools import lru_cache
+
+from instrumentation import span
+from metar_cache import get_cache
+from metar_parser import parse_metar
+from render import render_metar, render_taf
+from taf_parser import parse_taf
+
+
+# Сводки станции из общего кэша: свежие отдаются сразу, устаревшие тоже,
+# но с обновлением в фоне; отсутствующие запрашиваются
+def get_reports(icao):
+    with span("get_metar_taf"):
+        return get_cache().get(icao)
+
+
+# Сводки нескольких станций в порядке icao_list; недостающие - параллельно
+def get_many_reports(icao_list, deadline=None):
+    return get_cache().get_many(icao_list, deadline)
+
+
+# Только то, что уже лежит в кэше, без обращения к сервису
+def cached_reports(icao_list, cache=None):
+    cache = cache or get_cache()
+    return [cache.peek(icao) or cache.missing(icao) for icao in icao_list]
+
+
+# Расшифровка запоминается по тексту сводки: при перерисовке
+# повторно разбираются только новые сводки
+@lru_cache(maxsize=1024)
+def decode_metar(metar):
+    if metar == 'N/A':
+        return "Данные METAR недоступны"
+    with span("decode", kind="metar"):
+        return render_metar(parse_metar(metar))
+
+
+@lru_cache(maxsize=1024)
+def decode_taf(taf):
+    if taf == 'N/A':
+        return "Данные TAF недоступны"
+    with span("decode", kind="taf"):
+        return render_taf(parse_taf(taf))
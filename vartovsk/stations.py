@@ -0,0 +1,24 @@
+import re
+
+# Код ИКАО: буква и ещё три буквы или цифры (UUEE, K1A5)
+_ICAO = re.compile(r'[A-Z][A-Z0-9]{3}').fullmatch
+
+
+def is_icao(code):
+    return bool(_ICAO(code))
+
+
+# Коды из текста: по одному на строку или через запятую, точку с запятой, пробел.
+# Некорректные отбрасываются, повторы - тоже; порядок ввода сохраняется.
+def parse_icao_list(text):
+    codes = re.split(r'[,;\s]+', text.upper())
+    return list(dict.fromkeys(code for code in codes if is_icao(code)))
+
+
+# Название и город из строки справочника: по-русски, если есть
+def station_name(row):
+    return row["name_rus"] or row["name_eng"]
+
+
+def station_city(row):
+    return row["city_rus"] or row["city_eng"]
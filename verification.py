@@ -0,0 +1,210 @@
+from datetime import datetime, timedelta, timezone
+
+import polars as pl
+
+from metar_parser import to_mps
+from taf_parser import parse_taf
+
+# Оценка оправдываемости TAF по фактическим METAR из архива (history).
+# Каждый TAF разбирается один раз и раскладывается на отрезки: основной прогноз
+# (BASE, FM, наступившие BECMG - как в TafForecast.conditions_at) и возможные
+# изменения (TEMPO, PROB и сам период BECMG). Дальше всё делается соединениями
+# Polars: для каждого METAR - действовавший TAF (join_asof по времени вступления
+# в силу), его отрезок основного прогноза (join_asof по началу отрезка) и
+# возможные изменения, накрывающие срок наблюдения.
+#
+# Элемент оправдался, если наблюдение в пределах допуска от основного прогноза
+# или от любого действующего TEMPO/PROB/BECMG. Допуски - «желательная точность
+# прогнозов» TAF по Приложению 3 ИКАО.
+
+# Видимость: ±200 м до 800 м, дальше ±30%; 10 км и более - одна градация
+VISIBILITY_STEP_M = 800
+VISIBILITY_TOLERANCE_M = 200
+VISIBILITY_MAX_M = 10000
+# Нижняя граница облаков: ±30 м до 300 м, дальше ±30%; выше 3000 м (и нет
+# облаков BKN/OVC) - одна градация
+CEILING_STEP_M = 300
+CEILING_TOLERANCE_M = 30
+CEILING_MAX_M = 3000
+RELATIVE_TOLERANCE = 0.3
+# Ветер: скорость ±2.5 м/с, направление ±20° (при прогнозе от 5 м/с)
+WIND_SPEED_TOLERANCE = 2.5
+WIND_DIRECTION_TOLERANCE = 20
+WIND_DIRECTION_FROM = 5
+
+ELEMENTS = ("visibility", "ceiling", "wind")
+
+_TIME = pl.Datetime("ms", "UTC")
+_ELEMENT_SCHEMA = {
+    "visibility": pl.Int32,
+    "ceiling": pl.Int32,
+    "wind_dir": pl.Int16,
+    "wind_speed": pl.Float32,
+}
+_SEGMENT_SCHEMA = {"taf_id": pl.UInt32, "start": _TIME, "end": _TIME, **_ELEMENT_SCHEMA}
+_TAF_SCHEMA = {
+    "taf_id": pl.UInt32, "icao": pl.String, "issued": _TIME,
+    "valid_from": _TIME, "valid_to": _TIME, "in_force": _TIME,
+}
+
+
+# Элементы группы прогноза; None - группа этот элемент не меняет.
+# Облачность указана, но нет BKN/OVC (или CAVOK) - граница «выше 3000 м».
+def _elements(obs):
+    visibility = VISIBILITY_MAX_M if obs.cavok else obs.visibility
+    if obs.cavok or obs.clouds or obs.sky_clear or obs.vertical_visibility is not None:
+        ceiling = min(obs.ceiling_m or CEILING_MAX_M, CEILING_MAX_M)
+    else:
+        ceiling = None
+    wind_dir = wind_speed = None
+    if obs.wind is not None:
+        wind_dir = obs.wind.direction
+        wind_speed = to_mps(obs.wind.speed, obs.wind.unit)
+    return {
+        "visibility": None if visibility is None else min(visibility, VISIBILITY_MAX_M),
+        "ceiling": ceiling,
+        "wind_dir": wind_dir,
+        "wind_speed": wind_speed,
+    }
+
+
+# TAF из архива (столбцы icao, obs_time - время выпуска, raw) -> три таблицы:
+# прогнозы, отрезки основного прогноза и возможные изменения
+def taf_segments(tafs):
+    forecasts, prevailing, alternatives = [], [], []
+    for icao, issued, raw in tafs.select("icao", "obs_time", "raw").iter_rows():
+        forecast = parse_taf(raw, issued.astimezone(timezone.utc))
+        if forecast.nil or forecast.cancelled or not forecast.groups or forecast.valid_from is None:
+            continue
+        taf_id = len(forecasts)
+        valid_from, valid_to = forecast.valid_from, forecast.valid_to
+        forecasts.append((taf_id, icao, issued, valid_from, valid_to, max(issued, valid_from)))
+
+        for start, end, conditions, _ in forecast.prevailing_periods():
+            prevailing.append({"taf_id": taf_id, "start": start, "end": end, **_elements(conditions)})
+
+        for group in forecast.groups[1:]:
+            if group.kind in ('TEMPO', 'PROB', 'BECMG') and group.start is not None and group.end is not None:
+                alternatives.append({"taf_id": taf_id, "start": group.start, "end": group.end,
+                                     **_elements(group.conditions)})
+
+    forecasts = pl.DataFrame(forecasts, schema=_TAF_SCHEMA, orient="row")
+    return (
+        forecasts,
+        pl.DataFrame(prevailing, schema=_SEGMENT_SCHEMA),
+        pl.DataFrame(alternatives, schema=_SEGMENT_SCHEMA),
+    )
+
+
+# METAR с расшифровкой (history.query(..., decode=True)) -> наблюдаемые элементы
+def observations(metars):
+    return metars.filter(~pl.col("nil") & pl.col("day").is_not_null()).select(
+        "icao",
+        "obs_time",
+        pl.when(pl.col("cavok")).then(VISIBILITY_MAX_M)
+        .otherwise(pl.col("visibility_m").clip(upper_bound=VISIBILITY_MAX_M))
+        .cast(pl.Int32).alias("visibility"),
+        pl.col("ceiling_m").fill_null(CEILING_MAX_M).clip(upper_bound=CEILING_MAX_M)
+        .cast(pl.Int32).alias("ceiling"),
+        "wind_dir",
+        pl.col("wind_speed_mps").alias("wind_speed"),
+    )
+
+
+def _within(observed, forecast, step, tolerance, maximum):
+    allowed = pl.when(forecast <= step).then(tolerance).otherwise(forecast * RELATIVE_TOLERANCE)
+    return ((forecast >= maximum) & (observed >= maximum)) | ((observed - forecast).abs() <= allowed)
+
+
+# Совпадение наблюдения с прогнозом по элементам; null - элемент не прогнозировался
+# или не наблюдался
+def _hits(suffix=""):
+    fc = lambda name: pl.col(name + suffix)
+    turn = (pl.col("wind_dir") - fc("wind_dir")).abs()
+    direction = pl.when(fc("wind_speed") < WIND_DIRECTION_FROM).then(True).otherwise(
+        pl.min_horizontal(turn, 360 - turn) <= WIND_DIRECTION_TOLERANCE
+    ).fill_null(True)
+    return [
+        _within(pl.col("visibility"), fc("visibility"), VISIBILITY_STEP_M, VISIBILITY_TOLERANCE_M, VISIBILITY_MAX_M)
+        .alias("visibility_hit"),
+        _within(pl.col("ceiling"), fc("ceiling"), CEILING_STEP_M, CEILING_TOLERANCE_M, CEILING_MAX_M)
+        .alias("ceiling_hit"),
+        (((pl.col("wind_speed") - fc("wind_speed")).abs() <= WIND_SPEED_TOLERANCE) & direction).alias("wind_hit"),
+    ]
+
+
+# Каждому METAR - действовавший TAF, прогноз на срок наблюдения и оценки по элементам
+def match(metars, tafs):
+    forecasts, prevailing, alternatives = taf_segments(tafs)
+    # join_asof с by требует порядка по времени внутри групп - сортируем целиком
+    obs = observations(metars).sort("obs_time")
+
+    # Действует последний вступивший в силу прогноз (поправка AMD сменяет прежний)
+    in_force = forecasts.sort("in_force", "issued").unique(["icao", "in_force"], keep="last", maintain_order=True)
+    matched = obs.join_asof(
+        in_force.select("icao", "in_force", "taf_id", "issued", "valid_to"),
+        left_on="obs_time", right_on="in_force", by="icao", strategy="backward", check_sortedness=False,
+    ).filter(pl.col("obs_time") < pl.col("valid_to"))
+
+    matched = matched.join_asof(
+        prevailing.sort("start").select("taf_id", "start", *_ELEMENT_SCHEMA),
+        left_on="obs_time", right_on="start", by="taf_id", strategy="backward", suffix="_fc",
+        check_sortedness=False,
+    ).with_row_index("_row").with_columns(_hits("_fc"))
+
+    # Возможные изменения: у прогноза их немного, поэтому обычное соединение по taf_id
+    # и отбор накрывающих срок наблюдения
+    temporary = (
+        matched.select("_row", "taf_id", "obs_time", *_ELEMENT_SCHEMA)
+        .join(alternatives, on="taf_id", suffix="_fc")
+        .filter((pl.col("start") <= pl.col("obs_time")) & (pl.col("obs_time") < pl.col("end")))
+        .with_columns(_hits("_fc"))
+        .group_by("_row")
+        .agg(pl.col(f"{element}_hit").fill_null(False).any().alias(f"{element}_alt") for element in ELEMENTS)
+    )
+    return (
+        matched.join(temporary, on="_row", how="left")
+        .with_columns(
+            pl.when(pl.col(f"{element}_hit").is_null()).then(None)
+            .otherwise(pl.col(f"{element}_hit") | pl.col(f"{element}_alt").fill_null(False))
+            .alias(f"{element}_hit")
+            for element in ELEMENTS
+        )
+        .drop("_row", "in_force", "start", *(f"{element}_alt" for element in ELEMENTS))
+        .sort("icao", "obs_time")
+    )
+
+
+# Оценки по группам (по умолчанию - станция и месяц; by=() - всё вместе):
+# сколько сводок сверено, сколько оправдалось по каждому элементу и доля оправдавшихся
+def scores(matched, by=("icao", "month")):
+    by = list(by)
+    aggregates = [
+        pl.len().alias("metars"),
+        pl.col("taf_id").n_unique().alias("tafs"),
+        *(
+            expr
+            for element in ELEMENTS
+            for expr in (
+                pl.col(f"{element}_hit").count().alias(f"{element}_n"),
+                pl.col(f"{element}_hit").sum().alias(f"{element}_hits"),
+                (pl.col(f"{element}_hit").mean() * 100).round(1).alias(f"{element}_pct"),
+            )
+        ),
+    ]
+    matched = matched.with_columns(pl.col("obs_time").dt.strftime("%Y-%m").alias("month"))
+    if not by:
+        return matched.select(aggregates)
+    return matched.group_by(by).agg(aggregates).sort(by)
+
+
+# Оценки по архиву за период [start, end] для станций icaos
+def verify(history, icaos, start, end=None, by=("icao", "month")):
+    metars = history.query(icaos, start, end, 'METAR', decode=True)
+    # TAF, выпущенные до начала периода, ещё действуют в его первые сутки
+    tafs = history.query(icaos, _shift(start, -30 * 3600), end, 'TAF')
+    return scores(match(metars, tafs), by)
+
+
+def _shift(moment, seconds):
+    return moment + timedelta(seconds=seconds) if isinstance(moment, datetime) else moment + seconds